@@ -0,0 +1,44 @@
+from __future__ import annotations
+import argparse
+import os
+import sys
+from . import cases # registers the benchmarks
+from .harness import BACKENDS, run, save, load, compare, format_comparison
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="piscesORM benchmark suite")
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=list(BACKENDS), help="database backends to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast check")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (default: 5)")
+    parser.add_argument("-k", dest="pattern", help="only run the benchmarks whose key contains this text")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with (default: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a regression is reported (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    document = run(args.backend, args.quick, args.repeat, args.pattern)
+    if args.output:
+        save(document, args.output)
+
+    if args.save_baseline:
+        save(document, args.baseline)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    rows = compare(document, load(args.baseline), args.tolerance)
+    print()
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from piscesORM.table import Table
+from piscesORM.column import Integer, Text, Real, Boolean, Time, PluralRelationship, ColumnRef, FieldRef
+from piscesORM.operator import Between
+from piscesORM.operator.translate.sqlite import translate_sqlite_security
+from piscesORM.generator import SQLiteGenerator
+from piscesORM.lock import SyncLockManager, AsyncLockManager
+from piscesORM.ptime import PiscesTime
+from .harness import benchmark, Stopwatch, Env
+
+_EPOCH = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class BenchItem(Table):
+    __table_name__ = "bench_item"
+    id = Integer(primary_key=True)
+    name = Text()
+    value = Integer()
+    score = Real()
+    active = Boolean(default=True)
+    created = Time()
+
+
+class BenchAuthor(Table):
+    __table_name__ = "bench_author"
+    id = Integer(primary_key=True)
+    name = Text()
+    books = PluralRelationship("BenchBook", ColumnRef("author_id") == FieldRef("id"))
+
+
+class BenchBook(Table):
+    __table_name__ = "bench_book"
+    id = Integer(primary_key=True)
+    author_id = Integer(index=True)
+    title = Text()
+    price = Real()
+
+
+def _items(count: int) -> list[BenchItem]:
+    return [
+        BenchItem(id=i, name=f"item {i}", value=i % 97, score=i * 0.5, active=i % 2 == 0, created=_EPOCH + timedelta(seconds=i))
+        for i in range(count)
+    ]
+
+def _fill_items(env: Env, count: int):
+    env.clear(BenchItem)
+    with env.engine.session(auto_commit=False) as session:
+        session.insert_many(_items(count))
+        session.commit()
+
+
+# ---------- write ----------
+@benchmark("insert", sizes=(1000,), quick_sizes=(200,), unit="row")
+def insert(env: Env, size: int):
+    env.clear(BenchItem)
+    objs = _items(size)
+    with env.engine.session(auto_commit=False) as session:
+        with Stopwatch() as sw:
+            for obj in objs:
+                session.insert(obj)
+            session.commit()
+    return sw.elapsed, size
+
+@benchmark("insert_many", sizes=(1000, 10000), quick_sizes=(1000,), unit="row")
+def insert_many(env: Env, size: int):
+    env.clear(BenchItem)
+    objs = _items(size)
+    with env.engine.session(auto_commit=False) as session:
+        with Stopwatch() as sw:
+            session.insert_many(objs)
+            session.commit()
+    return sw.elapsed, size
+
+@benchmark("merge", sizes=(500,), quick_sizes=(100,), unit="row")
+def merge(env: Env, size: int):
+    _fill_items(env, size)
+    with env.engine.session(auto_commit=False) as session:
+        objs = session.get_all(BenchItem)
+        for obj in objs:
+            obj.value += 1
+            obj.name = f"renamed {obj.id}"
+        with Stopwatch() as sw:
+            for obj in objs:
+                session.merge(obj)
+            session.commit()
+    return sw.elapsed, size
+
+@benchmark("merge_many", sizes=(500,), quick_sizes=(100,), unit="row")
+def merge_many(env: Env, size: int):
+    _fill_items(env, size)
+    with env.engine.session(auto_commit=False) as session:
+        objs = session.get_all(BenchItem)
+        for obj in objs:
+            obj.value += 1
+        with Stopwatch() as sw:
+            session.merge_many(objs)
+            session.commit()
+    return sw.elapsed, size
+
+
+# ---------- read ----------
+@benchmark("get_all", sizes=(100, 1000, 10000), quick_sizes=(100, 1000), unit="row")
+def get_all(env: Env, size: int):
+    """ SELECT + hydration of `size` rows (Boolean / Time conversion included) """
+    _fill_items(env, size)
+    with env.engine.session() as session:
+        with Stopwatch() as sw:
+            rows = session.get_all(BenchItem)
+    assert len(rows) == size
+    return sw.elapsed, size
+
+@benchmark("get_all_filtered", sizes=(1000,), unit="query")
+def get_all_filtered(env: Env, size: int):
+    """ a small filtered query repeated: translation + statement + hydration of ~10 rows """
+    _fill_items(env, size)
+    rounds = 200
+    with env.engine.session() as session:
+        with Stopwatch() as sw:
+            for i in range(rounds):
+                session.get_all(BenchItem, BenchItem.value == i % 97, BenchItem.active == True)
+    return sw.elapsed, rounds
+
+@benchmark("relationship_fanout", sizes=(20, 200), quick_sizes=(20,), unit="author")
+def relationship_fanout(env: Env, size: int):
+    """ get_all of `size` authors with 5 books each: one query per author for the PluralRelationship """
+    env.clear(BenchAuthor, BenchBook)
+    with env.engine.session(auto_commit=False) as session:
+        session.insert_many([BenchAuthor(id=i, name=f"author {i}") for i in range(size)])
+        session.insert_many([BenchBook(id=i, author_id=i // 5, title=f"book {i}", price=i * 1.5) for i in range(size * 5)])
+        session.commit()
+    with env.engine.session() as session:
+        with Stopwatch() as sw:
+            authors = session.get_all(BenchAuthor)
+    assert len(authors[-1].books) == 5
+    return sw.elapsed, size
+
+
+# ---------- pure python ----------
+@benchmark("operator_translate", db=False, unit="filter")
+def operator_translate(env: Env, size: int):
+    """ translate a filter with AND / OR / IN / BETWEEN, the shape is cached, the values change """
+    filters = [
+        ((BenchItem.value > i) & (BenchItem.name == f"item {i}")) | BenchItem.id.in_([i, i + 1, i + 2]) | Between(BenchItem.score, i, i + 10)
+        for i in range(2000)
+    ]
+    with Stopwatch() as sw:
+        for op in filters:
+            translate_sqlite_security(op)
+    return sw.elapsed, len(filters)
+
+@benchmark("generate_select", db=False, unit="query")
+def generate_select(env: Env, size: int):
+    filters = [(BenchItem.value >= i) & (BenchItem.active == True) for i in range(2000)]
+    with Stopwatch() as sw:
+        for op in filters:
+            SQLiteGenerator.generate_select(BenchItem, None, op, ["-created"], 50)
+    return sw.elapsed, len(filters)
+
+@benchmark("ptime_to_db", db=False, unit="value")
+def ptime_to_db(env: Env, size: int):
+    column = BenchItem._columns["created"]
+    values = [PiscesTime.from_datetime(_EPOCH + timedelta(minutes=i)) for i in range(5000)]
+    with Stopwatch() as sw:
+        for value in values:
+            column.to_db(value)
+    return sw.elapsed, len(values)
+
+@benchmark("ptime_from_db", db=False, unit="value")
+def ptime_from_db(env: Env, size: int):
+    column = BenchItem._columns["created"]
+    values = [column.to_db(_EPOCH + timedelta(minutes=i)) for i in range(5000)]
+    with Stopwatch() as sw:
+        for value in values:
+            column.from_db(value)
+    return sw.elapsed, len(values)
+
+
+# ---------- locks ----------
+_LOCK_KEYS = [f"bench:{i}" for i in range(8)]
+_LOCK_ROUNDS = 300
+
+@benchmark("lock_threads", db=False, sizes=(1, 4, 16), quick_sizes=(4,), unit="acquire")
+def lock_threads(env: Env, size: int):
+    """ `size` threads acquiring and releasing 8 shared keys, yielding while they hold a key """
+    manager = SyncLockManager()
+    clients = [manager.login(f"bench_{i}") for i in range(size)]
+    ready = threading.Barrier(size + 1)
+
+    def worker(i: int):
+        client = clients[i]
+        ready.wait()
+        for j in range(_LOCK_ROUNDS):
+            key = _LOCK_KEYS[(i + j) % len(_LOCK_KEYS)]
+            client.acquire(key)
+            time.sleep(0)
+            client.release(key)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(size)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    with Stopwatch() as sw:
+        for thread in threads:
+            thread.join()
+    for client in clients:
+        manager.logout(client.user)
+    return sw.elapsed, size * _LOCK_ROUNDS
+
+@benchmark("lock_tasks", db=False, sizes=(1, 4, 16, 64), quick_sizes=(16,), unit="acquire")
+def lock_tasks(env: Env, size: int):
+    """ `size` asyncio tasks acquiring and releasing 8 shared keys, yielding while they hold a key """
+    async def main():
+        manager = AsyncLockManager()
+        clients = [await manager.login(f"bench_{i}") for i in range(size)]
+
+        async def worker(i: int):
+            client = clients[i]
+            for j in range(_LOCK_ROUNDS):
+                key = _LOCK_KEYS[(i + j) % len(_LOCK_KEYS)]
+                await client.acquire(key)
+                await asyncio.sleep(0)
+                client.release(key)
+
+        with Stopwatch() as sw:
+            await asyncio.gather(*(worker(i) for i in range(size)))
+        for client in clients:
+            await manager.logout(client.user)
+        return sw.elapsed
+
+    return asyncio.run(main()), size * _LOCK_ROUNDS
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+import piscesORM
+from piscesORM.engine import SyncSQLiteEngine
+
+"""
+note:
+A benchmark is a function `(env, size) -> (elapsed sec, ops)` registered with `@benchmark(...)`.
+It builds its data first and only times the measured part (use `Stopwatch`), so setup is never counted.
+Every benchmark runs `repeat` times; the result keeps the median and the best time per operation.
+Database benchmarks run once per backend ("file" / "memory"), the others run once with backend None.
+"""
+
+BACKENDS = ("file", "memory")
+
+BENCHMARKS: list[Benchmark] = []
+
+
+class Benchmark:
+    def __init__(self, name: str, func: Callable, sizes: tuple[int, ...], quick_sizes: tuple[int, ...], unit: str, db: bool):
+        self.name = name
+        self.func = func
+        self.sizes = sizes
+        self.quick_sizes = quick_sizes
+        self.unit = unit    # what one operation is: "row", "query", "acquire", ...
+        self.db = db        # needs a database, runs once per backend
+
+
+def benchmark(name: str, sizes: tuple[int, ...] = (1,), quick_sizes: tuple[int, ...] = None, unit: str = "op", db: bool = True):
+    """ register a benchmark function `(env, size) -> (elapsed, ops)` """
+    def wrapper(func):
+        BENCHMARKS.append(Benchmark(name, func, sizes, quick_sizes or sizes[:1], unit, db))
+        return func
+    return wrapper
+
+
+class Stopwatch:
+    """ `with Stopwatch() as sw: ...` then `sw.elapsed` """
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        return False
+
+
+class Env:
+    """ The database of one backend, shared by the benchmarks run on it. """
+    def __init__(self, backend: Optional[str]):
+        self.backend = backend
+        self.engine: Optional[SyncSQLiteEngine] = None
+        self._tmpdir = None
+        self._keeper = None
+
+    def open(self):
+        if self.backend == "file":
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="pisces_bench_")
+            self.engine = SyncSQLiteEngine(os.path.join(self._tmpdir.name, "bench.db"))
+        elif self.backend == "memory":
+            self.engine = SyncSQLiteEngine(":memory:")
+            # the shared in-memory database only lives while a connection is open
+            self._keeper = sqlite3.connect(self.engine.db_path, uri=True)
+        if self.engine is not None:
+            self.engine.initialize()
+        return self
+
+    def close(self):
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def clear(self, *tables):
+        """ empty the given tables """
+        with self.engine.session() as session:
+            for table in tables:
+                session.execute(f"DELETE FROM {table.__table_name__ or table.__name__}")
+            session.commit()
+
+
+# ---------- run ----------
+def run(backends=BACKENDS, quick: bool = False, repeat: int = 5, pattern: str = None, echo: Callable[[str], None] = print) -> dict:
+    """ run the registered benchmarks, return the results document """
+    results = {}
+    for backend in (None, *backends):
+        env = Env(backend).open()
+        try:
+            for bench in BENCHMARKS:
+                if bench.db != (backend is not None):
+                    continue
+                for size in (bench.quick_sizes if quick else bench.sizes):
+                    key = result_key(bench.name, size, backend)
+                    if pattern and pattern not in key:
+                        continue
+                    results[key] = _measure(bench, env, size, repeat)
+                    echo(_format_result(key, results[key]))
+        finally:
+            env.close()
+    return {"meta": _meta(quick, repeat), "results": results}
+
+def result_key(name: str, size: int, backend: Optional[str]) -> str:
+    key = f"{name}[{size}]" if size != 1 else name
+    return f"{key}@{backend}" if backend else key
+
+def _measure(bench: Benchmark, env: Env, size: int, repeat: int) -> dict:
+    bench.func(env, size) # warm up: caches, table pages, imports
+    per_op = []
+    ops = 0
+    for _ in range(repeat):
+        elapsed, ops = bench.func(env, size)
+        per_op.append(elapsed / ops)
+    median = statistics.median(per_op)
+    return {
+        "unit": bench.unit,
+        "ops": ops,
+        "repeat": repeat,
+        "median": median,           # sec per op
+        "best": min(per_op),        # sec per op
+        "ops_per_sec": 1 / median if median else None,
+    }
+
+def _meta(quick: bool, repeat: int) -> dict:
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "piscesORM": piscesORM.__version__,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "quick": quick,
+        "repeat": repeat,
+    }
+
+def _format_result(key: str, result: dict) -> str:
+    return f"{key:<42} {result['median'] * 1e6:>12.2f} us/{result['unit']:<8} ({result['ops_per_sec']:,.0f} {result['unit']}/s)"
+
+
+# ---------- baseline ----------
+def save(document: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare(document: dict, baseline: dict, tolerance: float = 0.25) -> list[dict]:
+    """
+    Compare the median time per op of the benchmarks found in both documents.
+    A benchmark slower than the baseline by more than `tolerance` (0.25 = 25%) is a regression.
+    """
+    rows = []
+    for key, result in document["results"].items():
+        base = baseline["results"].get(key)
+        if base is None or not base["median"]:
+            continue
+        ratio = result["median"] / base["median"]
+        status = "regression" if ratio > 1 + tolerance else "faster" if ratio < 1 - tolerance else "ok"
+        rows.append({"key": key, "baseline": base["median"], "current": result["median"], "ratio": ratio, "status": status})
+    return rows
+
+def format_comparison(rows: list[dict]) -> str:
+    lines = [f"{'benchmark':<42} {'baseline':>12} {'current':>12} {'ratio':>7}"]
+    for row in rows:
+        mark = {"regression": "  << slower", "faster": "  faster"}.get(row["status"], "")
+        lines.append(f"{row['key']:<42} {row['baseline'] * 1e6:>10.2f}us {row['current'] * 1e6:>10.2f}us {row['ratio']:>6.2f}x{mark}")
+    return "\n".join(lines)
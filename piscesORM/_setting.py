@@ -8,10 +8,24 @@ class Global_setting:
 
     lock_auto_release_time = 0 # seconds
     """ Maximum time a lock can be held before it is automatically released. Set 0 to disable auto release. (sec, float)"""
+    lock_wait_timeout = 0 # seconds
+    """ Maximum time to wait for a lock before raising LockTimeout. Set 0 to wait forever. (sec, float)"""
     garbage_clean_cycle = 5 # seconds
     """ Time between lock data garbage collection cycles (sec, float)"""
+    lock_stripes = 16
+    """ Number of stripes (shards) the lock table of a lock manager is split into, each guarded by its own mutex (int)"""
+    lock_poll_interval = 0.05 # seconds
+    """ Longest sleep of a process waiting for a lock of the SQLite lock file before it retries (sec, float)"""
     modified_obj_output = False
     """ Using beautified output, you can visually see the information when you print(table)."""
+    in_list_inline_limit = 32
+    """ `IN` lists up to this size are bound as one `?` per value, longer lists are bound as a single JSON parameter (int)"""
+    translate_cache_size = 1024
+    """ Number of translated filter shapes kept in the Operator -> SQL cache. Set 0 to disable the cache. (int)"""
+    rebuild_batch_size = 5000
+    """ Rows copied per transaction by the online table rebuild (`update_table_structure(..., online=True)`) (int)"""
+    index_advisor_on_initialize = False
+    """ At the end of `engine.initialize()`, log the relationship loads that scan a whole table (see `debug_tool.advise_indexes`) """
     _debug_level = logging.ERROR
     
     
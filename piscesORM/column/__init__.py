@@ -1,8 +1,9 @@
 __all__ = ["Column", "Integer", "Text", "Blob", "Real", "Numeric",
-           "Json", "Array", "EnumType", "EnumArray", "Boolean", "Time",
-           "Relationship", "FieldRef"]
+           "Json", "Array", "EnumType", "EnumArray", "Boolean", "Time", "Version",
+           "Relationship", "FieldRef", "Index"]
 
 from .column import *
 from .basic import *
 from .extend import *
-from .relationship import *
\ No newline at end of file
+from .relationship import *
+from .index import *
\ No newline at end of file
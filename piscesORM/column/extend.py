@@ -212,4 +212,13 @@ class Time(Column):
         return super().__le__(self._format_time(value))
     
     def __lt__(self, value):
-        return super().__lt__(self._format_time(value))
\ No newline at end of file
+        return super().__lt__(self._format_time(value))
+
+class Version(Column):
+    """
+    A version number for optimistic concurrency (int).
+    `merge` only updates the row if its version still matches the object, then bumps it;
+    if someone else changed the row first, `StaleObjectError` is raised instead of overwriting it.
+    """
+    def __init__(self, default:int = 0, index:bool=False):
+        super().__init__("INTEGER", not_null=True, default=default, index=index)
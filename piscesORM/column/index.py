@@ -0,0 +1,54 @@
+from __future__ import annotations
+from ..operator.basic import Operator
+from .column import Column
+
+class Index:
+    """
+    A table index, declared on the table with `__indexes__ = [...]`.
+
+    Parameters:
+    - *parts: the indexed columns, in order. A column name (prefix `-` for descending), a Column,
+        or an Operator expression (`price * quantity`).
+    - unique: create a UNIQUE index.
+    - where: an Operator, makes a partial index holding only the matching rows.
+    - name: index name, default `<table>_<columns>_idx` (plus a short hash for expressions and partial indexes).
+
+    Examples:
+    ```
+    class Order(Table):
+        code = Text()
+        customer = Integer()
+        created = Time()
+        active = Boolean(default=True)
+        __indexes__ = [
+            Index("customer", "-created"),
+            Index(code, unique=True, where=active == True),
+        ]
+    ```
+    Inside the class body the columns are referred to by their bare names.
+    """
+    def __init__(self, *parts: str|Column|Operator, unique: bool = False, where: Operator = None, name: str = None):
+        if not parts:
+            raise ValueError("Index requires at least one column or expression")
+        for part in parts:
+            if not isinstance(part, (str, Column, Operator)):
+                raise TypeError(f"Index parts must be column names, Columns or Operators, not {type(part).__name__}")
+        if where is not None and not isinstance(where, Operator):
+            raise TypeError("Index where= must be an Operator")
+        self.parts = parts
+        self.unique = unique
+        self.where = where
+        self.name = name
+
+    def column_names(self) -> list[str]:
+        """ names of the plain columns among the parts (expressions excluded) """
+        names = []
+        for part in self.parts:
+            if isinstance(part, str):
+                names.append(part.lstrip("-"))
+            elif isinstance(part, Column):
+                names.append(part._name)
+        return names
+
+    def __repr__(self):
+        return f"Index({', '.join(repr(p) for p in self.parts)}, unique={self.unique}, where={self.where!r}, name={self.name!r})"
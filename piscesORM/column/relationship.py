@@ -41,6 +41,7 @@ class Relationship:
         self.plural_data = False
 
         self.filters = filters
+        self._fixed_filters = None
         # self.conditions = conditions
 
     def get_table(self):
@@ -59,21 +60,17 @@ class Relationship:
     def fix_filters(self):
         """
         Combine all filters using AND logic and resolve any ColumnRef to actual columns.
+        The result is normalized once and cached, since it is reused for every loaded object.
         
         Returns:
             The combined and resolved filter expression.
         """
-        combined_filter = None
-        if self.filters:
-            for f in self.filters:
-                if combined_filter is None:
-                    combined_filter = f
-                else:
-                    combined_filter &= f
-        if combined_filter:
-            combined_filter = self.fix_column(combined_filter)
-                        
-        return combined_filter
+        if self._fixed_filters is None and self.filters:
+            from ..operator.normalize import normalize
+
+            combined_filter = AND(*self.filters) if len(self.filters) > 1 else self.filters[0]
+            self._fixed_filters = normalize(self.fix_column(combined_filter))
+        return self._fixed_filters
     
     def fix_column(self, op:Operator):
         """
@@ -1 +1,4 @@
-from .logger import enable_debug
\ No newline at end of file
+from .logger import enable_debug, enable_trace, disable_trace, TraceEvent
+from .index_advisor import IndexAdvice, record_queries, stop_recording, advise_indexes, async_advise_indexes
+from .profiler import QueryProfiler, QueryRecord
+from .n_plus_one import NPlusOneDetector, LoadReport, detect_n_plus_one, stop_detecting
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import logging
+from typing import Type
+from ..base import TABLE_REGISTRY
+from ..column import Column, Index
+from ..operator import Operator, AND, Equal, IsIn, IsNull, GreaterThan, GreaterEqual, LessThan, LessEqual, Between, Like
+from ..generator import sqlite as sqlite_generator
+from ..generator import SQLiteGenerator
+from ..table import Table
+logger = logging.getLogger("piscesORM")
+
+"""
+note:
+The index advisor runs `EXPLAIN QUERY PLAN` on
+- the filter of every Relationship / PluralRelationship in TABLE_REGISTRY (run once per loaded object),
+- the filtered queries recorded at runtime between `record_queries()` and `stop_recording()`,
+and reports the ones that scan a whole table, with the columns an index should start with.
+"""
+
+_EQUALITY = (Equal, IsIn, IsNull)
+_RANGE = (GreaterThan, GreaterEqual, LessThan, LessEqual, Between, Like)
+
+_recorded: dict[tuple[str, str], tuple[Type[Table], Operator]] = {}
+
+class _Placeholder:
+    """ stands for the object of a relationship, every FieldRef reads None (the plan doesn't depend on the value) """
+    def __getattr__(self, name):
+        return None
+
+
+class IndexAdvice:
+    """ A query that scans a whole table. """
+    def __init__(self, table: Type[Table], source: str, sql: str, plan: list[str], columns: list[str]):
+        self.table = table
+        self.source = source        # "Author.books" for a relationship, "runtime" for a recorded query
+        self.sql = sql
+        self.plan = plan            # the EXPLAIN QUERY PLAN details
+        self.columns = columns      # suggested index columns, empty when no single index helps (e.g. OR)
+
+    def index(self) -> Index|None:
+        """ The suggested index, to add to `__indexes__` """
+        if not self.columns:
+            return None
+        table_name = self.table.__table_name__ or self.table.__name__
+        return Index(*self.columns, name=f"{table_name}_{'_'.join(self.columns)}_auto")
+
+    def __repr__(self):
+        suggestion = f"Index({', '.join(repr(c) for c in self.columns)})" if self.columns else "no single index"
+        return f"<IndexAdvice {self.source}: {self.sql!r} scans {self.table.__name__}, suggest {suggestion}>"
+
+
+# ---------- recording ----------
+def record_queries():
+    """ Start recording the filtered queries generated at runtime, for `advise_indexes(runtime=True)`. """
+    sqlite_generator._query_recorder = _record
+
+def stop_recording(clear: bool = False):
+    sqlite_generator._query_recorder = None
+    if clear:
+        _recorded.clear()
+
+def _record(table: Type[Table], filters: Operator, sql: str):
+    key = (table.__table_name__ or table.__name__, sql)
+    if key not in _recorded:
+        _recorded[key] = (table, filters)
+
+
+# ---------- advise ----------
+def advise_indexes(session, runtime: bool = True, create: bool = False) -> list[IndexAdvice]:
+    """
+    Explain the relationship filters (and the recorded queries if `runtime`) with a SyncSQLiteSession.
+    Every full table scan is logged as a warning and returned.
+    - create: also create the suggested indexes (named `<table>_<columns>_auto`), declaring them in `__indexes__` is preferred.
+    """
+    advices = []
+    for source, table, filters, sql, values in _candidates(runtime):
+        rows = session.execute(f"EXPLAIN QUERY PLAN {sql}", values).fetchall()
+        advice = _check_plan(source, table, filters, sql, rows)
+        if advice is not None:
+            advices.append(advice)
+
+    if create:
+        for index_sql in _create_sqls(advices):
+            session.execute(index_sql)
+        session.commit()
+    return advices
+
+async def async_advise_indexes(session, runtime: bool = True, create: bool = False) -> list[IndexAdvice]:
+    """ `advise_indexes` with an AsyncSQLiteSession. """
+    advices = []
+    for source, table, filters, sql, values in _candidates(runtime):
+        rows = await (await session.execute(f"EXPLAIN QUERY PLAN {sql}", values)).fetchall()
+        advice = _check_plan(source, table, filters, sql, rows)
+        if advice is not None:
+            advices.append(advice)
+
+    if create:
+        for index_sql in _create_sqls(advices):
+            await session.execute(index_sql)
+        await session.commit()
+    return advices
+
+def _candidates(runtime: bool):
+    """ (source, table, filters, sql, values) of every query to explain """
+    seen = set()
+    placeholder = _Placeholder()
+    for owner in list(TABLE_REGISTRY.values()):
+        for name, relation in owner._relationship.items():
+            filters = relation.fix_filters()
+            if filters is None:
+                continue
+            table = relation.get_table()
+            sql, values = SQLiteGenerator.generate_select(table, None, filters, ref_obj=placeholder)
+            seen.add(sql)
+            yield f"{owner.__name__}.{name}", table, filters, sql, values
+
+    if runtime:
+        for (_, sql), (table, filters) in list(_recorded.items()):
+            if sql not in seen:
+                seen.add(sql)
+                yield "runtime", table, filters, sql, [None] * sql.count("?")
+
+def _check_plan(source: str, table: Type[Table], filters: Operator, sql: str, rows) -> IndexAdvice|None:
+    table_name = table.__table_name__ or table.__name__
+    plan = [row[3] for row in rows]
+    # "SCAN <table>" is a full scan, "SCAN <table> USING INDEX" only walks an index
+    if not any(detail == f"SCAN {table_name}" or detail.startswith(f"SCAN {table_name} ") and " USING " not in detail for detail in plan):
+        return None
+    advice = IndexAdvice(table, source, sql, plan, _suggest_columns(table, filters))
+    logger.warning(f"{advice.source} scans the whole table {table_name}: {sql}" + (f" (suggested index: {advice.columns})" if advice.columns else ""))
+    return advice
+
+def _suggest_columns(table: Type[Table], filters: Operator) -> list[str]:
+    """ The equality columns of the AND-ed conditions first, then the first range column. """
+    equal, ranged = [], []
+    for part in filters.parts if isinstance(filters, AND) else (filters,):
+        column = _filtered_column(table, part)
+        if column is None:
+            continue
+        if isinstance(part, _EQUALITY) and column not in equal:
+            equal.append(column)
+        elif isinstance(part, _RANGE) and column not in ranged:
+            ranged.append(column)
+    return equal + [c for c in ranged if c not in equal][:1]
+
+def _filtered_column(table: Type[Table], op: Operator) -> str|None:
+    """ the column of `table` compared by `op`, when `op` compares one column with values """
+    if not isinstance(op, _EQUALITY + _RANGE):
+        return None
+    columns = [p for p in op.parts if isinstance(p, Column)]
+    if len(columns) != 1 or columns[0]._name not in table._columns:
+        return None
+    return columns[0]._name
+
+def _create_sqls(advices: list[IndexAdvice]) -> list[str]:
+    sqls = []
+    for advice in advices:
+        index = advice.index()
+        if index is not None:
+            sql = SQLiteGenerator.generate_create_index(advice.table, index)
+            if sql not in sqls:
+                sqls.append(sql)
+    return sqls
@@ -1,4 +1,7 @@
 import logging
+from ..generator import trace
+from ..generator.trace import TraceEvent
+from typing import Callable
 logger = logging.getLogger("piscesORM")
 
 def enable_debug():
@@ -10,5 +13,13 @@ def enable_debug():
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         ch.setFormatter(formatter)
         logger.addHandler(ch)
+    trace.enable() # the generated SQL is logged at DEBUG level
     logger.info("debug mode enable")
 
+def enable_trace(sink: Callable[[TraceEvent], None]):
+    """ Send the structured trace events of the generators (TraceEvent: name + fields) to `sink`, without the debug log. """
+    trace.enable(sink)
+
+def disable_trace(sink: Callable[[TraceEvent], None] = None):
+    """ Stop `sink`, or every trace output (including the debug log of `enable_debug`) when None. """
+    trace.disable(sink)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+from ..session import toolbox as session_toolbox
+from ..column.relationship import Relationship
+from .. import errors
+logger = logging.getLogger("piscesORM")
+
+"""
+note:
+Relationships load eagerly and recursively, so one `get_all` runs one query per object and relationship.
+While the detector is on, every top-level `get_first` / `get_all` of a session gets a LoadReport counting
+its own query and the relationship loads it triggered, grouped by edge ("Author.books").
+A call running more queries than `threshold` is logged (or sent to `sink`), or aborted with
+errors.TooManyRelationshipQueries when `raise_error`.
+The current report lives in a ContextVar, so threads and asyncio tasks are counted separately.
+"""
+
+class LoadReport:
+    """ The queries run by one top-level session call. """
+    __slots__ = ("table", "call", "queries", "edges")
+
+    def __init__(self, table: str, call: str):
+        self.table = table
+        self.call = call
+        self.queries = 1 # the query of the call itself
+        self.edges: dict[str, list] = {} # "Author.books" -> [queries, Relationship]
+
+    def top(self, n: int = None) -> list[tuple[str, int, Relationship]]:
+        """ (edge, queries, relationship), the edge running the most queries first """
+        edges = sorted(((edge, count, relation) for edge, (count, relation) in self.edges.items()), key=lambda e: e[1], reverse=True)
+        return edges[:n] if n else edges
+
+    def __str__(self):
+        lines = [f"{self.call}({self.table}) ran {self.queries} queries"]
+        for edge, count, relation in self.top():
+            lines.append(f"  {edge} -> {relation.get_table().__name__} ({type(relation).__name__}): {count} queries")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"<LoadReport {self.call}({self.table}) {self.queries} queries>"
+
+
+class NPlusOneDetector:
+    """
+    Counts the relationship loads of every top-level session call, enable it with `detect_n_plus_one()`.
+    - threshold: most queries allowed for one call (its own query included).
+    - raise_error: raise errors.TooManyRelationshipQueries as soon as the threshold is passed, instead of reporting after the call.
+    - sink: callable(LoadReport) for the calls over the threshold, logs a warning by default.
+    """
+    def __init__(self, threshold: int = 50, raise_error: bool = False, sink: Callable[[LoadReport], None] = None):
+        self.threshold = threshold
+        self.raise_error = raise_error
+        self.sink = sink or _log_report
+        self.last: Optional[LoadReport] = None # report of the last finished call
+        self._current: ContextVar[Optional[LoadReport]] = ContextVar("pisces_load_report", default=None)
+
+    @contextmanager
+    def watch(self, table, call: str):
+        """ scope of one top-level call, nested calls (a lock session calling its parent) join the outer one """
+        if self._current.get() is not None:
+            yield
+            return
+        report = LoadReport(getattr(table, "__name__", type(table).__name__), call)
+        token = self._current.set(report)
+        try:
+            yield
+        finally:
+            self._current.reset(token)
+            self.last = report
+        if report.queries > self.threshold:
+            self.sink(report)
+
+    def load(self, owner, name: str, relation: Relationship):
+        """ called by the session before loading the relationship `name` of `owner` """
+        report = self._current.get()
+        if report is None:
+            return
+        report.queries += 1
+        edge = f"{type(owner).__name__}.{name}"
+        counter = report.edges.get(edge)
+        if counter is None:
+            counter = report.edges[edge] = [0, relation]
+        counter[0] += 1
+        if self.raise_error and report.queries > self.threshold:
+            raise errors.TooManyRelationshipQueries(report)
+
+
+def detect_n_plus_one(threshold: int = 50, raise_error: bool = False, sink: Callable[[LoadReport], None] = None) -> NPlusOneDetector:
+    """ Watch the relationship loads of every session (see NPlusOneDetector), until `stop_detecting()`. """
+    detector = NPlusOneDetector(threshold, raise_error, sink)
+    session_toolbox._load_monitor = detector
+    return detector
+
+def stop_detecting():
+    session_toolbox._load_monitor = None
+
+def _log_report(report: LoadReport):
+    logger.warning(f"N+1 queries: {report}")
@@ -0,0 +1,86 @@
+from __future__ import annotations
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+logger = logging.getLogger("piscesORM")
+
+class QueryRecord:
+    """ One timed statement. """
+    __slots__ = ("sql", "params", "batch", "duration", "rows", "hydration")
+
+    def __init__(self, sql: str, params: Optional[int], batch: int, duration: float, rows: Optional[int], hydration: float):
+        self.sql = sql              # the statement with `?` placeholders, i.e. its shape
+        self.params = params        # bound parameters per statement
+        self.batch = batch          # statements run by one executemany, 1 otherwise
+        self.duration = duration    # execution (+ fetch for queries returning objects), sec
+        self.rows = rows            # rows fetched, None when the caller fetches them itself
+        self.hydration = hydration  # time spent building Table objects from the rows, sec
+
+    @property
+    def total(self) -> float:
+        return self.duration + self.hydration
+
+    def __repr__(self):
+        rows = f", {self.rows} rows" if self.rows is not None else ""
+        return f"<QueryRecord {self.total * 1000:.2f} ms{rows}: {self.sql}>"
+
+
+class QueryProfiler:
+    """
+    Times every statement run by the sessions of an engine, register it with `engine.set_profiler(profiler)`.
+    - slow_threshold: statements taking longer (sec, execution + fetch + hydration) are sent to `sink`.
+    - sink: callable(QueryRecord), logs a warning by default.
+    - keep: number of recent records kept in `records`, 0 to only keep the per-shape statistics.
+    Without a profiler, sessions only pay one attribute check per statement.
+    """
+    def __init__(self, slow_threshold: float = 0.1, sink: Callable[[QueryRecord], None] = None, keep: int = 1000):
+        self.slow_threshold = slow_threshold
+        self.sink = sink or _log_slow_query
+        self.records: deque[QueryRecord] = deque(maxlen=keep)
+        self._shapes: dict[str, list] = {} # sql -> [count, total, max, rows]
+        self._mutex = threading.Lock() # sync sessions of one engine may run in several threads
+
+    def record(self, sql: str, values, duration: float, many: bool = False, rows: int = None, hydration: float = 0.0):
+        if many:
+            batch = len(values) if hasattr(values, "__len__") else 0
+            params = sql.count("?")
+        else:
+            batch = 1
+            params = len(values) if values is not None and hasattr(values, "__len__") else 0
+        record = QueryRecord(sql, params, batch, duration, rows, hydration)
+        total = record.total
+        with self._mutex:
+            shape = self._shapes.get(sql)
+            if shape is None:
+                shape = self._shapes[sql] = [0, 0.0, 0.0, 0]
+            shape[0] += 1
+            shape[1] += total
+            if total > shape[2]:
+                shape[2] = total
+            shape[3] += rows or 0
+            if self.records.maxlen:
+                self.records.append(record)
+        if total >= self.slow_threshold:
+            self.sink(record)
+        return record
+
+    def stats(self, top: int = None) -> list[dict]:
+        """ Per statement shape: count, total / max / mean time and rows fetched, the most expensive first. """
+        with self._mutex:
+            shapes = [
+                {"sql": sql, "count": count, "total": total, "max": max_, "mean": total / count, "rows": rows}
+                for sql, (count, total, max_, rows) in self._shapes.items()
+            ]
+        shapes.sort(key=lambda s: s["total"], reverse=True)
+        return shapes[:top] if top else shapes
+
+    def reset(self):
+        with self._mutex:
+            self._shapes.clear()
+            self.records.clear()
+
+
+def _log_slow_query(record: QueryRecord):
+    rows = f", {record.rows} rows, hydration {record.hydration * 1000:.2f} ms" if record.rows is not None else ""
+    logger.warning(f"slow query ({record.total * 1000:.2f} ms{rows}): {record.sql}")
@@ -22,9 +22,19 @@ class AsyncBaseEngine(ABC):
     @abstractmethod
     async def get_session(self, mode="r", auto_commit:bool = None) -> session.AsyncBaseSession: ...
 
+    @abstractmethod
+    @asynccontextmanager
+    async def lock_session(self, mode="r", auto_commit:bool = None, user:str = None) -> session.AsyncBaseSession: ...
+
+    @abstractmethod
+    async def get_lock_session(self, mode="r", auto_commit:bool = None, user:str = None) -> session.AsyncBaseSession: ...
+
     @abstractmethod
     async def initialize(self) -> None: ...
 
+    @abstractmethod
+    def set_profiler(self, profiler) -> None: ...
+
 
 class SyncBaseEngine(ABC):
     def __init__(self, db_path: str = ":memory:", auto_commit: bool = True):
@@ -39,4 +49,14 @@ class SyncBaseEngine(ABC):
     def get_session(self, mode="r", auto_commit:bool = None) -> session.SyncBaseSession: ...
 
     @abstractmethod
-    def initialize(self) -> None: ...
\ No newline at end of file
+    @contextmanager
+    def lock_session(self, mode="r", auto_commit:bool = None, user:str = None) -> session.SyncBaseSession: ...
+
+    @abstractmethod
+    def get_lock_session(self, mode="r", auto_commit:bool = None, user:str = None) -> session.SyncBaseSession: ...
+
+    @abstractmethod
+    def initialize(self) -> None: ...
+
+    @abstractmethod
+    def set_profiler(self, profiler) -> None: ...
\ No newline at end of file
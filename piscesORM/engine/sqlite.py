@@ -3,12 +3,18 @@ import aiosqlite
 import sqlite3
 import asyncio
 from typing import Optional
-from ..session import AsyncSQLiteSession, SyncSQLiteSession
+from ..session import AsyncSQLiteSession, SyncSQLiteSession, AsyncSQLiteLockSession, SyncSQLiteLockSession
+from ..lock import AsyncLockManager, SyncLockManager
+from ..lock.asyncLock import asyncLockManager
+from ..lock.threadingLock import syncLockManager
+from .._setting import setting
+from ..debug_tool.index_advisor import advise_indexes, async_advise_indexes
+from ..debug_tool.profiler import QueryProfiler
 from contextlib import contextmanager, asynccontextmanager
 from . import AsyncBaseEngine, SyncBaseEngine
 
 class AsyncSQLiteEngine(AsyncBaseEngine):
-    def __init__(self, db_path = ':memory:', auto_commit:bool = None):
+    def __init__(self, db_path = ':memory:', auto_commit:bool = None, lock_manager: AsyncLockManager = None):
         if db_path == ':memory:':
             self.db_path = 'file::memory:?cache=shared'
             self._mem_mode = True
@@ -19,6 +25,12 @@ class AsyncSQLiteEngine(AsyncBaseEngine):
         self._auto_commit = auto_commit
         self._conn_pool = []
         self._protect_session = None
+        self._lock_manager = lock_manager or asyncLockManager
+        self._profiler = None
+
+    def set_profiler(self, profiler: Optional[QueryProfiler]):
+        """ Time the statements of the sessions opened from now on (see debug_tool.QueryProfiler), None to stop. """
+        self._profiler = profiler
 
     @asynccontextmanager
     async def session(self, mode="r", auto_commit = None):
@@ -28,6 +40,7 @@ class AsyncSQLiteEngine(AsyncBaseEngine):
             _conn = await aiosqlite.connect(self.db_path, uri=self._mem_mode)
             await _conn.execute("PRAGMA foreign_keys = ON")
             __session = AsyncSQLiteSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit)
+            __session._profiler = self._profiler
             yield __session
         except Exception:
             if _conn:
@@ -39,13 +52,48 @@ class AsyncSQLiteEngine(AsyncBaseEngine):
 
     async def get_session(self, mode="r", auto_commit = None):
         _conn = await aiosqlite.connect(self.db_path, uri=self._mem_mode)
-        return AsyncSQLiteSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit)
+        __session = AsyncSQLiteSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit)
+        __session._profiler = self._profiler
+        return __session
+
+    @asynccontextmanager
+    async def lock_session(self, mode="r", auto_commit = None, user: str = None):
+        """ A session with row locking (see AsyncSQLiteLockSession), its locks are released on exit. """
+        _conn = None
+        __session = None
+        try:
+            _conn = await aiosqlite.connect(self.db_path, uri=self._mem_mode)
+            await _conn.execute("PRAGMA foreign_keys = ON")
+            client = await self._lock_manager.login(user)
+            __session = AsyncSQLiteLockSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit, client, own_client=True)
+            __session._profiler = self._profiler
+            yield __session
+        except Exception:
+            if _conn:
+                await _conn.rollback()
+            raise
+        finally:
+            if __session:
+                await __session.release_locks()
+            if _conn:
+                await _conn.close()
+
+    async def get_lock_session(self, mode="r", auto_commit = None, user: str = None):
+        """ Call `release_locks()` on the session when you are done with it. """
+        _conn = await aiosqlite.connect(self.db_path, uri=self._mem_mode)
+        client = await self._lock_manager.login(user)
+        __session = AsyncSQLiteLockSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit, client, own_client=True)
+        __session._profiler = self._profiler
+        return __session
     
     async def initialize(self, structure_update=False, rebuild=False):
         _conn = await aiosqlite.connect(self.db_path, uri=self._mem_mode)
         await _conn.execute("PRAGMA foreign_keys = ON")
         __session = AsyncSQLiteSession(_conn, "w", False)
+        __session._profiler = self._profiler
         await __session.initialize(structure_update, rebuild)
+        if setting.index_advisor_on_initialize:
+            await async_advise_indexes(__session, runtime=False)
         if self._mem_mode:
             self._protect_session = __session
 
@@ -53,7 +101,7 @@ class AsyncSQLiteEngine(AsyncBaseEngine):
         asyncio.run(self.initialize(structure_update, rebuild))
 
 class SyncSQLiteEngine(SyncBaseEngine):
-    def __init__(self, db_path = ":memory:", auto_commit = True):
+    def __init__(self, db_path = ":memory:", auto_commit = True, lock_manager: SyncLockManager = None):
         if db_path == ':memory:':
             self.db_path = 'file::memory:?cache=shared'
             self._mem_mode = True
@@ -61,6 +109,12 @@ class SyncSQLiteEngine(SyncBaseEngine):
             self.db_path = db_path
             self._mem_mode = False
         self._auto_commit = auto_commit
+        self._lock_manager = lock_manager or syncLockManager
+        self._profiler = None
+
+    def set_profiler(self, profiler: Optional[QueryProfiler]):
+        """ Time the statements of the sessions opened from now on (see debug_tool.QueryProfiler), None to stop. """
+        self._profiler = profiler
 
     @contextmanager
     def session(self, mode="r", auto_commit = None):
@@ -70,6 +124,7 @@ class SyncSQLiteEngine(SyncBaseEngine):
             _conn = sqlite3.connect(self.db_path, uri=self._mem_mode)
             _conn.execute("PRAGMA foreign_keys = ON")
             __session = SyncSQLiteSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit)
+            __session._profiler = self._profiler
             yield __session
         except Exception:
             if _conn:
@@ -81,12 +136,47 @@ class SyncSQLiteEngine(SyncBaseEngine):
 
     def get_session(self, mode="r", auto_commit = None):
         _conn = sqlite3.connect(self.db_path, uri=self._mem_mode)
-        return SyncSQLiteSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit)
+        __session = SyncSQLiteSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit)
+        __session._profiler = self._profiler
+        return __session
+
+    @contextmanager
+    def lock_session(self, mode="r", auto_commit = None, user: str = None):
+        """ A session with row locking (see SyncSQLiteLockSession), its locks are released on exit. """
+        _conn = None
+        __session = None
+        try:
+            _conn = sqlite3.connect(self.db_path, uri=self._mem_mode)
+            _conn.execute("PRAGMA foreign_keys = ON")
+            client = self._lock_manager.login(user)
+            __session = SyncSQLiteLockSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit, client, own_client=True)
+            __session._profiler = self._profiler
+            yield __session
+        except Exception:
+            if _conn:
+                _conn.rollback()
+            raise
+        finally:
+            if __session:
+                __session.release_locks()
+            if _conn:
+                _conn.close()
+
+    def get_lock_session(self, mode="r", auto_commit = None, user: str = None):
+        """ Call `release_locks()` on the session when you are done with it. """
+        _conn = sqlite3.connect(self.db_path, uri=self._mem_mode)
+        client = self._lock_manager.login(user)
+        __session = SyncSQLiteLockSession(_conn, mode, auto_commit if auto_commit is not None else self._auto_commit, client, own_client=True)
+        __session._profiler = self._profiler
+        return __session
     
     def initialize(self, structure_update=False, rebuild=False):
         _conn = sqlite3.connect(self.db_path, uri=self._mem_mode)
         _conn.execute("PRAGMA foreign_keys = ON")
         __session = SyncSQLiteSession(_conn, "w", False)
+        __session._profiler = self._profiler
         __session.initialize(structure_update, rebuild)
+        if setting.index_advisor_on_initialize:
+            advise_indexes(__session, runtime=False)
         if self._mem_mode:
             self._protect_session = __session
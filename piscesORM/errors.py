@@ -58,7 +58,7 @@ class ModifyReadOnlyObject(PiscesError):
         
 PROTECT_NAME = set([
     # table protected val
-    "_registry", "__abstract__", "__table_name__", "__no_primary_key__", "_columns", "_relantionship", "_indexes", "_edited", "_initialized", 
+    "_registry", "__abstract__", "__table_name__", "__no_primary_key__", "__version_column__", "__indexes__", "__without_rowid__", "__strict__", "_columns", "_relantionship", "_indexes", "_edited", "_initialized", "_version_column", 
     # column protected val
     "plurl_data",
     # session protected val
@@ -73,6 +73,10 @@ class IllegalDefaultValue(PiscesError):
     def __init__(self, message):
         super().__init__(message)
 
+class IllegalTableOption(PiscesError):
+    def __init__(self, message):
+        super().__init__(message)
+
 class IllegalOrderByValue(PiscesError):
     def __init__(self):
         message = f"`order_by` only support Column and str or pack them in list."
@@ -83,6 +87,11 @@ class PrimaryKeyConflict(PiscesError):
         message = "Primary key conflict occurred."
         super().__init__(message)
 
+class StaleObjectError(PiscesError):
+    def __init__(self, table_name:str, pks:tuple):
+        message = f"{table_name}{pks} was changed or deleted by someone else after it was loaded, reload it before merging."
+        super().__init__(message)
+
 class NoSuchColumn(PiscesError):
     def __init__(self, column_name: str):
         message = f"No such column: '{column_name}'"
@@ -93,6 +102,12 @@ class MissingReferenceObject(PiscesError):
         message = "there's FieldRef in filter, but no ref obj input."
         super().__init__(message)
 
+class TooManyRelationshipQueries(PiscesError):
+    def __init__(self, report):
+        self.report = report
+        message = f"relationship loading passed the N+1 threshold, {report}"
+        super().__init__(message)
+
 # Lock errors
 class LockError(PiscesError):
     def __init__(self, message: str):
@@ -118,6 +133,27 @@ class LockObjectCollected(LockError):
         message = f"The Lock have been collected by manager. Maybe you hold lock overtime."
         super().__init__(message)
 
+class IllegalLockMode(LockError):
+    def __init__(self, mode):
+        message = f"Unknown lock mode: {mode!r}, it should be 's' (shared) or 'x' (exclusive)."
+        super().__init__(message)
+
+class LockUpgradeConflict(LockError):
+    def __init__(self, user:str):
+        message = f"{user} tried to upgrade a shared lock while another owner is already waiting to upgrade it."
+        super().__init__(message)
+
+class LockTimeout(LockError):
+    def __init__(self, user:str, key:str, wait:float):
+        message = f"{user} waited {wait} sec for the lock of key '{key}' and gave up."
+        super().__init__(message)
+
+class DeadlockDetected(LockError):
+    def __init__(self, user:str, cycle:list[str]):
+        self.cycle = cycle
+        message = f"Deadlock detected, {user} is chosen as the victim. Wait-for cycle: {' -> '.join(cycle + [user])}"
+        super().__init__(message)
+
 class MissingLock(LockError):
     def __init__(self, missing_keys: list[str]):
         message = f"you missing the current key: \n"
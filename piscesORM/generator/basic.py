@@ -3,6 +3,7 @@ from typing import Type, Any
 from ..table import Table
 from abc import ABC, abstractmethod
 from ..operator import Operator
+from ..column import Index
 
 
 class BasicGenerator(ABC):
@@ -53,6 +54,18 @@ class BasicGenerator(ABC):
         """
         ...
     
+    @staticmethod
+    @abstractmethod
+    def generate_table_options(table: Type[Table]) -> str:
+        """
+        Generates the SQL statement reading the storage options (WITHOUT ROWID, STRICT) of the table in the database.
+        Its row has the columns `wr` and `strict`, or `sql` (the CREATE TABLE text) when the database can't report them.
+
+        Args:
+            table: The table class whose options you want to check.
+        """
+        ...
+
     @staticmethod
     @abstractmethod
     def generate_insert_column(table: Type[Table], org_structure: dict) -> list[str]: 
@@ -88,6 +101,9 @@ class BasicGenerator(ABC):
             cover: The method used for synchronization.
                    * True: Updates all data in the row.
                    * False: Updates only the data that has changed.
+
+        If the table has a version column, the statement only matches the row while its version
+        equals the object's, and increments it.
         """
         ...
 
@@ -132,6 +148,97 @@ class BasicGenerator(ABC):
         """
         ...
 
+    @staticmethod
+    @abstractmethod
+    def generate_create_index(table: Type[Table], index: Index) -> str:
+        """
+        Generates the SQL statement to create one index of a table.
+
+        Args:
+            table: The table class the index belongs to.
+            index: The index to create.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_index_list(table: Type[Table]) -> str:
+        """
+        Generates the SQL statement listing the existing indexes of a table as (name, sql) rows.
+
+        Args:
+            table: The table class whose indexes you want to list.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_update_index(table: Type[Table], org_indexes: list[tuple[str, str]]) -> list[str]:
+        """
+        Generates the SQL statements dropping the stale indexes of a table and creating the missing ones.
+
+        Args:
+            table: The table class.
+            org_indexes: The existing indexes, as returned by `generate_index_list`.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_schema_fingerprint(table: Type[Table]) -> str:
+        """
+        Generates a hash of the table's DDL (table and indexes). It changes whenever the definition does.
+
+        Args:
+            table: The table class to fingerprint.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_create_schema_table() -> str:
+        """
+        Generates the SQL statement to create the metadata table storing the schema fingerprints.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_select_schema() -> str:
+        """
+        Generates the SQL statement listing every existing table with its stored fingerprint (NULL if none).
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_save_schema() -> str:
+        """
+        Generates the SQL statement saving a `(table_name, fingerprint)` pair.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_change_capture(table: Type[Table], log_table: str) -> list[str]:
+        """
+        Generates the SQL statements creating `log_table` and the triggers recording the rowid
+        of every row of the table inserted, updated or deleted from then on.
+
+        Args:
+            table: The table class to watch.
+            log_table: The name of the table receiving the rowids.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_drop_change_capture(table: Type[Table], log_table: str) -> list[str]:
+        """
+        Generates the SQL statements removing what `generate_change_capture` created.
+        """
+        ...
+
     @staticmethod
     @abstractmethod
     def generate_drop(table: Type[Table]) -> str:
@@ -176,6 +283,46 @@ class BasicGenerator(ABC):
             filters: The conditions to filter the count. Can be None if no
                      conditions are required.
 
+        Returns:
+            A tuple containing the SQL statement and a list of values for
+            database-safe delivery.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_exists(table: Type[Table], filters=None, ref_obj:Table=None) -> tuple[str, list]:
+        """
+        Generates the SQL statement to check whether any row matches.
+
+        Args:
+            table: The table class to check.
+            filters: The conditions to match. Can be None if no conditions
+                     are required.
+
+        Returns:
+            A tuple containing the SQL statement and a list of values for
+            database-safe delivery.
+        """
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def generate_aggregate(table: Type[Table], aggregates: list[tuple[str, Operator]], group_by: list[str]=None, filters=None, having=None, order_by: list[str]=None, limit:int=None, ref_obj:Table=None) -> tuple[str, list]:
+        """
+        Generates the SQL statement for an aggregate query.
+
+        Args:
+            table: The table class from which to aggregate.
+            aggregates: A list of `(alias, operator)` pairs. Each operator is
+                        evaluated in the database and returned under its alias.
+            group_by: The column names to group the rows by.
+            filters: The conditions applied before grouping (WHERE).
+            having: The conditions applied after grouping (HAVING).
+            order_by: Column names or aliases to sort the groups by. Prefix
+                      with '-' for descending order, otherwise ascending.
+            limit: The maximum number of rows to return.
+
         Returns:
             A tuple containing the SQL statement and a list of values for
             database-safe delivery.
@@ -1,14 +1,27 @@
 from __future__ import annotations
+import sqlite3
 from typing import Type
 from ..table import Table
 import logging
 from .. import errors
 import warnings
+import hashlib
 from . import BasicGenerator
+from . import trace
 from ..operator import Operator
-from ..operator.translate.sqlite import SQLITE_TRANSLATE_MAP, translate_sqlite_security
+from ..column import Index
+from ..operator.translate.sqlite import SQLITE_TRANSLATE_MAP, translate_sqlite_security, translate_sqlite_literal
 logger = logging.getLogger("piscesORM")
 
+_query_recorder = None
+""" callable(table, filters, sql) called for every filtered SELECT while the index advisor records (see `debug_tool.record_queries`) """
+
+_HAS_TABLE_LIST = sqlite3.sqlite_version_info >= (3, 37, 0)
+""" PRAGMA table_list needs SQLite 3.37+, older builds read the options from the CREATE TABLE text in sqlite_master """
+
+SCHEMA_TABLE = "pisces_schema"
+""" the metadata table keeping the fingerprint of every table definition, see `initialize()` """
+
 class SQLiteGenerator(BasicGenerator):
     @staticmethod
     def generate_create_table(table, exist_ok = False):
@@ -17,7 +30,7 @@ class SQLiteGenerator(BasicGenerator):
         pk_fields = []
 
         for name, column in table._columns.items():
-            parts = [name, column._type['sqlite']]
+            parts = [name, _column_type(table, column)]
 
             # INTEGER PRIMARY KEY AUTOINCREMENT
             if column.primary_key and column.auto_increment and column._type['sqlite'] == "INTEGER":
@@ -53,15 +66,19 @@ class SQLiteGenerator(BasicGenerator):
             warnings.warn(errors.NoPrimaryKeyWarning())
 
         columns_sql = ", ".join(column_defs)
-        sql = f"CREATE TABLE {'IF NOT EXISTS ' if exist_ok else ''}{table_name} ({columns_sql});"
-        logger.debug(f"Generate sql: {sql}")
+        options = [option for option, on in (("WITHOUT ROWID", table.__without_rowid__), ("STRICT", table.__strict__)) if on]
+        options_sql = f" {', '.join(options)}" if options else ""
+        sql = f"CREATE TABLE {'IF NOT EXISTS ' if exist_ok else ''}{table_name} ({columns_sql}){options_sql};"
+        if trace.enabled:
+            trace.emit("sql", sql=sql)
         return sql
     
     @staticmethod
     def generate_structure(table):
         table_name = table.__table_name__ or table.__name__
         sql = f"PRAGMA table_info({table_name})"
-        logger.debug(f"Generate sql: {sql}")
+        if trace.enabled:
+            trace.emit("sql", sql=sql)
         return sql
     
     @staticmethod
@@ -75,7 +92,7 @@ class SQLiteGenerator(BasicGenerator):
                 if column.primary_key:
                     raise errors.InsertPrimaryKeyColumn()
                 
-                col_type = column._type['sqlite']
+                col_type = _column_type(table, column)
                 constraints = []
                 if column.not_null:
                     if column.default is None:
@@ -90,10 +107,22 @@ class SQLiteGenerator(BasicGenerator):
                 full_col_sql = f"{quote_ident(col_name)} {col_type} {constraint_sql} {default_sql}".strip()
                 sql = f"ALTER TABLE {table_name} ADD COLUMN {full_col_sql};"
                 sqls.append(sql)
-                logger.debug(f"Generate sql: {sqls}")
+                if trace.enabled:
+                    trace.emit("sql", sql=sqls)
             return sqls
         return None
 
+    @staticmethod
+    def generate_table_options(table:Type[Table]):
+        table_name = table.__table_name__ or table.__name__
+        if _HAS_TABLE_LIST:
+            sql = f"PRAGMA table_list({table_name})" # columns wr (WITHOUT ROWID) and strict
+        else:
+            sql = f"SELECT sql FROM sqlite_master WHERE type = 'table' AND name = {format_default(table_name)}"
+        if trace.enabled:
+            trace.emit("sql", sql=sql)
+        return sql
+
     @staticmethod
     def generate_insert(obj:Table):
         table_name = obj.__table_name__ or obj.__class__.__name__
@@ -110,7 +139,8 @@ class SQLiteGenerator(BasicGenerator):
             values.append(column.to_db(value))
 
         sql = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({', '.join(placeholders)})"
-        logger.debug(f"Generate sql: {sql}, {values}")
+        if trace.enabled:
+            trace.emit("sql", sql=sql, values=values)
         return sql, tuple(values)
     
     @staticmethod
@@ -124,11 +154,14 @@ class SQLiteGenerator(BasicGenerator):
         if not obj.get_primary_keys():
             raise errors.NoPrimaryKeyError()
 
+        version = obj._version_column
         for name, column in obj._columns.items():
             value = getattr(obj, name, column.default)
             if column.primary_key:
                 where_parts.append(f"{name} = ?")
                 where_values.append(column.to_db(value))
+            elif name == version:
+                continue
             elif not column.auto_increment:
                 if cover or name in obj._edited:
                     set_parts.append(f"{name} = ?")
@@ -137,8 +170,15 @@ class SQLiteGenerator(BasicGenerator):
         if not set_parts:
             return None , tuple()
 
+        if version is not None:
+            # optimistic check: only the version the object was loaded with may be overwritten
+            set_parts.append(f"{version} = {version} + 1")
+            where_parts.append(f"{version} = ?")
+            where_values.append(obj._columns[version].to_db(getattr(obj, version)))
+
         sql = f"UPDATE {table_name} SET {', '.join(set_parts)} WHERE {' AND '.join(where_parts)}"
-        logger.debug(f"Generate sql: {sql}, {set_values + where_values}")
+        if trace.enabled:
+            trace.emit("sql", sql=sql, values=set_values + where_values)
         return sql, tuple(set_values + where_values)
     
     @staticmethod
@@ -162,7 +202,8 @@ class SQLiteGenerator(BasicGenerator):
             
 
         sql = f"UPDATE {table_name} SET {', '.join(set_parts)} WHERE {where_sql}"
-        logger.debug(f"Generate sql: {sql}, {set_values + list(where_values)}")
+        if trace.enabled:
+            trace.emit("sql", sql=sql, values=set_values + list(where_values))
         return sql, tuple(set_values + list(where_values))
     
     @staticmethod
@@ -185,7 +226,8 @@ class SQLiteGenerator(BasicGenerator):
                 raise errors.NoPrimaryKeyError("Cannot delete without a primary key.")
 
             sql = f"DELETE FROM {table_name} WHERE {' AND '.join(where_parts)}"
-            logger.debug(f"Generate sql: {sql}, {where_values}")
+            if trace.enabled:
+                trace.emit("sql", sql=sql, values=where_values)
             return sql, tuple(where_values)
         else: # delete by filters
             if not filters:
@@ -196,40 +238,120 @@ class SQLiteGenerator(BasicGenerator):
             else:
                 where_clause, values = translate_sqlite_security(filters)
                 sql = f"DELETE FROM {table_name} WHERE {where_clause}"
-                logger.debug(f"Generate sql: {sql}, {values}")
+                if trace.enabled:
+                    trace.emit("sql", sql=sql, values=values)
                 return sql, tuple(values)
     
     @staticmethod
     def generate_index(table:Type[Table]):
+        sqls = [SQLiteGenerator.generate_create_index(table, index) for index in table._indexes]
+        if trace.enabled:
+            trace.emit("sql", sql=sqls)
+        return sqls
+
+    @staticmethod
+    def generate_create_index(table:Type[Table], index:Index):
         table_name = table.__table_name__ or table.__name__
+        columns_sql = ", ".join(_index_part(part) for part in index.parts)
+        where_sql = f" WHERE {translate_sqlite_literal(index.where)}" if index.where is not None else ""
+        index_name = index.name or _index_name(table_name, index, columns_sql + where_sql)
+        unique_sql = "UNIQUE " if index.unique else ""
+        return f"CREATE {unique_sql}INDEX IF NOT EXISTS {quote_ident(index_name)} ON {table_name} ({columns_sql}){where_sql}"
+
+    @staticmethod
+    def generate_index_list(table:Type[Table]):
+        table_name = table.__table_name__ or table.__name__
+        # sql IS NULL: the automatic indexes of UNIQUE / PRIMARY KEY constraints
+        sql = f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = '{table_name}' AND sql IS NOT NULL"
+        if trace.enabled:
+            trace.emit("sql", sql=sql)
+        return sql
+
+    @staticmethod
+    def generate_update_index(table:Type[Table], org_indexes):
+        """
+        `org_indexes`: the (name, sql) rows of `generate_index_list`. Indexes managed by the table
+        (declared, or named `<table>_..._idx`) that no longer match a declaration are dropped,
+        the missing ones are created.
+        """
+        table_name = table.__table_name__ or table.__name__
+        wanted = {}
+        for sql in SQLiteGenerator.generate_index(table):
+            wanted[sql.replace(" IF NOT EXISTS", "", 1)] = sql # sqlite_master keeps the statement without IF NOT EXISTS
+        declared = {index.name for index in table._indexes if index.name}
+
         sqls = []
-        for col_name in table._indexes:
-            index_name = f"{table_name}_{col_name}_idx"
-            col = table._columns[col_name]
-            unique_sql = "UNIQUE " if col.unique else ""
-            sql = f"CREATE {unique_sql}INDEX IF NOT EXISTS {quote_ident(index_name)} ON {table_name} ({quote_ident(col_name)})"
-            sqls.append(sql)
-        logger.debug(f"Generate sql: {sqls}")
+        existing = set()
+        for name, org_sql in org_indexes:
+            if org_sql in wanted:
+                existing.add(org_sql)
+            elif name in declared or (name.startswith(f"{table_name}_") and name.endswith("_idx")):
+                sqls.append(f"DROP INDEX IF EXISTS {quote_ident(name)}")
+        sqls += [sql for key, sql in wanted.items() if key not in existing]
+        if trace.enabled:
+            trace.emit("sql", sql=sqls)
         return sqls
     
+    @staticmethod
+    def generate_schema_fingerprint(table:Type[Table]):
+        ddl = [SQLiteGenerator.generate_create_table(table)] + sorted(SQLiteGenerator.generate_index(table))
+        return hashlib.sha1("\n".join(ddl).encode()).hexdigest()
+
+    @staticmethod
+    def generate_create_schema_table():
+        return f"CREATE TABLE IF NOT EXISTS {SCHEMA_TABLE} (table_name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)"
+
+    @staticmethod
+    def generate_select_schema():
+        return (
+            f"SELECT m.name, s.fingerprint FROM sqlite_master m "
+            f"LEFT JOIN {SCHEMA_TABLE} s ON s.table_name = m.name WHERE m.type = 'table'"
+        )
+
+    @staticmethod
+    def generate_save_schema():
+        return f"INSERT OR REPLACE INTO {SCHEMA_TABLE} (table_name, fingerprint) VALUES (?, ?)"
+
+    @staticmethod
+    def generate_change_capture(table:Type[Table], log_table:str):
+        table_name = table.__table_name__ or table.__name__
+        record = f"INSERT OR IGNORE INTO {log_table} (rid) VALUES"
+        sqls = [
+            f"CREATE TABLE IF NOT EXISTS {log_table} (rid INTEGER PRIMARY KEY)",
+            f"CREATE TRIGGER IF NOT EXISTS {quote_ident(table_name + '_capture_ins')} AFTER INSERT ON {table_name} "
+            f"BEGIN {record} (NEW.rowid); END",
+            f"CREATE TRIGGER IF NOT EXISTS {quote_ident(table_name + '_capture_upd')} AFTER UPDATE ON {table_name} "
+            f"BEGIN {record} (OLD.rowid); {record} (NEW.rowid); END",
+            f"CREATE TRIGGER IF NOT EXISTS {quote_ident(table_name + '_capture_del')} AFTER DELETE ON {table_name} "
+            f"BEGIN {record} (OLD.rowid); END",
+        ]
+        if trace.enabled:
+            trace.emit("sql", sql=sqls)
+        return sqls
+
+    @staticmethod
+    def generate_drop_change_capture(table:Type[Table], log_table:str):
+        table_name = table.__table_name__ or table.__name__
+        sqls = [f"DROP TRIGGER IF EXISTS {quote_ident(table_name + suffix)}" for suffix in ("_capture_ins", "_capture_upd", "_capture_del")]
+        sqls.append(f"DROP TABLE IF EXISTS {log_table}")
+        if trace.enabled:
+            trace.emit("sql", sql=sqls)
+        return sqls
+
     @staticmethod
     def generate_drop(table:Type[Table]):
         table_name = table.__table_name__ or table.__name__
         sql = f"DROP table {table_name}"
-        logger.debug(f"Generate sql: {sql}")
+        if trace.enabled:
+            trace.emit("sql", sql=sql)
         return sql
     
     @staticmethod
     def generate_select(table: Type[Table], columns=None, filters=None, order_by=None, limit=None, ref_obj:Table=None) -> tuple[str, list]:
         table_name = table.__table_name__ or table.__name__
         valid_columns = table._columns.keys()
-        logger.debug(f"try to generate select:")
-        logger.debug(f" - table:    {type(table)}")
-        logger.debug(f" - columns:  {columns}")
-        logger.debug(f" - filters:  {repr(filters)}")
-        logger.debug(f" - order_by: {order_by}")
-        logger.debug(f" - limit:    {limit}")
-        logger.debug(f" - ref_obj:  {ref_obj}")
+        if trace.enabled:
+            trace.emit("select", table=table_name, columns=columns, filters=filters, order_by=order_by, limit=limit, ref_obj=ref_obj)
 
         if not columns:
             select_clause = "*"
@@ -270,7 +392,10 @@ class SQLiteGenerator(BasicGenerator):
         if isinstance(limit, int) and limit > 0: # SQL inject protect
             sql += f" LIMIT {limit}"
 
-        logger.debug(f"Generate sql: {sql}, {values}")
+        if _query_recorder is not None and filters:
+            _query_recorder(table, filters, sql)
+        if trace.enabled:
+            trace.emit("sql", sql=sql, values=values)
         return sql, values
     
     @staticmethod
@@ -282,7 +407,78 @@ class SQLiteGenerator(BasicGenerator):
         if filters:
             where_clause, values = translate_sqlite_security(filters, ref_obj)
             sql += " WHERE " + where_clause
-        logger.debug(f"Generate sql: {sql}, {values}")
+            if _query_recorder is not None:
+                _query_recorder(table, filters, sql)
+        if trace.enabled:
+            trace.emit("sql", sql=sql, values=values)
+        return sql, values
+
+    @staticmethod
+    def generate_exists(table: Type[Table], filters=None, ref_obj:Table=None) -> tuple[str, list]:
+        table_name = table.__table_name__ or table.__name__
+
+        sql = f"SELECT 1 FROM {table_name}"
+        values = []
+        if filters:
+            where_clause, values = translate_sqlite_security(filters, ref_obj)
+            sql += " WHERE " + where_clause
+            if _query_recorder is not None:
+                _query_recorder(table, filters, sql)
+        sql += " LIMIT 1"
+        if trace.enabled:
+            trace.emit("sql", sql=sql, values=values)
+        return sql, values
+
+    @staticmethod
+    def generate_aggregate(table: Type[Table], aggregates, group_by=None, filters=None, having=None, order_by=None, limit=None, ref_obj:Table=None) -> tuple[str, list]:
+        table_name = table.__table_name__ or table.__name__
+        valid_columns = table._columns.keys()
+        group_by = group_by or []
+        if not aggregates and not group_by:
+            raise ValueError("aggregate requires at least one aggregate function or group_by column")
+
+        select_parts = []
+        select_values = []
+        for col in group_by:
+            if col not in valid_columns:
+                raise errors.NoSuchColumn(col)
+            select_parts.append(col)
+        for alias, op in aggregates:
+            agg_sql, agg_values = translate_sqlite_security(op, ref_obj)
+            select_parts.append(f"{agg_sql} AS {quote_ident(alias)}")
+            select_values.extend(agg_values)
+
+        sql = f"SELECT {', '.join(select_parts)} FROM {table_name}"
+        values = select_values
+
+        if filters:
+            where_clause, where_values = translate_sqlite_security(filters, ref_obj)
+            sql += " WHERE " + where_clause
+            values += where_values
+
+        if group_by:
+            sql += " GROUP BY " + ", ".join(group_by)
+
+        if having:
+            having_clause, having_values = translate_sqlite_security(having, ref_obj)
+            sql += " HAVING " + having_clause
+            values += having_values
+
+        if order_by:
+            valid_orders = set(group_by) | {alias for alias, _ in aggregates}
+            order_by_clause = []
+            for col in order_by:
+                col_name, direction = (col[1:], "DESC") if col.startswith("-") else (col, "ASC")
+                if col_name not in valid_orders:
+                    raise errors.NoSuchColumn(col_name)
+                order_by_clause.append(f"{quote_ident(col_name)} {direction}")
+            sql += " ORDER BY " + ", ".join(order_by_clause)
+
+        if isinstance(limit, int) and limit > 0: # SQL inject protect
+            sql += f" LIMIT {limit}"
+
+        if trace.enabled:
+            trace.emit("sql", sql=sql, values=values)
         return sql, values
 
 def quote_ident(name: str) -> str:
@@ -298,6 +494,30 @@ def format_default(val: any) -> str:
     s = str(val).replace("'", "''")  # escape single quotes
     return f"'{s}'"
 
+_STRICT_TYPES = {"INT", "INTEGER", "REAL", "TEXT", "BLOB", "ANY"}
+_STRICT_FALLBACK = {"DATETIME": "TEXT"}
+
+def _column_type(table: Type[Table], column) -> str:
+    """ the declared type, STRICT tables only accept INT / INTEGER / REAL / TEXT / BLOB / ANY """
+    col_type = column._type['sqlite']
+    if table.__strict__ and col_type not in _STRICT_TYPES:
+        return _STRICT_FALLBACK.get(col_type, "ANY")
+    return col_type
+
+def _index_part(part) -> str:
+    if isinstance(part, Operator):
+        return translate_sqlite_literal(part)
+    if isinstance(part, str):
+        return f"{quote_ident(part[1:])} DESC" if part.startswith("-") else quote_ident(part)
+    return quote_ident(part._name)
+
+def _index_name(table_name: str, index, definition: str) -> str:
+    """ `<table>_<columns>_idx`, expressions and partial indexes get a hash of their definition so a change renames them """
+    name = "_".join([table_name] + index.column_names())
+    if index.where is not None or len(index.column_names()) != len(index.parts):
+        name += "_" + hashlib.sha1(definition.encode()).hexdigest()[:8]
+    return name + "_idx"
+
 def get_table_name(obj_or_table: Table | Type[Table]) -> str:
     if isinstance(obj_or_table, type):
         return obj_or_table.__table_name__ or obj_or_table.__name__
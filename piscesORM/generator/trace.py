@@ -0,0 +1,76 @@
+from __future__ import annotations
+import logging
+from typing import Callable
+logger = logging.getLogger("piscesORM")
+
+"""
+note:
+Debug trace of the generators. Tracing is off by default and the generators only test the module flag:
+```
+if trace.enabled:
+    trace.emit("sql", sql=sql, values=values)
+```
+so nothing is formatted (no f-string, no `repr(filters)`) unless a sink listens.
+`enabled` is computed once by `enable()` / `disable()` / `refresh()`, not on every call;
+call `refresh()` after changing the "piscesORM" logger level by hand.
+"""
+
+enabled = False
+""" cached guard, True while at least one sink listens """
+
+_sinks: list[Callable[[TraceEvent], None]] = []
+_log_events = False
+
+
+class TraceEvent:
+    """ One structured trace event: a name ("sql", "select", ...) and its fields. Formatted only when printed. """
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+
+    def __str__(self):
+        if self.name == "sql":
+            values = self.fields.get("values")
+            return f"Generate sql: {self.fields['sql']}" + (f", {values}" if values is not None else "")
+        return f"{self.name}: " + ", ".join(f"{key}={value!r}" for key, value in self.fields.items())
+
+    def __repr__(self):
+        return f"<TraceEvent {self.name} {self.fields!r}>"
+
+
+def enable(sink: Callable[[TraceEvent], None] = None):
+    """
+    Start tracing. Without `sink` the events go to the "piscesORM" logger at DEBUG level
+    (only while that level is enabled); a sink is called with every TraceEvent.
+    """
+    global _log_events
+    if sink is None:
+        _log_events = True
+    elif sink not in _sinks:
+        _sinks.append(sink)
+    refresh()
+
+def disable(sink: Callable[[TraceEvent], None] = None):
+    """ Stop one sink, or every sink and the logger output when `sink` is None. """
+    global _log_events
+    if sink is None:
+        _log_events = False
+        _sinks.clear()
+    elif sink in _sinks:
+        _sinks.remove(sink)
+    refresh()
+
+def refresh():
+    """ Recompute the cached guard. """
+    global enabled
+    enabled = bool(_sinks) or (_log_events and logger.isEnabledFor(logging.DEBUG))
+
+def emit(name: str, **fields):
+    """ Send an event to the sinks. Call it behind `if trace.enabled:` """
+    event = TraceEvent(name, fields)
+    if _log_events:
+        logger.debug("%s", event)
+    for sink in _sinks:
+        sink(event)
@@ -1,6 +1,7 @@
 from typing import TypeVar
 _T = TypeVar("_T")
 
-from .toolbox import _get_autounlock_time, generateLockKey
+from .toolbox import _get_autounlock_time, generateLockKey, LOCK_MODES
 from .asyncLock import AsyncLockManager, AsyncLockClient, AsyncLock, AsyncRowLock
-from .threadingLock import SyncLockManager, SyncLockClient, SyncLock, SyncRowLock 
\ No newline at end of file
+from .threadingLock import SyncLockManager, SyncLockClient, SyncLock, SyncRowLock 
+from .sqliteLock import SQLiteLockManager, AsyncSQLiteLockManager
\ No newline at end of file
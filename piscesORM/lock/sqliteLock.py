@@ -0,0 +1,460 @@
+from __future__ import annotations
+import os
+import mmap
+import struct
+import sqlite3
+import threading
+import time
+import random
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Optional, Dict, List
+from .._setting import setting
+from .. import errors
+from .toolbox import _COMPATIBLE, _COVERS, _check_mode, _join_mode, _LockStatsMixin
+from .threadingLock import SyncLockClient
+from .asyncLock import AsyncLockClient
+
+logger = logging.getLogger("piscesORM")
+
+"""
+note:
+Cross-process lock managers. The lock state lives in a dedicated SQLite file shared by every process:
+- pisces_lock: one lease row per (key, owner) with its mode and expiry time (NULL: never expires).
+- pisces_lock_wait: the key each waiting owner is blocked on, used to detect deadlocks across processes.
+Every change runs inside `BEGIN IMMEDIATE`, so reading the holders and writing the lease is one compare-and-set.
+Waiters do not poll the file: they watch a counter in a memory-mapped sidecar file (`<path>-notify`),
+bumped whenever the holders change, and only retry when it changes (or a blocking lease expires).
+
+The managers hand out the usual `SyncLockClient` / `AsyncLockClient`, so they plug into the engines
+through `lock_manager=`. User names must be unique across processes, `login()` without a name takes care of it.
+Requests are not queued across processes, so there is no FIFO fairness like the in-process managers.
+"""
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS pisces_lock ("
+    "key TEXT NOT NULL, owner TEXT NOT NULL, mode TEXT NOT NULL, expires REAL, "
+    "PRIMARY KEY (key, owner)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS pisces_lock_wait ("
+    "owner TEXT PRIMARY KEY, key TEXT NOT NULL, mode TEXT NOT NULL, expires REAL NOT NULL) WITHOUT ROWID",
+)
+
+class _Notifier:
+    """ A change counter in a memory-mapped file, shared by every process using the same lock file. """
+    def __init__(self, path: str):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if os.fstat(fd).st_size < 8:
+                os.ftruncate(fd, 8)
+            self._map = mmap.mmap(fd, 8)
+        finally:
+            os.close(fd)
+
+    def value(self) -> int:
+        return struct.unpack_from("Q", self._map)[0]
+
+    def bump(self):
+        # not atomic across processes, but a lost increment still changes the value a waiter has seen
+        struct.pack_into("Q", self._map, 0, (self.value() + 1) & 0xFFFFFFFFFFFFFFFF)
+
+    def close(self):
+        self._map.close()
+
+
+class _SQLiteLockStore:
+    """ The lock file and its operations, shared by the sync and async managers. """
+    def __init__(self, path: str):
+        self.path = path
+        self.notifier = _Notifier(f"{path}-notify")
+        self._local = threading.local() # sqlite3 connections can't be shared between threads
+        self.on_forced = None # called as on_forced(key, owners) after expired leases are dropped
+        conn = self._connect()
+        for sql in _SCHEMA:
+            conn.execute(sql)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _immediate(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def try_acquire(self, key: str, owner: str, mode: str, timeout: float) -> tuple[bool, str, Optional[float], Optional[str]]:
+        """
+        Compare-and-set a lease.
+        Returns (granted, the mode needed, the earliest expiry of the blocking leases, the mode held before).
+        Holding a mode that covers the request renews the lease, a stronger request upgrades it.
+        """
+        now = time.time()
+        with self._immediate() as conn:
+            expired = conn.execute(
+                "SELECT owner FROM pisces_lock WHERE key = ? AND expires IS NOT NULL AND expires <= ?", (key, now)).fetchall()
+            if expired:
+                conn.execute("DELETE FROM pisces_lock WHERE key = ? AND expires IS NOT NULL AND expires <= ?", (key, now))
+            rows = conn.execute("SELECT owner, mode, expires FROM pisces_lock WHERE key = ?", (key,)).fetchall()
+            held = next((m for o, m, _ in rows if o == owner), None)
+            wanted = held if held is not None and mode in _COVERS[held] else _join_mode(held, mode)
+            blockers = [e for o, m, e in rows if o != owner and m not in _COMPATIBLE[wanted]]
+            if blockers:
+                granted = False
+            else:
+                conn.execute("INSERT OR REPLACE INTO pisces_lock VALUES (?, ?, ?, ?)",
+                             (key, owner, wanted, now + timeout if timeout > 0 else None))
+                granted = True
+        if expired:
+            logger.warning(f"Lock '{key}' forcibly released from expired owner: {', '.join(o for o, in expired)}.")
+            if self.on_forced is not None:
+                self.on_forced(key, [o for o, in expired])
+        if expired or granted:
+            self.notifier.bump() # the holders changed, waiters retry and re-check deadlocks
+        return granted, wanted, min((e for e in blockers if e is not None), default=None), held
+
+    def register_wait(self, key: str, owner: str, mode: str) -> Optional[List[str]]:
+        """ Record that `owner` waits for `key`, returns the wait-for cycle it closes (and withdraws it), if any. """
+        now = time.time()
+        with self._immediate() as conn:
+            conn.execute("DELETE FROM pisces_lock_wait WHERE expires <= ?", (now,))
+            conn.execute("INSERT OR REPLACE INTO pisces_lock_wait VALUES (?, ?, ?, ?)",
+                         (owner, key, mode, now + 2 * _wait_refresh()))
+            waits = {o: (k, m) for o, k, m in conn.execute("SELECT owner, key, mode FROM pisces_lock_wait")}
+            holders: Dict[str, List[tuple[str, str]]] = {}
+            for k, o, m in conn.execute(
+                    "SELECT key, owner, mode FROM pisces_lock WHERE key IN (SELECT key FROM pisces_lock_wait) "
+                    "AND (expires IS NULL OR expires > ?)", (now,)):
+                holders.setdefault(k, []).append((o, m))
+            cycle = _find_db_cycle(owner, waits, holders)
+            if cycle:
+                conn.execute("DELETE FROM pisces_lock_wait WHERE owner = ?", (owner,))
+        return cycle
+
+    def clear_wait(self, owner: str):
+        self._connect().execute("DELETE FROM pisces_lock_wait WHERE owner = ?", (owner,))
+
+    def release(self, key: str, owner: str) -> bool:
+        cursor = self._connect().execute("DELETE FROM pisces_lock WHERE key = ? AND owner = ?", (key, owner))
+        if cursor.rowcount:
+            self.notifier.bump()
+        return bool(cursor.rowcount)
+
+    def release_owner(self, owner: str):
+        """ Drop every lease and wait of an owner. """
+        conn = self._connect()
+        conn.execute("DELETE FROM pisces_lock_wait WHERE owner = ?", (owner,))
+        if conn.execute("DELETE FROM pisces_lock WHERE owner = ?", (owner,)).rowcount:
+            self.notifier.bump()
+
+    def downgrade(self, key: str, owner: str, mode: str):
+        with self._immediate() as conn:
+            row = conn.execute("SELECT mode FROM pisces_lock WHERE key = ? AND owner = ?", (key, owner)).fetchone()
+            changed = row is not None and mode in _COVERS[row[0]] and mode != row[0]
+            if changed:
+                conn.execute("UPDATE pisces_lock SET mode = ? WHERE key = ? AND owner = ?", (mode, key, owner))
+        if changed:
+            self.notifier.bump()
+
+    def waiting(self) -> Dict[str, int]:
+        """ key -> number of live waiters, over every process """
+        rows = self._connect().execute(
+            "SELECT key, COUNT(*) FROM pisces_lock_wait WHERE expires > ? GROUP BY key", (time.time(),))
+        return dict(rows.fetchall())
+
+    def holders(self, key: str) -> Dict[str, tuple[str, Optional[float]]]:
+        """ owner -> (mode, expires) of the leases of `key`, expired ones included """
+        rows = self._connect().execute("SELECT owner, mode, expires FROM pisces_lock WHERE key = ?", (key,))
+        return {o: (m, e) for o, m, e in rows}
+
+    def wait_change(self, seen: int, timeout: float):
+        """ Sleep until the notifier moves past `seen` or `timeout` passes, with a growing step. """
+        end = time.monotonic() + timeout
+        step = 0.0005
+        while self.notifier.value() == seen:
+            delay = min(step, end - time.monotonic())
+            if delay <= 0:
+                return
+            time.sleep(delay)
+            step = min(step * 2, setting.lock_poll_interval)
+
+    async def async_wait_change(self, seen: int, timeout: float):
+        loop = asyncio.get_running_loop()
+        end = loop.time() + timeout
+        step = 0.0005
+        while self.notifier.value() == seen:
+            delay = min(step, end - loop.time())
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+            step = min(step * 2, setting.lock_poll_interval)
+
+
+def _find_db_cycle(start: str, waits: Dict[str, tuple[str, str]], holders: Dict[str, List[tuple[str, str]]]) -> Optional[List[str]]:
+    """ The same walk as `toolbox._find_cycle`, on the wait and lease rows of the lock file. """
+    stack = [(start, [start])]
+    seen = {start}
+    while stack:
+        owner, path = stack.pop()
+        entry = waits.get(owner)
+        if entry is None:
+            continue
+        key, mode = entry
+        for blocker, held in holders.get(key, []):
+            if blocker == owner or held in _COMPATIBLE[mode]:
+                continue
+            if blocker == start:
+                return path
+            if blocker not in seen:
+                seen.add(blocker)
+                stack.append((blocker, path + [blocker]))
+    return None
+
+def _wait_refresh() -> float:
+    """ Longest wait between two registrations of a waiter, its wait row lives twice as long. """
+    return max(0.5, 2 * setting.lock_poll_interval)
+
+def _wait_limit(wake_at: Optional[float], end: Optional[float]) -> float:
+    """ How long to wait for a change: until a blocking lease expires, the wait times out or the wait row needs a refresh. """
+    limits = [_wait_refresh()]
+    if wake_at is not None:
+        limits.append(wake_at - time.time())
+    if end is not None:
+        limits.append(end - time.monotonic())
+    return max(0.0, min(limits))
+
+
+class SQLiteRowLock:
+    """ One key of the lock file, with the interface of `SyncRowLock` used by `SyncLockClient`. """
+    def __init__(self, store: _SQLiteLockStore, key: str):
+        self._store = store
+        self.key = key
+
+    def acquire(self, owner: str, timeout: float, mode: str = "x", wait_timeout: float = 0, on_wait = None, key: str = ""):
+        """ Acquire the lease until it is available, see `SyncRowLock.acquire`. """
+        mode = _check_mode(mode)
+        end = time.monotonic() + wait_timeout if wait_timeout else None
+        waiting = False
+        try:
+            while True:
+                seen = self._store.notifier.value()
+                granted, wanted, wake_at, _ = self._store.try_acquire(self.key, owner, mode, timeout)
+                if granted:
+                    break
+                waiting = True
+                cycle = self._store.register_wait(self.key, owner, wanted)
+                if cycle:
+                    logger.warning(f"Deadlock detected, victim: {owner}, cycle: {cycle}")
+                    raise errors.DeadlockDetected(owner, cycle)
+                if end is not None and time.monotonic() >= end:
+                    raise errors.LockTimeout(owner, self.key, wait_timeout)
+                self._store.wait_change(seen, _wait_limit(wake_at, end))
+        finally:
+            if waiting:
+                self._store.clear_wait(owner)
+        logger.debug(f"SQLiteRowLock '{self.key}' acquired by {owner} ({mode}).")
+
+    def downgrade(self, owner: str, mode: str = "s"):
+        """ Weaken the owner's lease to `mode` (exclusive to shared by default) """
+        self._store.downgrade(self.key, owner, mode)
+
+    def release(self, owner: str):
+        """ Release lease by owner"""
+        if not self._store.release(self.key, owner):
+            logger.warning(f"Attempt to release '{self.key}' by non-owner: {owner}")
+
+    def get_mode(self, owner: str) -> Optional[str]:
+        """ The owner's mode, None if it holds no live lease """
+        mode, expires = self._store.holders(self.key).get(owner, (None, None))
+        if mode is None or (expires is not None and time.time() > expires):
+            return None
+        return mode
+
+    def get_owners(self) -> Dict[str, str]:
+        now = time.time()
+        return {o: m for o, (m, e) in self._store.holders(self.key).items() if e is None or now <= e}
+
+    def get_owner(self) -> Optional[str]:
+        """ The exclusive owner """
+        return next((o for o, m in self.get_owners().items() if m == "x"), None)
+
+    def is_locked(self) -> bool:
+        return bool(self.get_owners())
+
+    def is_expired(self, owner: Optional[str] = None) -> bool:
+        """ Check if the owner's lease (any lease if owner is None) is expired """
+        now = time.time()
+        leases = self._store.holders(self.key)
+        if owner is not None:
+            leases = {owner: leases[owner]} if owner in leases else {}
+        return any(e is not None and now > e for _, e in leases.values())
+
+
+class AsyncSQLiteRowLock(SQLiteRowLock):
+    """
+    `SQLiteRowLock` with the interface of `AsyncRowLock`. `acquire()` runs its lock file transactions
+    (which may wait on the file's busy timeout) in the loop's default executor and waits for changes with
+    `asyncio.sleep`, so it never blocks the event loop.
+    `release()`, `downgrade()` and `get_mode()` stay synchronous like `AsyncRowLock`'s (`AsyncLockClient.release()` is sync):
+    each is a single statement that only waits while another process is inside one of these short transactions.
+    """
+    async def acquire(self, owner: str, timeout: float, mode: str = "x", wait_timeout: float = 0, on_wait = None, key: str = ""):
+        mode = _check_mode(mode)
+        end = time.monotonic() + wait_timeout if wait_timeout else None
+        loop = asyncio.get_running_loop()
+        waiting = False
+        try:
+            while True:
+                seen = self._store.notifier.value()
+                attempt = loop.run_in_executor(None, self._store.try_acquire, self.key, owner, mode, timeout)
+                try:
+                    granted, wanted, wake_at, _ = await asyncio.shield(attempt)
+                except asyncio.CancelledError:
+                    attempt.add_done_callback(self._undo_abandoned(loop, owner)) # the worker may still grant it
+                    raise
+                if granted:
+                    break
+                waiting = True
+                cycle = await loop.run_in_executor(None, self._store.register_wait, self.key, owner, wanted)
+                if cycle:
+                    logger.warning(f"Deadlock detected, victim: {owner}, cycle: {cycle}")
+                    raise errors.DeadlockDetected(owner, cycle)
+                if end is not None and time.monotonic() >= end:
+                    raise errors.LockTimeout(owner, self.key, wait_timeout)
+                await self._store.async_wait_change(seen, _wait_limit(wake_at, end))
+        finally:
+            if waiting:
+                await loop.run_in_executor(None, self._store.clear_wait, owner)
+        logger.debug(f"AsyncSQLiteRowLock '{self.key}' acquired by {owner} ({mode}).")
+
+    def _undo_abandoned(self, loop: asyncio.AbstractEventLoop, owner: str):
+        """ Done callback of a cancelled `try_acquire`: give back what it granted, the caller never learns of it. """
+        def undo(attempt: asyncio.Future):
+            if attempt.cancelled() or attempt.exception() is not None:
+                return
+            granted, wanted, _, held = attempt.result()
+            if not granted or wanted == held:
+                return
+            if held is None:
+                loop.run_in_executor(None, self._store.release, self.key, owner)
+            else:
+                loop.run_in_executor(None, self._store.downgrade, self.key, owner, held)
+        return undo
+
+
+class _SQLiteLockManagerBase(_LockStatsMixin):
+    """
+    The hooks `SyncLockClient` / `AsyncLockClient` call on their manager. Leases expire in the lock file itself.
+    `stats()` counts this process only, except the current waiters which come from the lock file.
+    """
+    def __init__(self, path: str):
+        self._store = _SQLiteLockStore(path)
+        self._store.on_forced = self._on_forced
+        self._manager_lock = threading.Lock() # protect self._login_users
+        self._login_users: Dict[str, object] = {}
+
+    def _on_forced(self, key: str, owners: List[str]):
+        if self._stats is not None:
+            for owner in owners:
+                self._stats.released(key, owner, forced=True)
+
+    def _current_waiters(self) -> Dict[str, int]:
+        return self._store.waiting()
+
+    def _check_deadlock(self, lock, waiter):
+        pass # done by the lock file, see _SQLiteLockStore.register_wait
+
+    def _clear_wait(self, owner: str, waiter):
+        pass
+
+    def _schedule_expiry(self, key: str, lock, owner: str):
+        pass
+
+    def _mark_idle(self, key: str, lock):
+        pass
+
+    def _unpin(self, locks: Dict[str, object]):
+        pass # the lock objects are handles on the lock file, nothing to reclaim
+
+    def _new_user(self, user: Optional[str]) -> str:
+        while not user or user in self._login_users:
+            user = f"user_{os.getpid()}_{random.randint(10000, 99999)}"
+        return user
+
+    def purge(self):
+        """ Delete the expired leases and waits of the whole lock file """
+        now = time.time()
+        with self._store._immediate() as conn:
+            conn.execute("DELETE FROM pisces_lock WHERE expires IS NOT NULL AND expires <= ?", (now,))
+            conn.execute("DELETE FROM pisces_lock_wait WHERE expires <= ?", (now,))
+        self._store.notifier.bump()
+        self._log_stats()
+
+
+class SQLiteLockManager(_SQLiteLockManagerBase):
+    """ A lock manager shared by several processes through a SQLite lock file. """
+    def getLock(self, key: str) -> SQLiteRowLock:
+        return SQLiteRowLock(self._store, key)
+
+    def getLocks(self, keys: List[str], pin: bool = False) -> Dict[str, SQLiteRowLock]:
+        return {key: SQLiteRowLock(self._store, key) for key in keys}
+
+    def login(self, user: Optional[str] = None, relogin = False) -> SyncLockClient:
+        with self._manager_lock:
+            if user in self._login_users:
+                if not relogin:
+                    raise errors.UserAlreadyLogin(user)
+                return self._login_users[user]
+            _user = self._new_user(user)
+            client = SyncLockClient(self, _user)
+            self._login_users[_user] = client
+        return client
+
+    def logout(self, user: str):
+        with self._manager_lock:
+            client = self._login_users.pop(user, None)
+        if client:
+            client._cleanup()
+            self._store.release_owner(user)
+            logger.info(f"SyncLockClient for user {user} logged out successfully.")
+        else:
+            logger.warning(f"SyncLockClient for user {user} not found during logout.")
+
+
+class AsyncSQLiteLockManager(_SQLiteLockManagerBase):
+    """ The async version of `SQLiteLockManager`. """
+    async def getLock(self, key: str) -> AsyncSQLiteRowLock:
+        return AsyncSQLiteRowLock(self._store, key)
+
+    async def getLocks(self, keys: List[str], pin: bool = False) -> Dict[str, AsyncSQLiteRowLock]:
+        return {key: AsyncSQLiteRowLock(self._store, key) for key in keys}
+
+    async def login(self, user: Optional[str] = None, relogin = False) -> AsyncLockClient:
+        with self._manager_lock:
+            if user in self._login_users:
+                if not relogin:
+                    raise errors.UserAlreadyLogin(user)
+                return self._login_users[user]
+            _user = self._new_user(user)
+            client = AsyncLockClient(self, _user)
+            self._login_users[_user] = client
+        return client
+
+    async def logout(self, user: str):
+        with self._manager_lock:
+            client = self._login_users.pop(user, None)
+        if client:
+            await client._cleanup()
+            self._store.release_owner(user)
+            logger.info(f"AsyncLockClient for user {user} logged out successfully.")
+        else:
+            logger.warning(f"AsyncLockClient for user {user} not found during logout.")
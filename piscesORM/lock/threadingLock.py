@@ -3,27 +3,55 @@ import threading
 import time
 import logging
 import random
+import heapq
+import itertools
+from collections import OrderedDict
 from threading import Lock as SyncLock
 from contextlib import contextmanager, ExitStack
 from typing import TypeVar, Type, List, Optional, Dict, Any, Union
 from .._setting import setting
 from .. import errors
 from . import _T, _get_autounlock_time
+from .toolbox import _RowLockState, _Waiter, _check_mode, _COVERS, _join_mode, _deadline, _parent_key, _lock_plan, _get_wait_timeout, _find_cycle, _LockStatsMixin
 
 logger = logging.getLogger("piscesORM")
 
 # =========== Sync Lock ===========
-class SyncLockManager:
-    """ The real Lock manager who create, distribute, and collect locks"""
+class _SyncLockStripe:
+    """ A shard of the lock table, guarded by its own mutex. """
+    __slots__ = ("locks", "idle", "mutex")
+
     def __init__(self):
-        self._locks: Dict[str, SyncRowLock] = {}
-        self._manager_lock = SyncLock() # protect self._locks
+        self.locks: Dict[str, SyncRowLock] = {}
+        self.idle: OrderedDict[str, float] = OrderedDict() # key -> time it became idle, oldest first
+        self.mutex = SyncLock() # protect self.locks and self.idle
+
+
+class SyncLockManager(_LockStatsMixin):
+    """ The real Lock manager who create, distribute, and collect locks"""
+    def __init__(self, stripes: Optional[int] = None):
+        self._stripes: List[_SyncLockStripe] = [_SyncLockStripe() for _ in range(stripes or setting.lock_stripes)]
+        self._manager_lock = SyncLock() # protect self._login_users
         self._login_users: Dict[str, SyncLockClient] = {}
+
+        # auto-unlock deadlines: (deadline, seq, key, lock, owner, token), stale entries are skipped when popped
+        self._expiry_heap: List[tuple[float, int, str, SyncRowLock, str, int]] = []
+        self._expiry_lock = SyncLock() # protect self._expiry_heap
+        self._expiry_seq = itertools.count()
+        self._wakeup = threading.Event()
+
+        # wait-for graph: owner -> (lock, request) it is blocked on
+        self._waits: Dict[str, Dict[_Waiter, SyncRowLock]] = {} # one entry per pending request, an owner may wait in several threads / tasks
+        self._graph_lock = SyncLock() # protect self._waits
+
         self._gc_task: Optional[threading.Thread] = None
         self._gc_running = False   # flag 控制循環
 
-    def start(self, interval: float = 5.0):
-        """啟動 GC 背景執行緒，每 interval 秒清理一次"""
+    def start(self, interval: Optional[float] = None):
+        """
+        啟動 GC 背景執行緒。執行緒會在最近的自動解鎖時間醒來，
+        最久每 interval 秒 (預設 setting.garbage_clean_cycle) 回收一次閒置的鎖
+        """
         if self._gc_task and self._gc_task.is_alive():
             logger.warning("GC task already running.")
             return
@@ -33,11 +61,15 @@ class SyncLockManager:
         def _gc_loop():
             logger.info("SyncLockManager GC thread started.")
             while self._gc_running:
+                self._wakeup.clear()
+                cycle = interval or setting.garbage_clean_cycle
+                next_deadline = None
                 try:
-                    self._garbage_collector()
+                    next_deadline = self._garbage_collector()
                 except Exception as e:
                     logger.exception(f"Error in GC loop: {e}")
-                time.sleep(interval)
+                delay = cycle if next_deadline is None else min(cycle, max(0.0, next_deadline - time.time()))
+                self._wakeup.wait(delay)
             logger.info("SyncLockManager GC thread stopped.")
 
         self._gc_task = threading.Thread(target=_gc_loop, daemon=True)
@@ -45,46 +77,152 @@ class SyncLockManager:
 
     def stop(self):
         self._gc_running = False
+        self._wakeup.set()
         if self._gc_task:
             self._gc_task.join(timeout=2.0)
             self._gc_task = None
 
-    def _garbage_collector(self):
-        """ Run a synchronous garbage collector for expired and unused locks """
-        logger.debug("Running SyncLockManager garbage collector...")
-        
-        expired_locks: List[SyncRowLock] = []
-        to_delete_locks: List[str] = []
+    def _get_stripe(self, key: str) -> _SyncLockStripe:
+        return self._stripes[hash(key) % len(self._stripes)]
 
-        with self._manager_lock:
-            # level 1: mark and collect
-            for key, lock in self._locks.items():
-                if lock.is_locked() and lock.is_expired():
-                    expired_locks.append(lock)
-
-                if not lock.is_locked() and lock._garbageMark:
-                    to_delete_locks.append(key)
-                else:
-                    lock._garbageMark = True
-
-        for lock in expired_locks:
-            lock._forceRelease()
-
-        if to_delete_locks:
-            with self._manager_lock:
-                for key in to_delete_locks:
-                    if key in self._locks and self._locks[key]._garbageMark and not self._locks[key].is_locked():
-                        del self._locks[key]
+    def _garbage_collector(self) -> Optional[float]:
+        """
+        Release the locks whose auto-unlock time has passed and reclaim locks idle for longer than
+        `setting.garbage_clean_cycle`. Returns the next auto-unlock deadline, or None.
+        """
+        next_deadline = self._expire_due()
+        self._reclaim_idle()
+        self._log_stats()
+        return next_deadline
+
+    def _schedule_expiry(self, key: str, lock: SyncRowLock, owner: str):
+        """ Track the auto-unlock deadline of a freshly acquired (or renewed) hold. """
+        with lock._meta_lock:
+            hold = lock.holders.get(owner)
+            if hold is None or hold.deadline == float('inf'):
+                return
+            deadline, token = hold.deadline, hold.token
+        with self._expiry_lock:
+            entry = (deadline, next(self._expiry_seq), key, lock, owner, token)
+            heapq.heappush(self._expiry_heap, entry)
+            is_earliest = self._expiry_heap[0] is entry
+        if is_earliest:
+            self._wakeup.set()
+
+    def _expire_due(self) -> Optional[float]:
+        now = time.time()
+        due = []
+        with self._expiry_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                due.append(heapq.heappop(self._expiry_heap))
+            next_deadline = self._expiry_heap[0][0] if self._expiry_heap else None
+
+        for _, _, key, lock, owner, token in due:
+            if lock._forceRelease(owner, token):
+                if self._stats is not None:
+                    self._stats.released(key, owner, forced=True)
+                self._mark_idle(key, lock)
+        return next_deadline
+
+    def _current_waiters(self) -> Dict[str, int]:
+        waiting = {}
+        for stripe in self._stripes:
+            with stripe.mutex:
+                waiting.update((key, lock._waiting) for key, lock in stripe.locks.items() if lock._waiting)
+        return waiting
+
+    def _mark_idle(self, key: str, lock: SyncRowLock):
+        """ Put an unlocked lock at the end of its stripe's idle LRU. """
+        stripe = self._get_stripe(key)
+        with stripe.mutex:
+            if stripe.locks.get(key) is lock and not lock.is_locked():
+                stripe.idle[key] = time.time()
+                stripe.idle.move_to_end(key)
+
+    def _reclaim_idle(self):
+        limit = time.time() - setting.garbage_clean_cycle
+        for stripe in self._stripes:
+            with stripe.mutex:
+                while stripe.idle:
+                    key, since = next(iter(stripe.idle.items()))
+                    if since > limit:
+                        break
+                    del stripe.idle[key]
+                    lock = stripe.locks.get(key)
+                    if lock is not None and not lock.is_locked() and not lock._waiting and not lock._pins:
+                        del stripe.locks[key]
                         logger.debug(f"Cleaned up unused SyncRowLock for key: {key}")
 
+    def _check_deadlock(self, lock: SyncRowLock, waiter: _Waiter):
+        """
+        Register that `waiter.owner` is blocked on `lock`, and raise DeadlockDetected if
+        that closes a cycle in the wait-for graph. The requester closing the cycle is the victim.
+        """
+        owner = waiter.owner
+        with self._graph_lock:
+            self._waits.setdefault(owner, {})[waiter] = lock
+            cycle = _find_cycle(owner, self._waits, waiter)
+            if cycle:
+                self._remove_wait(owner, waiter) # the victim leaves the graph at once, so nobody else picks a second victim
+        if cycle:
+            logger.warning(f"Deadlock detected, victim: {owner}, cycle: {cycle}")
+            raise errors.DeadlockDetected(owner, cycle)
+
+    def _clear_wait(self, owner: str, waiter: _Waiter):
+        """ The request stopped waiting (granted, withdrawn or failed). """
+        with self._graph_lock:
+            self._remove_wait(owner, waiter)
+
+    def _remove_wait(self, owner: str, waiter: _Waiter):
+        requests = self._waits.get(owner)
+        if requests is not None:
+            requests.pop(waiter, None)
+            if not requests:
+                del self._waits[owner]
+
     def getLock(self, key: str) -> SyncRowLock:
-        with self._manager_lock:
-            if key not in self._locks:
-                self._locks[key] = SyncRowLock()
-            lock = self._locks[key]
-            lock._garbageMark = False
+        stripe = self._get_stripe(key)
+        with stripe.mutex:
+            lock = stripe.locks.get(key)
+            if lock is None:
+                lock = stripe.locks[key] = SyncRowLock()
+            else:
+                stripe.idle.pop(key, None)
             return lock
         
+    def getLocks(self, keys: List[str], pin: bool = False) -> Dict[str, SyncRowLock]:
+        """
+        Resolve many keys in one pass, taking each stripe's mutex only once.
+        - pin: keep the locks from being reclaimed until `_unpin()`, for a client about to wait on them one by one.
+        """
+        by_stripe: Dict[int, List[str]] = {}
+        for key in keys:
+            by_stripe.setdefault(hash(key) % len(self._stripes), []).append(key)
+        result: Dict[str, SyncRowLock] = {}
+        for index, stripe_keys in by_stripe.items():
+            stripe = self._stripes[index]
+            with stripe.mutex:
+                for key in stripe_keys:
+                    lock = stripe.locks.get(key)
+                    if lock is None:
+                        lock = stripe.locks[key] = SyncRowLock()
+                    else:
+                        stripe.idle.pop(key, None)
+                    if pin:
+                        lock._pins += 1
+                    result[key] = lock
+        return result
+
+    def _unpin(self, locks: Dict[str, SyncRowLock]):
+        """ End of an acquire plan: the pinned locks left unlocked become idle again. """
+        for key, lock in locks.items():
+            stripe = self._get_stripe(key)
+            with stripe.mutex:
+                lock._pins -= 1
+                if not lock._pins and stripe.locks.get(key) is lock and not lock.is_locked():
+                    stripe.idle[key] = time.time()
+                    stripe.idle.move_to_end(key)
+
     def login(self, user: Optional[str] = None, relogin = False) -> SyncLockClient:
         with self._manager_lock:
             user_list = self._login_users.keys()
@@ -122,45 +260,176 @@ class SyncLockClient:
         self.manager = manager
         self.user = user
         self._own_locks: Dict[str, SyncRowLock] = {}
+        self._intents: Dict[str, int] = {} # table key -> rows held under its intent lock
+        self._tables: Dict[str, str] = {} # table key -> mode the caller asked for, kept when the intent of its rows goes
+        self._table_holds: Dict[str, tuple[str, float]] = {} # table key -> (mode, auto-unlock deadline) as last taken
         logger.debug(f"SyncLockClient created for user: {self.user}")
 
-    def acquire(self, key: str, timeout: Optional[float] = None) -> SyncRowLock:
-        """ Accquire a lock by key. """
-        if key in self._own_locks:
-            lock = self._own_locks[key]
-            with lock._meta_lock:
-                if lock.lock_owner == self.user:
-                    # 更新鎖的自動釋放時間
-                    t = _get_autounlock_time(timeout)
-                    lock.autounlock_time = time.time() + t if t > 0 else float('inf')
-                    return lock
-        else:
-            lock = self.manager.getLock(key)
-        
+    def acquire(self, key: str, timeout: Optional[float] = None, mode: str = "x", wait_timeout: Optional[float] = None) -> SyncRowLock:
+        """
+        Accquire a lock by key.
+        - mode: one of LOCK_MODES, usually "s" shared (many readers) or "x" exclusive. Requesting a stronger mode
+          than the one you hold upgrades the lock, requesting a mode you already cover renews its auto-unlock time.
+        - timeout: auto-unlock time of the hold (default setting.lock_auto_release_time).
+        - wait_timeout: how long to wait for the lock before raising LockTimeout (default setting.lock_wait_timeout).
+
+        A row key (`Model:id=1`) first takes the matching intent ("is" / "ix") on its table key (`Model:`),
+        so a table lock from `generateLockKey(Model)` waits for the rows in use and keeps new ones out.
+        The intent is released with the last row of the table, a table lock acquired itself goes back to the mode asked for.
+
+        Raises DeadlockDetected if waiting would close a cycle. Only the request is withdrawn,
+        the locks already held are kept, release them before retrying.
+        """
+        locks = self._acquire_plan({key: _check_mode(mode)}, timeout, wait_timeout)
+        return locks[key]
+
+    def acquire_many(self, keys: List[str], timeout: Optional[float] = None, mode: str = "x", wait_timeout: Optional[float] = None) -> Dict[str, SyncRowLock]:
+        """
+        Acquire several keys all-or-none.
+        Keys are taken in sorted order (table keys before their rows), so clients locking overlapping sets
+        always queue in the same order. If any of them fails (LockTimeout, DeadlockDetected, ...), the keys
+        taken by this call are released (upgrades go back to the previous mode) before the error is raised.
+        - wait_timeout: limit for the whole batch, not for each key.
+        """
+        mode = _check_mode(mode)
+        locks = self._acquire_plan({key: mode for key in keys}, timeout, wait_timeout)
+        return {key: locks[key] for key in sorted(set(keys))}
+
+    def _acquire_plan(self, requests: Dict[str, str], timeout: Optional[float], wait_timeout: Optional[float]) -> Dict[str, SyncRowLock]:
+        """ Take the requested `{key: mode}` and the intents of their table keys in order, all or none. """
+        plan = _lock_plan(requests)
+        # pinned: a key released by its holder while we wait on an earlier one must not be reclaimed
+        pinned = self.manager.getLocks([key for key, _ in plan if key not in self._own_locks], pin=True)
+        locks = dict(pinned)
+        locks.update({key: self._own_locks[key] for key, _ in plan if key in self._own_locks})
+
         effective_timeout = _get_autounlock_time(timeout)
-        lock.acquire(self.user, effective_timeout)
-        self._own_locks[key] = lock
-        return lock
+        deadline = _deadline(effective_timeout)
+        wait_timeout = _get_wait_timeout(wait_timeout)
+        end = time.monotonic() + wait_timeout if wait_timeout else None
+        taken: List[tuple[str, str, Optional[str], bool]] = [] # (key, mode, mode held before, owned before)
+        waiting: Optional[_Waiter] = None # the request of the current key in the wait-for graph
+
+        def on_wait(lock, waiter: _Waiter):
+            nonlocal waiting
+            waiting = waiter
+            self.manager._check_deadlock(lock, waiter)
+
+        try:
+            for key, mode in plan:
+                if key not in requests:
+                    held = self._table_holds.get(key)
+                    if held is not None and mode in _COVERS[held[0]] and held[1] >= deadline:
+                        continue # the intent taken for other rows covers this one, the table key's lock is not touched
+                lock = locks[key]
+                remaining = 0
+                if end is not None:
+                    remaining = end - time.monotonic()
+                    if remaining <= 0:
+                        raise errors.LockTimeout(self.user, key, wait_timeout)
+                before = lock.get_mode(self.user)
+                stats = self.manager._stats if key in requests else None # the intents taken for rows are not counted
+                if stats is not None:
+                    start = time.perf_counter()
+                try:
+                    lock.acquire(self.user, effective_timeout, mode, remaining, on_wait, key)
+                finally:
+                    if waiting is not None:
+                        self.manager._clear_wait(self.user, waiting)
+                        waiting = None
+                if stats is not None:
+                    new = before is None or (key.endswith(":") and key not in self._tables) # an intent becoming a table lock
+                    stats.acquired(key, self.user, time.perf_counter() - start, new)
+                taken.append((key, mode, before, key in self._own_locks))
+                self._own_locks[key] = lock
+                self.manager._schedule_expiry(key, lock, self.user)
+                if key.endswith(":"):
+                    self._table_holds[key] = (before if before is not None and mode in _COVERS[before] else _join_mode(before, mode), deadline)
+        except BaseException:
+            for key, mode, before, owned in reversed(taken):
+                lock = locks[key]
+                self._table_holds.pop(key, None)
+                if before is None:
+                    if not owned:
+                        del self._own_locks[key]
+                    lock.release(self.user)
+                    if self.manager._stats is not None:
+                        self.manager._stats.released(key, self.user)
+                elif mode not in _COVERS[before]:
+                    lock.downgrade(self.user, before)
+            raise
+        finally:
+            self.manager._unpin(pinned)
+
+        for key, _, _, owned in taken:
+            parent = _parent_key(key)
+            if parent is not None and not owned:
+                self._intents[parent] = self._intents.get(parent, 0) + 1
+        for key, mode in requests.items():
+            if key.endswith(":"): # a table key asked for by the caller, not only the intent of rows
+                self._tables[key] = _join_mode(self._tables.get(key), mode)
+        return locks
+
+    def downgrade(self, key: str, mode: str = "s"):
+        """ Weaken a held lock (e.g. exclusive into shared), letting queued requests in """
+        lock = self._own_locks.get(key)
+        if lock is None:
+            raise errors.LockNotAcquiredError(self.user, key)
+        mode = _check_mode(mode)
+        lock.downgrade(self.user, mode)
+        if key in self._tables:
+            self._tables[key] = mode
+        self._table_holds.pop(key, None)
         
     def release(self, key:str):
         """ Release a lock by key """
         if key in self._own_locks:
-            lock = self._own_locks.pop(key)
-            if lock.get_owner() == self.user:
-                lock.release(self.user)
+            self._drop(key)
+            self._tables.pop(key, None)
+            parent = _parent_key(key)
+            if parent in self._intents:
+                self._intents[parent] -= 1
+                if not self._intents[parent]:
+                    del self._intents[parent]
+                    lock = self._own_locks.get(parent)
+                    asked = self._tables.get(parent)
+                    if lock is not None and asked is None:
+                        self._drop(parent) # only the intent taken for the rows
+                    elif lock is not None and lock.get_mode(self.user) not in (None, asked):
+                        lock.downgrade(self.user, asked) # back to the table lock asked for
+                        self._table_holds.pop(parent, None)
         else:
             logger.warning(f"User {self.user} attempted to release a lock '{key}'")
 
+    def _drop(self, key: str):
+        lock = self._own_locks.pop(key)
+        self._table_holds.pop(key, None)
+        if self.manager._stats is not None:
+            self.manager._stats.released(key, self.user)
+        if lock.get_mode(self.user) is not None:
+            lock.release(self.user)
+            self.manager._mark_idle(key, lock)
+
     def _cleanup(self):
         """ Clear all lock held by user. """
         logger.debug(f"Cleaning up all lock for user {self.user}...")
         for key, lock in list(self._own_locks.items()):
-            if lock.get_owner() == self.user:
+            if self.manager._stats is not None:
+                self.manager._stats.released(key, self.user)
+            if lock.get_mode(self.user) is not None:
                 lock.release(self.user)
+                self.manager._mark_idle(key, lock)
         self._own_locks.clear()
+        self._intents.clear()
+        self._tables.clear()
+        self._table_holds.clear()
         logger.debug(f"All locks for user {self.user} have been released.")
 
-    def check_lock(self, require_keys:list[str], raise_error=True) -> bool:
+    def check_lock(self, require_keys:list[str], raise_error=True, mode: Optional[str] = None) -> bool:
+        """
+        Check the user still holds every key (not collected, not expired).
+        - mode: if "x", shared holds count as missing.
+        """
         req_set = set(require_keys)
         own_set = set(self._own_locks.keys())
 
@@ -175,7 +444,8 @@ class SyncLockClient:
         missing_lock = []
         for key in req_set:
             lock = self._own_locks[key]
-            if lock.get_owner() != self.user or lock.is_expired():
+            held = lock.get_mode(self.user)
+            if held is None or lock.is_expired(self.user) or (mode is not None and _check_mode(mode) not in _COVERS[held]):
                 missing_lock.append(key)
 
         if missing_lock:
@@ -184,76 +454,94 @@ class SyncLockClient:
             return False
         return True
                 
-class SyncRowLock:
-    """ A Real Lock which have python lock and extra information."""
+class SyncRowLock(_RowLockState):
+    """ A Real Lock with shared/exclusive modes and extra information (owners, auto-unlock time)."""
     def __init__(self):
-        # lock
-        self.lock: SyncLock = SyncLock()
+        super().__init__()
         self._meta_lock = SyncLock() # make sure the thread-safe access to lock metadata
+        self._cond = threading.Condition(self._meta_lock)
 
-        # metadata
-        self.lock_owner: Optional[str] = None
-        self.autounlock_time: float = 0
-        # -----------------------------
-        self._garbageMark: bool = False
-
-    def is_locked(self) -> bool:
-        """ Check if the lock is currently held """
-        return self.lock.locked()
-    
     def get_owner(self) -> Optional[str]:
-        """ Get the owner with thread-safe access """
+        """ Get the exclusive owner with thread-safe access """
         with self._meta_lock:
             return self.lock_owner
 
-    def acquire(self, owner: str, timeout: float):
-        """ Acquire the lock until the lock is available """
-        # 在同步模式下，acquire() 方法會阻塞直到鎖被取得
-        self.lock.acquire()
+    def get_mode(self, owner: str) -> Optional[str]:
+        with self._meta_lock:
+            return super().get_mode(owner)
 
+    def get_owners(self) -> Dict[str, str]:
         with self._meta_lock:
-            self._garbageMark = False
-            self.lock_owner = owner
-            self.autounlock_time = time.time() + timeout if timeout > 0 else float('inf')
-            logger.debug(f"SyncRowLock acquired by {owner}.")
+            return super().get_owners()
 
+    def acquire(self, owner: str, timeout: float, mode: str = "x", wait_timeout: float = 0, on_wait = None, key: str = ""):
+        """
+        Acquire the lock until the lock is available.
+        - wait_timeout: give up with LockTimeout after waiting this long, 0 waits forever.
+        - on_wait: called as `on_wait(lock, waiter)` every time the request (re)starts waiting, may raise to withdraw it.
+        """
+        # 在同步模式下，acquire() 方法會阻塞直到鎖被取得
+        end = time.monotonic() + wait_timeout if wait_timeout else None
+        with self._cond:
+            waiter = self._request(owner, _check_mode(mode), timeout)
+            if waiter is not None:
+                try:
+                    while not waiter.granted:
+                        if on_wait is not None:
+                            on_wait(self, waiter)
+                        remaining = None if end is None else end - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise errors.LockTimeout(owner, key, wait_timeout)
+                        self._cond.wait(remaining)
+                except BaseException:
+                    if self._cancel(waiter):
+                        self._cond.notify_all()
+                    raise
+            logger.debug(f"SyncRowLock acquired by {owner} ({mode}).")
+
+    def downgrade(self, owner: str, mode: str = "s"):
+        """ Weaken the owner's hold to `mode` (exclusive to shared by default) """
+        with self._cond:
+            if self._downgrade_hold(owner, mode):
+                self._cond.notify_all()
 
     def release(self, owner: str):
         """ Release lock by owner"""
-        with self._meta_lock:
-            if self.lock_owner != owner:
-                logger.warning(f"Attempt to release by non-owner. Owner: {self.lock_owner}, Attempted by: {owner}")
+        with self._cond:
+            if owner not in self.holders:
+                logger.warning(f"Attempt to release by non-owner. Owners: {list(self.holders)}, Attempted by: {owner}")
                 return
-        
-            if not self.lock.locked():
-                logger.warning(f"Attempt to release a non-locked lock by {owner}")
-                self.lock_owner = None
-                self.autounlock_time = 0
-                return
-            
-            self.lock_owner = None
-            self.autounlock_time = 0
-        
-        self.lock.release()
+            if self._release_hold(owner):
+                self._cond.notify_all()
         logger.debug(f"SyncRowLock released by {owner}.")
 
-    def _forceRelease(self):
-        """ Force release lock by LockManager. """
-        with self._meta_lock:
-            owner = self.lock_owner
-            self.lock_owner = None
-            self.autounlock_time = 0
+    def _forceRelease(self, owner: Optional[str] = None, token: Optional[int] = None) -> bool:
+        """
+        Force release lock by LockManager.
+        With `owner`/`token`, only release that acquisition if it is still current and has expired.
+        """
+        with self._cond:
+            released = self._expire_hold(owner, token)
+            if not released:
+                return False
+            if self._dispatch():
+                self._cond.notify_all()
+        logger.warning(f"SyncRowLock forcibly released from expired owner: {', '.join(released)}.")
+        return True
 
-        if self.lock.locked():
-            self.lock.release()
-            logger.warning(f"SyncRowLock forcibly released from expired owner: {owner}.")
+    def is_locked(self) -> bool:
+        """ Check if the lock is currently held """
+        with self._meta_lock:
+            return bool(self.holders)
 
-    def is_expired(self) -> bool:
-        """ Check if the lock is expired """
+    def is_expired(self, owner: Optional[str] = None) -> bool:
+        """ Check if the owner's hold (any hold if owner is None) is expired """
         with self._meta_lock:
-            if self.lock_owner is None:
-                return False
-            return time.time() > self.autounlock_time
+            now = time.time()
+            if owner is None:
+                return any(now > hold.deadline for hold in self.holders.values())
+            hold = self.holders.get(owner)
+            return hold is not None and now > hold.deadline
 
 
 # 實例化管理器
@@ -1,13 +1,448 @@
-from typing import Type
+from __future__ import annotations
+import time
+import logging
+import threading
+from collections import deque
+from typing import Type, Optional, Dict, List
 from .._setting import setting
+from .. import errors
 from . import _T
 
+logger = logging.getLogger("piscesORM")
+
 def _get_autounlock_time(timeout:float):
     return timeout if timeout is not None else setting.lock_auto_release_time
 
+def _get_wait_timeout(wait_timeout:float):
+    return wait_timeout if wait_timeout is not None else setting.lock_wait_timeout
+
 
 # 產生鎖 key 的函數
 def generateLockKey(model: Type[_T], **filters) -> str:
-    # 依據 model 與 filters 產生唯一 key
+    """
+    依據 model 與 filters 產生唯一 key。
+    沒有 filters 時回傳整張表的 key (table key, `"Model:"`)，row key 的上層就是它的 table key。
+    """
     key = f"{model.__name__}:" + ",".join(f"{k}={v}" for k, v in sorted(filters.items()))
-    return key
\ No newline at end of file
+    return key
+
+def _parent_key(key: str) -> Optional[str]:
+    """ The table key (`"Model:"`) above a row key, None for table keys and free-form keys. """
+    table, sep, rest = key.partition(":")
+    return table + sep if rest else None
+
+
+# =========== lock modes ===========
+LOCK_MODES = ("is", "ix", "s", "six", "x")
+"""
+s: shared (read), x: exclusive (write).
+is / ix / six: intent modes for table keys, "some rows below are read / written / the whole table
+is read and some rows are written". Row acquisitions take the intent on their table automatically.
+"""
+
+_COMPATIBLE: Dict[str, frozenset] = {
+    "is": frozenset({"is", "ix", "s", "six"}),
+    "ix": frozenset({"is", "ix"}),
+    "s": frozenset({"is", "s"}),
+    "six": frozenset({"is"}),
+    "x": frozenset(),
+}
+""" mode -> the modes other owners may hold at the same time """
+
+_COVERS: Dict[str, frozenset] = {
+    "is": frozenset({"is"}),
+    "ix": frozenset({"is", "ix"}),
+    "s": frozenset({"is", "s"}),
+    "six": frozenset({"is", "ix", "s", "six"}),
+    "x": frozenset({"is", "ix", "s", "six", "x"}),
+}
+""" mode -> the requests it already satisfies (no need to wait) """
+
+_INTENT_OF: Dict[str, str] = {
+    "is": "is",
+    "s": "is",
+    "ix": "ix",
+    "six": "ix",
+    "x": "ix",
+}
+""" row mode -> the intent mode its table key needs """
+
+def _join_mode(held: Optional[str], requested: str) -> str:
+    """ The weakest mode covering both `held` and `requested`, e.g. s + ix -> six. """
+    if held is None:
+        return requested
+    for mode in LOCK_MODES:
+        if held in _COVERS[mode] and requested in _COVERS[mode]:
+            return mode
+    return "x"
+
+def _lock_plan(requests: Dict[str, str]) -> List[tuple[str, str]]:
+    """
+    Turn `{key: mode}` into the ordered `(key, mode)` list to acquire: row keys add the intent on
+    their table key, and sorting puts every table key before its rows.
+    """
+    plan = dict(requests)
+    for key, mode in requests.items():
+        parent = _parent_key(key)
+        if parent is not None:
+            plan[parent] = _join_mode(plan.get(parent), _INTENT_OF[mode])
+    return sorted(plan.items())
+
+def _check_mode(mode: str) -> str:
+    if not isinstance(mode, str) or mode.lower() not in _COMPATIBLE:
+        raise errors.IllegalLockMode(mode)
+    return mode.lower()
+
+def _deadline(timeout: float) -> float:
+    return time.time() + timeout if timeout > 0 else float('inf')
+
+
+class _Hold:
+    """ A granted lock mode of one owner. """
+    __slots__ = ("mode", "deadline", "token")
+
+    def __init__(self, mode: str, deadline: float, token: int):
+        self.mode = mode
+        self.deadline = deadline
+        self.token = token
+
+class _Waiter:
+    """ A queued lock request. """
+    __slots__ = ("owner", "mode", "timeout", "previous", "granted", "signal")
+
+    def __init__(self, owner: str, mode: str, timeout: float, previous: Optional[str] = None):
+        self.owner = owner
+        self.mode = mode
+        self.timeout = timeout
+        self.previous = previous # the mode held before, for upgrades
+        self.granted = False
+        self.signal = None # asyncio.Future for async locks
+
+    @property
+    def upgrade(self) -> bool:
+        return self.previous is not None
+
+
+class _RowLockState:
+    """
+    The shared/exclusive/intent bookkeeping of a lock, used by both `SyncRowLock` and `AsyncRowLock`.
+    Requests are served in FIFO order (an upgrade jumps the queue), so a waiting writer is not
+    starved by a stream of readers. Callers must hold the lock's `_meta_lock` (sync) or stay
+    in the event loop without awaiting (async) while calling these methods.
+    """
+    def __init__(self):
+        self.holders: Dict[str, _Hold] = {}
+        self._queue: deque[_Waiter] = deque()
+        self._token: int = 0 # bumped on every grant, tells stale expiry entries apart
+        self._pins: int = 0 # acquire plans that looked the lock up and may still take it, keeps it from being reclaimed
+
+    @property
+    def _waiting(self) -> int:
+        return len(self._queue)
+
+    def _blockers(self, owner: str, mode: str) -> List[str]:
+        """ Other owners holding a mode incompatible with `mode`. """
+        compatible = _COMPATIBLE[mode]
+        return [o for o, hold in self.holders.items() if o != owner and hold.mode not in compatible]
+
+    def _request(self, owner: str, mode: str, timeout: float) -> Optional[_Waiter]:
+        """ Grant, renew or queue a request. Returns the waiter when the caller has to wait. """
+        hold = self.holders.get(owner)
+        if hold is not None and mode in _COVERS[hold.mode]:
+            hold.deadline = _deadline(timeout)
+            return None
+
+        if hold is None:
+            waiter = _Waiter(owner, mode, timeout)
+            self._queue.append(waiter)
+        else:
+            waiter = _Waiter(owner, _join_mode(hold.mode, mode), timeout, previous=hold.mode)
+            # two upgrades each blocked by the other's current hold can never be granted
+            for w in self._queue:
+                if w.upgrade and w.previous not in _COMPATIBLE[waiter.mode] and hold.mode not in _COMPATIBLE[w.mode]:
+                    raise errors.LockUpgradeConflict(owner)
+            self._queue.appendleft(waiter)
+        self._dispatch()
+        return None if waiter.granted else waiter
+
+    def _dispatch(self) -> bool:
+        """ Grant queued requests from the front while they are compatible. """
+        granted = False
+        while self._queue:
+            waiter = self._queue[0]
+            if self._blockers(waiter.owner, waiter.mode):
+                break
+            self._queue.popleft()
+            self._token += 1
+            self.holders[waiter.owner] = _Hold(waiter.mode, _deadline(waiter.timeout), self._token)
+            waiter.granted = True
+            self._signal(waiter)
+            granted = True
+        if granted:
+            # the holders changed, let the remaining waiters re-check for deadlocks
+            for waiter in self._queue:
+                self._nudge(waiter)
+        return granted
+
+    def _waiting_for(self, waiter: _Waiter) -> List[str]:
+        """
+        Owners the waiter is waiting on: incompatible holders and incompatible requests queued ahead of it.
+        Only reads snapshots, so it may be called without holding this lock's `_meta_lock`.
+        """
+        if waiter.granted: # granted, its owner just hasn't woken up yet
+            return []
+        holders = self.holders.copy()
+        queue = list(self._queue)
+        compatible = _COMPATIBLE[waiter.mode]
+        result = [o for o, hold in holders.items() if o != waiter.owner and hold.mode not in compatible]
+        for ahead in queue:
+            if ahead is waiter:
+                break
+            if ahead.owner != waiter.owner and (ahead.mode not in compatible or waiter.mode not in _COMPATIBLE[ahead.mode]):
+                result.append(ahead.owner)
+        return result
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """ Withdraw a request that stopped waiting. Returns True if other waiters were granted. """
+        if waiter.granted:
+            if waiter.upgrade:
+                self.holders[waiter.owner].mode = waiter.previous
+            else:
+                self.holders.pop(waiter.owner, None)
+        else:
+            try:
+                self._queue.remove(waiter)
+            except ValueError:
+                pass
+        return self._dispatch()
+
+    def _release_hold(self, owner: str) -> bool:
+        """ Drop the owner's hold. Returns True if other waiters were granted. """
+        self.holders.pop(owner, None)
+        return self._dispatch()
+
+    def _downgrade_hold(self, owner: str, mode: str = "s") -> bool:
+        """ Weaken the owner's hold to `mode` if the current mode covers it. Returns True if other waiters were granted. """
+        hold = self.holders.get(owner)
+        if hold is not None and mode in _COVERS[hold.mode]:
+            hold.mode = mode
+        return self._dispatch()
+
+    def _expire_hold(self, owner: Optional[str], token: Optional[int]) -> List[str]:
+        """
+        Drop expired holds. With `owner`/`token`, only that acquisition if it is still current and
+        expired; with neither, every hold. Returns the released owners.
+        """
+        if owner is None:
+            released = list(self.holders)
+            self.holders.clear()
+            return released
+        hold = self.holders.get(owner)
+        if hold is None or (token is not None and hold.token != token) or time.time() <= hold.deadline:
+            return []
+        del self.holders[owner]
+        return [owner]
+
+    def _signal(self, waiter: _Waiter):
+        """ Wake up a granted waiter. """
+        pass
+
+    def _nudge(self, waiter: _Waiter):
+        """ Wake up a waiter that is still blocked, so it re-checks deadlocks and timeouts. """
+        pass
+
+    # ---------- metadata ----------
+    def is_locked(self) -> bool:
+        """ Check if the lock is currently held """
+        return bool(self.holders)
+
+    def get_mode(self, owner: str) -> Optional[str]:
+        hold = self.holders.get(owner)
+        return hold.mode if hold else None
+
+    def get_owners(self) -> Dict[str, str]:
+        """ owner -> mode of every current holder """
+        return {o: hold.mode for o, hold in self.holders.items()}
+
+    @property
+    def lock_owner(self) -> Optional[str]:
+        """ The exclusive owner, None if the lock is free or only shared. """
+        for o, hold in self.holders.items():
+            if hold.mode == "x":
+                return o
+        return None
+
+    @property
+    def autounlock_time(self) -> float:
+        """ The earliest auto-unlock time of the current holders, 0 if the lock is free. """
+        return min((hold.deadline for hold in self.holders.values()), default=0)
+
+
+def _find_cycle(start: str, waits: Dict[str, Dict[_Waiter, _RowLockState]], waiter: Optional[_Waiter] = None) -> Optional[List[str]]:
+    """
+    Walk the wait-for graph from `start`. `waits` maps an owner to its pending requests and the lock each is blocked on
+    (several threads / tasks of one owner may wait at once), edges are derived from the current state of those locks.
+    The walk leaves `start` through `waiter` only, or through all its requests if None.
+    Returns the cycle path if it leads back to `start`.
+    """
+    stack = [(start, [start])]
+    seen = {start}
+    while stack:
+        owner, path = stack.pop()
+        requests = waits.get(owner)
+        if not requests:
+            continue
+        if owner == start and waiter is not None:
+            requests = {waiter: requests[waiter]} if waiter in requests else {}
+        for request, lock in requests.items():
+            for blocker in lock._waiting_for(request):
+                if blocker == start:
+                    return path
+                if blocker not in seen:
+                    seen.add(blocker)
+                    stack.append((blocker, path + [blocker]))
+    return None
+
+
+# =========== instrumentation ===========
+_HISTOGRAM_BOUNDS = (0.001, 0.01, 0.1, 1.0, 10.0)
+""" upper bounds (sec) of the wait / hold time histogram buckets, the last bucket is unbounded """
+
+class _Histogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(_HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        for i, bound in enumerate(_HISTOGRAM_BOUNDS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def snapshot(self) -> dict:
+        labels = [f"<={bound}s" for bound in _HISTOGRAM_BOUNDS] + [f">{_HISTOGRAM_BOUNDS[-1]}s"]
+        return {"count": self.count, "total": self.total, "max": self.max, "buckets": dict(zip(labels, self.buckets))}
+
+
+class _KeyStats:
+    __slots__ = ("acquired", "forced", "wait", "hold")
+
+    def __init__(self):
+        self.acquired = 0
+        self.forced = 0
+        self.wait = _Histogram()
+        self.hold = _Histogram()
+
+
+class _LockStats:
+    """ The numbers recorded by an instrumented lock manager, see `enable_stats()`. """
+    def __init__(self):
+        self.mutex = threading.Lock() # short critical sections only, also fine inside the event loop
+        self.keys: Dict[str, _KeyStats] = {}
+        self.held_since: Dict[tuple[str, str], float] = {}
+        self.last_log = time.monotonic()
+
+    def _key(self, key: str) -> _KeyStats:
+        stats = self.keys.get(key)
+        if stats is None:
+            stats = self.keys[key] = _KeyStats()
+        return stats
+
+    def acquired(self, key: str, owner: str, waited: float, new: bool):
+        with self.mutex:
+            stats = self._key(key)
+            stats.acquired += 1
+            stats.wait.add(waited)
+            if new:
+                self.held_since[(key, owner)] = time.perf_counter()
+
+    def released(self, key: str, owner: str, forced: bool = False):
+        with self.mutex:
+            since = self.held_since.pop((key, owner), None)
+            if since is None and not forced and key not in self.keys:
+                return # never counted, e.g. the intent taken on a table key for its rows
+            stats = self._key(key)
+            if since is not None:
+                stats.hold.add(time.perf_counter() - since)
+            if forced:
+                stats.forced += 1
+
+    def snapshot(self, waiting: Dict[str, int]) -> dict:
+        with self.mutex:
+            keys = {
+                key: {
+                    "acquired": stats.acquired,
+                    "forced_releases": stats.forced,
+                    "waiting": waiting.get(key, 0),
+                    "wait": stats.wait.snapshot(),
+                    "hold": stats.hold.snapshot(),
+                }
+                for key, stats in self.keys.items()
+            }
+        for key, n in waiting.items():
+            keys.setdefault(key, {"waiting": n})
+        return {
+            "enabled": True,
+            "acquired": sum(k.get("acquired", 0) for k in keys.values()),
+            "forced_releases": sum(k.get("forced_releases", 0) for k in keys.values()),
+            "waiting": sum(waiting.values()),
+            "keys": keys,
+        }
+
+    def summary(self, waiting: Dict[str, int], top: int = 3) -> str:
+        with self.mutex:
+            acquired = sum(s.acquired for s in self.keys.values())
+            forced = sum(s.forced for s in self.keys.values())
+            hottest = sorted(self.keys.items(), key=lambda item: item[1].wait.total, reverse=True)[:top]
+            hot = ", ".join(f"{key} (wait total {s.wait.total:.3f}s, max {s.wait.max:.3f}s)" for key, s in hottest if s.wait.total > 0)
+        return f"lock stats: {acquired} acquisitions, {sum(waiting.values())} waiting, {forced} forced releases; most waited: {hot or '-'}"
+
+
+class _LockStatsMixin:
+    """
+    Instrumentation of a lock manager. Off by default: the clients only check `manager._stats is None`,
+    so it costs nothing until `enable_stats()` is called.
+    """
+    _stats: Optional[_LockStats] = None
+    _stats_log_interval: float = 0
+
+    def enable_stats(self, log_interval: float = 0):
+        """
+        Start recording per-key acquisition counts, wait / hold time histograms and forced releases.
+        - log_interval: if > 0, the garbage collector logs a summary line at most this often (sec, needs `start()`).
+        """
+        self._stats = _LockStats()
+        self._stats_log_interval = log_interval
+
+    def disable_stats(self):
+        self._stats = None
+
+    def stats(self) -> dict:
+        """ A snapshot of the recorded numbers. The current waiters are reported even when stats are off. """
+        waiting = self._current_waiters()
+        if self._stats is None:
+            return {"enabled": False, "waiting": sum(waiting.values()), "keys": {key: {"waiting": n} for key, n in waiting.items()}}
+        return self._stats.snapshot(waiting)
+
+    def _current_waiters(self) -> Dict[str, int]:
+        """ key -> number of queued requests """
+        raise NotImplementedError
+
+    def _log_stats(self):
+        stats = self._stats
+        if stats is None or self._stats_log_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - stats.last_log < self._stats_log_interval:
+            return
+        stats.last_log = now
+        logger.info(stats.summary(self._current_waiters()))
@@ -1,8 +1,11 @@
 class Operator:
+    __slots__ = ("parts", "_shape")
+
     def __init__(self, *parts):
         if not parts:
             raise ValueError("Operator must have at least one part")
         self.parts = parts
+        self._shape = None
 
     def abs(self):
         return ABS(self)
@@ -71,44 +74,88 @@ class Operator:
     def __pow__(self, value):
         return Power(self, value)
     
+    def shape(self) -> tuple:
+        """
+        Structural fingerprint of the tree: operator types and column names, with every
+        literal replaced by its position. Trees that differ only in literal values share a shape.
+        Computed once per tree, it is the key of the translation cache.
+        """
+        shape = self._shape
+        if shape is not None:
+            return shape
+        shape = [type(self)]
+        for p in self.parts:
+            shape.append(p.shape() if isinstance(p, Operator) else _part_shape(p))
+        shape = self._shape = tuple(shape)
+        return shape
+
     def __repr__(self):
         cls_name = type(self).__name__
         parts_str = ", ".join(repr(p) if isinstance(p, Operator) else str(p) for p in self.parts)
         return f"{cls_name}({parts_str})"
     
-class LogicalOperator(Operator): pass
-class MathOperator(Operator): pass
+class LogicalOperator(Operator): __slots__ = ()
+class MathOperator(Operator): __slots__ = ()
 class OneInputMathOperator(MathOperator):
+    __slots__ = ()
+
     def __init__(self, first_part, second_part=None):
         if second_part is not None:
             raise ValueError("second_part should be None")
-        super().__init__(first_part, second_part)
+        super().__init__(first_part)
+class AggregateOperator(OneInputMathOperator): __slots__ = ()
 class SelfColumn: pass
 
-class GreaterThan(LogicalOperator): pass  # >
-class GreaterEqual(LogicalOperator): pass # >=
-class LessThan(LogicalOperator): pass     # <
-class LessEqual(LogicalOperator): pass    # <=
-class Equal(LogicalOperator): pass        # ==
-class NotEqual(LogicalOperator): pass     # !=
-class IsIn(LogicalOperator): pass         # in
-class Like(LogicalOperator): pass         # like
-class ILike(LogicalOperator): pass        # ilike
-class OR(LogicalOperator): pass           # |
-class AND(LogicalOperator): pass          # &
+class GreaterThan(LogicalOperator): __slots__ = ()  # >
+class GreaterEqual(LogicalOperator): __slots__ = () # >=
+class LessThan(LogicalOperator): __slots__ = ()     # <
+class LessEqual(LogicalOperator): __slots__ = ()    # <=
+class Equal(LogicalOperator): __slots__ = ()        # ==
+class NotEqual(LogicalOperator): __slots__ = ()     # !=
+class IsIn(LogicalOperator): __slots__ = ()         # in
+class Like(LogicalOperator): __slots__ = ()         # like
+class ILike(LogicalOperator): __slots__ = ()        # ilike
+class OR(LogicalOperator): __slots__ = ()           # |
+class AND(LogicalOperator): __slots__ = ()          # &
+
+class IsNull(LogicalOperator): __slots__ = ()       # IS NULL
+class IsNotNull(LogicalOperator): __slots__ = ()    # IS NOT NULL
+class Between(LogicalOperator): __slots__ = ()
+
+class Plus(MathOperator): __slots__ = ()            # a + b
+class Minus(MathOperator): __slots__ = ()           # a - b
+class Multiply(MathOperator): __slots__ = ()        # a * b
+class Divide(MathOperator): __slots__ = ()          # a / b
+class Modulo(MathOperator): __slots__ = ()          # a % b
+class Power(MathOperator): __slots__ = ()           # a ^ b
+class ABS(OneInputMathOperator): __slots__ = ()     # |a|
+class Ceiling(OneInputMathOperator): __slots__ = () # 無條件進位(a)
+class Floor(OneInputMathOperator): __slots__ = ()   # 取整(a)
+class Round(OneInputMathOperator): __slots__ = ()   # 四捨五入(a)
+class Sqrt(OneInputMathOperator): __slots__ = ()    # √a
+
+class Sum(AggregateOperator): __slots__ = ()        # SUM(a)
+class Avg(AggregateOperator): __slots__ = ()        # AVG(a)
+class Min(AggregateOperator): __slots__ = ()        # MIN(a)
+class Max(AggregateOperator): __slots__ = ()        # MAX(a)
+class Count(AggregateOperator):                     # COUNT(a), COUNT(*) when no column given
+    __slots__ = ()
+
+    def __init__(self, first_part=None, second_part=None):
+        if second_part is not None:
+            raise ValueError("second_part should be None")
+        self.parts = (first_part,)
+        self._shape = None
+
 
-class IsNull(LogicalOperator): pass       # IS NULL
-class IsNotNull(LogicalOperator): pass    # IS NOT NULL
-class Between(LogicalOperator): pass
+_LITERAL_TYPES = frozenset((str, int, float, bool, bytes, list, tuple, set, frozenset))
 
-class Plus(MathOperator): pass            # a + b
-class Minus(MathOperator): pass           # a - b
-class Multiply(MathOperator): pass        # a * b
-class Divide(MathOperator): pass          # a / b
-class Modulo(MathOperator): pass          # a % b
-class Power(MathOperator): pass           # a ^ b
-class ABS(OneInputMathOperator): pass     # |a|
-class Ceiling(OneInputMathOperator): pass # 無條件進位(a)
-class Floor(OneInputMathOperator): pass   # 取整(a)
-class Round(OneInputMathOperator): pass   # 四捨五入(a)
-class Sqrt(OneInputMathOperator): pass    # √a
\ No newline at end of file
+def _part_shape(p):
+    if type(p) in _LITERAL_TYPES:
+        return "?"
+    if p is None:
+        return "null" # Count(None) is COUNT(*)
+    name = getattr(p, "_name", None) # Column (operator can't import column, it would be circular)
+    if isinstance(name, str):
+        return ("col", name)
+    return "?"
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import operator as _py_operator
+from .basic import *
+
+"""
+note:
+normalize() rewrites an Operator tree into a smaller, equivalent one before translation:
+- AND/OR chains are flattened into one n-ary node: AND(AND(a, b), c) -> AND(a, b, c)
+- duplicated predicates inside the same AND/OR are removed
+- math on plain numbers is folded into a constant: col > 1 + 2 -> col > 3
+- OR of equalities on the same column becomes IN: (a == 1) | (a == 2) -> a IN (1, 2)
+The input tree is never modified, the parts that need no rewrite are returned as they are
+(so their cached `Operator.shape()` is kept).
+"""
+
+_FOLD_MAP = {
+    Plus: _py_operator.add,
+    Minus: _py_operator.sub,
+    Multiply: _py_operator.mul,
+}
+
+def normalize(op):
+    if not isinstance(op, Operator):
+        return op
+    parts = [normalize(p) for p in op.parts]
+
+    if isinstance(op, (AND, OR)):
+        return _normalize_logic(op, parts)
+    if isinstance(op, MathOperator):
+        folded = _fold_constant(op, parts)
+        if folded is not _NOT_FOLDED:
+            return folded
+    if _same_parts(parts, op.parts):
+        return op
+    if isinstance(op, Count):
+        return Count(parts[0])
+    return type(op)(*parts)
+
+def operator_key(p) -> tuple:
+    """ A hashable structural key of an Operator tree (or leaf), used to compare predicates. """
+    if isinstance(p, Operator):
+        return (type(p), tuple(operator_key(x) for x in p.parts))
+    return _leaf_key(p)
+
+def _same_parts(parts: list, original: tuple) -> bool:
+    return len(parts) == len(original) and all(p is q for p, q in zip(parts, original))
+
+# ---------- logic ----------
+def _normalize_logic(op: Operator, parts: list):
+    op_type = type(op)
+    flat = []
+    for p in parts:
+        if type(p) is op_type:
+            flat.extend(p.parts)
+        else:
+            flat.append(p)
+
+    unique = []
+    seen = set()
+    for p in flat:
+        key = operator_key(p)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(p)
+
+    if op_type is OR:
+        unique = _merge_equal_to_in(unique)
+
+    if len(unique) == 1:
+        return unique[0]
+    if _same_parts(unique, op.parts):
+        return op
+    return op_type(*unique)
+
+def _merge_equal_to_in(parts: list) -> list:
+    groups: dict[tuple, list] = {}
+    order = []
+    for p in parts:
+        found = _equality_target(p)
+        if found is None:
+            order.append(p)
+            continue
+        column, values = found
+        key = _leaf_key(column)
+        if key not in groups:
+            groups[key] = [column, [], []]
+            order.append(key)
+        groups[key][1].extend(values)
+        groups[key][2].append(p)
+
+    result = []
+    for item in order:
+        if not isinstance(item, tuple):
+            result.append(item)
+            continue
+        column, values, merged = groups[item]
+        if len(merged) == 1:
+            result.append(merged[0]) # nothing to merge with
+            continue
+        values = _unique_values(values)
+        if len(values) == 1:
+            result.append(Equal(column, values[0]))
+        else:
+            result.append(IsIn(column, values))
+    return result
+
+def _equality_target(p):
+    """ return (column, [values]) when p is `column == literal` or `column IN literals`, otherwise None """
+    Column, _ = _leaf_types()
+    if isinstance(p, Equal) and len(p.parts) == 2:
+        left, right = p.parts
+        if isinstance(left, Column) and _is_literal(right):
+            return left, [right]
+        if isinstance(right, Column) and _is_literal(left):
+            return right, [left]
+    elif isinstance(p, IsIn) and len(p.parts) >= 2 and isinstance(p.parts[0], Column):
+        values = []
+        for v in p.parts[1:]:
+            if isinstance(v, (list, tuple, set, frozenset)):
+                values.extend(v)
+            else:
+                values.append(v)
+        if all(_is_literal(v) for v in values):
+            return p.parts[0], values
+    return None
+
+def _unique_values(values: list) -> list:
+    result = []
+    seen = set()
+    for v in values:
+        key = _leaf_key(v)
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(v)
+    return result
+
+# ---------- math ----------
+_NOT_FOLDED = object()
+
+def _fold_constant(op: Operator, parts: list):
+    if not all(_is_number(p) for p in parts):
+        return _NOT_FOLDED
+    try:
+        if type(op) in _FOLD_MAP and len(parts) == 2:
+            return _FOLD_MAP[type(op)](parts[0], parts[1])
+        if isinstance(op, Divide) and len(parts) == 2 and any(isinstance(p, float) for p in parts):
+            return parts[0] / parts[1] # integer division in SQLite truncates, only fold float division
+        if isinstance(op, ABS):
+            return abs(parts[0])
+    except ZeroDivisionError:
+        pass
+    return _NOT_FOLDED
+
+# ---------- leaf ----------
+_Column = _FieldRef = None
+
+def _leaf_types():
+    global _Column, _FieldRef
+    if _Column is None:
+        # imported lazily: column imports operator.
+        from ..column import Column, FieldRef
+        _Column, _FieldRef = Column, FieldRef
+    return _Column, _FieldRef
+
+def _is_number(p) -> bool:
+    return isinstance(p, (int, float)) and not isinstance(p, bool)
+
+def _is_literal(p) -> bool:
+    Column, FieldRef = _leaf_types()
+    return not isinstance(p, (Operator, Column, FieldRef, list, tuple, set, frozenset))
+
+def _leaf_key(p) -> tuple:
+    Column, FieldRef = _leaf_types()
+    if isinstance(p, Column):
+        return ("col", getattr(p, "_name", None) or getattr(p, "name", None))
+    if isinstance(p, FieldRef):
+        return ("ref", p.name)
+    if isinstance(p, (list, tuple)):
+        return ("seq", tuple(_leaf_key(v) for v in p))
+    if isinstance(p, (set, frozenset)):
+        return ("set", frozenset(_leaf_key(v) for v in p))
+    try:
+        hash(p)
+        return ("val", type(p), p)
+    except TypeError:
+        return ("obj", id(p))
@@ -1 +1 @@
-from .sqlite import translate_sqlite, translate_sqlite_security
\ No newline at end of file
+from .sqlite import translate_sqlite, translate_sqlite_security, translate_sqlite_literal
\ No newline at end of file
@@ -1,7 +1,11 @@
+import json
+import threading
 from .. import *
 from ...column import Column, FieldRef
 from ...table import Table
 from ... import errors
+from ..._setting import setting
+from ..basic import _part_shape
 
 SQLITE_TRANSLATE_MAP = {
     # 邏輯
@@ -31,13 +35,22 @@ SQLITE_TRANSLATE_MAP = {
     Ceiling: "CEIL",
     Floor: "FLOOR",
     Round: "ROUND",
-    Sqrt: "SQRT"
+    Sqrt: "SQRT",
+
+    # 聚合
+    Sum: "SUM",
+    Avg: "AVG",
+    Min: "MIN",
+    Max: "MAX",
+    Count: "COUNT"
 }
 
 
 def translate_sqlite(op: Operator, ref_obj:Table=None) -> str:
     """把 Operator 物件轉換成 SQLite 可執行的 SQL (WHERE 子句片段)"""
     t = SQLITE_TRANSLATE_MAP.get(type(op))
+    if isinstance(op, Count) and op.parts[0] is None:
+        return "COUNT(*)"
     parts = []
 
     for p in op.parts:
@@ -72,7 +85,9 @@ def translate_sqlite(op: Operator, ref_obj:Table=None) -> str:
             if len(parts) != 3:
                 raise ValueError("Between requires exactly 3 parts")
             return f"{parts[0]} BETWEEN {parts[1]} AND {parts[2]}"
-        if isinstance(op, (OR, AND, GreaterThan, GreaterEqual,
+        if isinstance(op, (OR, AND)):
+            return f" {t} ".join(parts)
+        if isinstance(op, (GreaterThan, GreaterEqual,
                            LessThan, LessEqual, Equal, NotEqual,
                            Like, ILike)):
             return f"{parts[0]} {t} {parts[1]}"
@@ -87,14 +102,45 @@ def translate_sqlite(op: Operator, ref_obj:Table=None) -> str:
     raise RuntimeError(f"unknown optrator in translate\n - object: {op}\n - type: {type(op)}")
 
 
+_TRANSLATE_CACHE: dict[tuple, str] = {}
+_TRANSLATE_CACHE_LOCK = threading.Lock() # protect the insert and eviction, sessions on several threads share the cache
+
 def translate_sqlite_security(op: Operator, ref_obj:Table=None) -> tuple[str, list]:
+    """
+    把 Operator 轉換成參數化的 SQL 片段與參數。
+    SQL 片段以 `Operator.shape()` (另加 IN 清單的排列方式) 為鍵快取，
+    結構相同、只有值不同的條件只需走訪一次收集參數。
+    快取滿了只淘汰最早放入的一筆 (FIFO)，不會整個清空。
+    """
+    if setting.translate_cache_size <= 0:
+        return _translate_sqlite_security(op, ref_obj)
+
+    params = []
+    layouts = []
+    shape = _gather_params(op, ref_obj, params, layouts) # == op.shape()
+    key = (shape, tuple(layouts)) if layouts else shape
+    sql = _TRANSLATE_CACHE.get(key)
+    if sql is None:
+        sql, params = _translate_sqlite_security(op, ref_obj)
+        with _TRANSLATE_CACHE_LOCK:
+            while len(_TRANSLATE_CACHE) >= setting.translate_cache_size:
+                del _TRANSLATE_CACHE[next(iter(_TRANSLATE_CACHE))] # oldest entry first
+            _TRANSLATE_CACHE[key] = sql
+    return sql, params
+
+
+def _translate_sqlite_security(op: Operator, ref_obj:Table=None) -> tuple[str, list]:
     t = SQLITE_TRANSLATE_MAP.get(type(op))
+    if isinstance(op, Count) and op.parts[0] is None:
+        return "COUNT(*)", []
+    if isinstance(op, IsIn):
+        return _translate_isin_security(op, ref_obj)
     sql_parts = []
     params = []
 
     for p in op.parts:
         if isinstance(p, Operator):
-            sql_part, sub_params = translate_sqlite_security(p, ref_obj)
+            sql_part, sub_params = _translate_sqlite_security(p, ref_obj)
             if isinstance(p, (OR, AND)):
                 sql_parts.append(f"({sql_part})")
             else:
@@ -121,12 +167,11 @@ def translate_sqlite_security(op: Operator, ref_obj:Table=None) -> tuple[str, li
             return f"{sql_parts[0]} IS NULL", params
         if isinstance(op, IsNotNull):
             return f"{sql_parts[0]} IS NOT NULL", params
-        if isinstance(op, IsIn):
-            placeholders = ", ".join("?" for _ in sql_parts[1:])
-            return f"{sql_parts[0]} IN ({placeholders})", params
         if isinstance(op, Between):
             return f"{sql_parts[0]} BETWEEN {sql_parts[1]} AND {sql_parts[2]}", params
-        if isinstance(op, (OR, AND, GreaterThan, GreaterEqual,
+        if isinstance(op, (OR, AND)):
+            return f" {t} ".join(sql_parts), params
+        if isinstance(op, (GreaterThan, GreaterEqual,
                            LessThan, LessEqual, Equal, NotEqual,
                            Like, ILike)):
             return f"{sql_parts[0]} {t} {sql_parts[1]}", params
@@ -139,3 +184,117 @@ def translate_sqlite_security(op: Operator, ref_obj:Table=None) -> tuple[str, li
 
     raise RuntimeError(f"unknown operator in translate_sqlite_security\n - object: {op}\n - type: {type(op)}")
 
+
+def translate_sqlite_literal(op: Operator) -> str:
+    """
+    把 Operator 轉換成值直接寫入的 SQL 片段，給不能綁定參數的 DDL 使用 (例如 `CREATE INDEX ... WHERE`)。
+    """
+    sql, params = _translate_sqlite_security(op)
+    pieces = sql.split("?")
+    return pieces[0] + "".join(_sqlite_literal(value) + piece for value, piece in zip(params, pieces[1:]))
+
+
+def _sqlite_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (bytes, bytearray)):
+        return f"X'{bytes(value).hex()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _gather_params(op: Operator, ref_obj:Table, params:list, layouts:list) -> tuple:
+    """
+    只收集參數 (順序與 `_translate_sqlite_security` 相同)，不產生 SQL。
+    回傳 `op.shape()`：還沒算過的話在同一次走訪中算好並記在 Operator 上。
+    IN 清單的排列方式 (依值的數量而定，不在 shape 裡) 依序加入 `layouts`。
+    """
+    shape = op._shape
+    build = shape is None
+    if isinstance(op, Count) and op.parts[0] is None:
+        return op.shape()
+    if isinstance(op, IsIn):
+        target = op.parts[0]
+        if isinstance(target, Operator):
+            target_shape = _gather_params(target, ref_obj, params, layouts)
+        elif isinstance(target, Column):
+            target_shape = ("col", target._name)
+        else:
+            target_shape = _part_shape(target)
+            params.append(target)
+        layout, values = _isin_layout(op, ref_obj)
+        layouts.append(layout)
+        params.extend(values)
+        if build:
+            shape = op._shape = (IsIn, target_shape, *map(_part_shape, op.parts[1:]))
+        return shape
+
+    parts = [type(op)] if build else None
+    for p in op.parts:
+        if isinstance(p, Operator):
+            part_shape = _gather_params(p, ref_obj, params, layouts)
+        elif isinstance(p, Column):
+            part_shape = ("col", p._name)
+        elif isinstance(p, FieldRef):
+            if ref_obj is None:
+                raise errors.MissingReferenceObject()
+            params.append(getattr(ref_obj, p.name, None))
+            part_shape = "?"
+        else:
+            params.append(p)
+            part_shape = "?" if p is not None else "null" # same leaves as `_part_shape`
+        if build:
+            parts.append(part_shape)
+    if build:
+        shape = op._shape = tuple(parts)
+    return shape
+
+
+def _translate_isin_security(op: IsIn, ref_obj:Table=None) -> tuple[str, list]:
+    target = op.parts[0]
+    if isinstance(target, Operator):
+        target_sql, params = _translate_sqlite_security(target, ref_obj)
+    elif isinstance(target, Column):
+        target_sql, params = f'"{target._name}"', []
+    else:
+        target_sql, params = "?", [target]
+
+    layout, values = _isin_layout(op, ref_obj)
+    if layout[0] == "json":
+        return f"{target_sql} IN (SELECT value FROM json_each(?))", params + values
+    placeholders = ", ".join("?" for _ in values)
+    return f"{target_sql} IN ({placeholders})", params + values
+
+
+def _isin_layout(op: IsIn, ref_obj:Table=None) -> tuple[tuple, list]:
+    """
+    `IN` 的自適應轉換，回傳 (排列方式, 參數):
+    - 少量值: 每個值一個 `?`，並補齊到 2 的次方個，讓不同長度的清單共用同一段 SQL。
+    - 大量值: 整個清單以單一 JSON 參數傳入 `json_each(?)`，不受 SQLite 變數數量上限影響。
+    """
+    candidates = []
+    for p in op.parts[1:]:
+        if isinstance(p, (list, tuple, set, frozenset)):
+            candidates.extend(p)
+        elif isinstance(p, FieldRef):
+            if ref_obj is None:
+                raise errors.MissingReferenceObject()
+            candidates.append(getattr(ref_obj, p.name, None))
+        else:
+            candidates.append(p)
+
+    if len(candidates) > setting.in_list_inline_limit:
+        try:
+            return ("json",), [json.dumps(candidates)]
+        except (TypeError, ValueError):
+            pass # not json serializable, fall back to placeholders
+
+    if candidates:
+        size = 1
+        while size < len(candidates):
+            size *= 2
+        candidates += [candidates[-1]] * (size - len(candidates))
+    return ("inline", len(candidates)), candidates
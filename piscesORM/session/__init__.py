@@ -1,2 +1,2 @@
 from .basic import SyncBaseSession, AsyncBaseSession
-from .sqlite import SyncSQLiteSession, AsyncSQLiteLockSession, AsyncSQLiteSession
\ No newline at end of file
+from .sqlite import SyncSQLiteSession, SyncSQLiteLockSession, AsyncSQLiteLockSession, AsyncSQLiteSession
\ No newline at end of file
@@ -48,9 +48,12 @@ class AsyncBaseSession(ABC):
         ...
 
     @abstractmethod
-    async def update_table_structure(self, table: Type[Table], rebuild: bool = False): 
+    async def update_table_structure(self, table: Type[Table], rebuild: bool = False, online: bool = False, batch_size: int = None, progress = None): 
         """
         更新表結構
+        - online: 分批重建, 重建期間表仍可寫入 (需 rebuild)
+        - progress: progress(copied, total), 每批複製後呼叫
+        回傳 False: 表選項 (WITHOUT ROWID / STRICT) 已變更, 需 rebuild 才會套用
         """
         ...
 
@@ -122,6 +125,14 @@ class AsyncBaseSession(ABC):
     async def merge(self, obj: Table, cover: bool = False): 
         """
         根據物件更新
+        有版本欄位 (Version) 的表，資料已被他人修改時拋出 StaleObjectError
+        """
+        ...
+
+    @abstractmethod
+    async def merge_many(self, objs: list[Table], cover: bool = False): 
+        """
+        根據多個物件更新，任一物件過期 (StaleObjectError) 時全部不更新
         """
         ...
 
@@ -140,9 +151,40 @@ class AsyncBaseSession(ABC):
         ...
 
     @abstractmethod
-    async def count(self, table: Type[Table], *filters: Operator) -> int: 
+    async def count(self, table: Type[Table], *conditions: Operator, filters: Operator = None) -> int: 
         """
         計算符合的物件數量
+        - conditions / filters: 以 AND 結合，`count(T, filters=op)` 與 `count(T, op1, op2)` 都可以
+        """
+        ...
+
+    @abstractmethod
+    async def exists(self, table: Type[Table], *filters: Operator) -> bool:
+        """
+        檢查是否存在符合條件的資料 (不建立物件)
+        """
+        ...
+
+    @abstractmethod
+    async def scalar(self, table: Type[Table], column: str|Column, *filters: Operator, order_by: str|list[str] = None) -> Any:
+        """
+        取得第一筆符合資料的單一欄位值 (不建立物件)
+        """
+        ...
+
+    @abstractmethod
+    async def values(self, table: Type[Table], columns: str|Column|list[str]|list[Column], *filters: Operator,
+               order_by: str|list[str] = None, limit: int = None) -> list[tuple]:
+        """
+        取得符合資料的指定欄位值 (不建立物件)
+        """
+        ...
+
+    @abstractmethod
+    async def aggregate(self, table: Type[Table], *filters: Operator, group_by=None, sum=None, avg=None, min=None, max=None, count=None,
+                  having: Operator = None, order_by=None, limit: int = None, as_dict: bool = False) -> list[tuple]|list[dict]:
+        """
+        聚合查詢 (SUM/AVG/MIN/MAX/COUNT + GROUP BY)，直接由資料庫計算
         """
         ...
 
@@ -189,9 +231,12 @@ class SyncBaseSession(ABC):
         ...
 
     @abstractmethod
-    def update_table_structure(self, table: Type[Table], rebuild: bool = False): 
+    def update_table_structure(self, table: Type[Table], rebuild: bool = False, online: bool = False, batch_size: int = None, progress = None): 
         """
         更新表結構
+        - online: 分批重建, 重建期間表仍可寫入 (需 rebuild)
+        - progress: progress(copied, total), 每批複製後呼叫
+        回傳 False: 表選項 (WITHOUT ROWID / STRICT) 已變更, 需 rebuild 才會套用
         """
         ...
 
@@ -255,6 +300,14 @@ class SyncBaseSession(ABC):
     def merge(self, obj: Table, cover: bool = False): 
         """
         根據物件更新
+        有版本欄位 (Version) 的表，資料已被他人修改時拋出 StaleObjectError
+        """
+        ...
+
+    @abstractmethod
+    def merge_many(self, objs: list[Table], cover: bool = False): 
+        """
+        根據多個物件更新，任一物件過期 (StaleObjectError) 時全部不更新
         """
         ...
 
@@ -273,9 +326,40 @@ class SyncBaseSession(ABC):
         ...
 
     @abstractmethod
-    def count(self, table: Type[Table], *filters: Operator) -> int: 
+    def count(self, table: Type[Table], *conditions: Operator, filters: Operator = None) -> int: 
         """
         計算符合的物件數量
+        - conditions / filters: 以 AND 結合，`count(T, filters=op)` 與 `count(T, op1, op2)` 都可以
+        """
+        ...
+
+    @abstractmethod
+    def exists(self, table: Type[Table], *filters: Operator) -> bool:
+        """
+        檢查是否存在符合條件的資料 (不建立物件)
+        """
+        ...
+
+    @abstractmethod
+    def scalar(self, table: Type[Table], column: str|Column, *filters: Operator, order_by: str|list[str] = None) -> Any:
+        """
+        取得第一筆符合資料的單一欄位值 (不建立物件)
+        """
+        ...
+
+    @abstractmethod
+    def values(self, table: Type[Table], columns: str|Column|list[str]|list[Column], *filters: Operator,
+               order_by: str|list[str] = None, limit: int = None) -> list[tuple]:
+        """
+        取得符合資料的指定欄位值 (不建立物件)
+        """
+        ...
+
+    @abstractmethod
+    def aggregate(self, table: Type[Table], *filters: Operator, group_by=None, sum=None, avg=None, min=None, max=None, count=None,
+                  having: Operator = None, order_by=None, limit: int = None, as_dict: bool = False) -> list[tuple]|list[dict]:
+        """
+        聚合查詢 (SUM/AVG/MIN/MAX/COUNT + GROUP BY)，直接由資料庫計算
         """
         ...
 
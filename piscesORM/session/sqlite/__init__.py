@@ -1,3 +1,4 @@
 from .asyncSession import AsyncSQLiteSession
 from .asyncLockSession import AsyncSQLiteLockSession
-from .syncSession import SyncSQLiteSession
\ No newline at end of file
+from .syncSession import SyncSQLiteSession
+from .syncLockSession import SyncSQLiteLockSession
\ No newline at end of file
@@ -1,7 +1,131 @@
+import aiosqlite
+from typing import Type, List, Optional
+from contextlib import asynccontextmanager
 from .asyncSession import AsyncSQLiteSession
+from ...table import Table
+from ...operator import Operator
+from ...lock import AsyncLockClient, generateLockKey
+from ...lock.asyncLock import asyncLockManager
+from ..toolbox import _row_lock_key, _lock_mode, _watch_loads
+from logging import getLogger
+logger = getLogger("piscesORM")
 
 class AsyncSQLiteLockSession(AsyncSQLiteSession):
-    def __init__(self, connection, mode="r", auto_commit = True):
-        raise RuntimeError("this session not ready yet.")
+    """
+    A session working with a lock client (Application Lock):
+    - `get_first` / `get_all(..., for_update=True)` lock the returned rows by primary key.
+    - `merge` / `delete_object` require the exclusive lock of the row (`check_lock`).
+    - bulk `update` / `delete` hold the table lock while they run.
+    The locks are released by `release_locks()`, which `engine.lock_session()` calls on exit.
+    """
+    def __init__(self, connection: aiosqlite.Connection, mode="r", auto_commit: bool = True, lock_client: Optional[AsyncLockClient] = None, own_client: bool = False):
         super().__init__(connection, mode, auto_commit)
-        self.mode = mode
\ No newline at end of file
+        self.mode = mode
+        self._lock_client = lock_client
+        self._own_client = own_client or lock_client is None # log the client out on release_locks()
+
+    async def _get_client(self) -> AsyncLockClient:
+        if self._lock_client is None:
+            self._lock_client = await asyncLockManager.login()
+        return self._lock_client
+
+    async def release_locks(self):
+        """ Release every lock held by the session's lock client """
+        if self._lock_client is None:
+            return
+        if self._own_client:
+            await self._lock_client.manager.logout(self._lock_client.user)
+            self._lock_client = None
+        else:
+            await self._lock_client._cleanup()
+
+    async def get_first(self, table: Type[Table], *filters:Operator, order_by:str|list[str]=None, limit:int=None, for_update: bool|str = False, lock_timeout: float = None, **kwargs) -> Table:
+        """
+        - for_update: lock the row, True for an exclusive lock, "s" for a shared one.
+        - lock_timeout: how long to wait for the lock (default setting.lock_wait_timeout).
+        """
+        if not for_update:
+            return await super().get_first(table, *filters, order_by=order_by, limit=limit, **kwargs)
+        with _watch_loads(table, "get_first"):
+            result = await self._filter_for_update(table, *filters, order_by=order_by, limit=1, lock_mode=_lock_mode(for_update), lock_timeout=lock_timeout)
+            await self._finish_objects(result, **kwargs)
+        return result[0] if result else None
+
+    async def get_all(self, table: Type[Table], *filters:Operator, order_by:str|list[str]=None, limit:int=None, for_update: bool|str = False, lock_timeout: float = None, **kwargs) -> List[Table]:
+        """
+        - for_update: lock every returned row, True for exclusive locks, "s" for shared ones.
+        - lock_timeout: how long to wait for the locks (default setting.lock_wait_timeout).
+        """
+        if not for_update:
+            return await super().get_all(table, *filters, order_by=order_by, limit=limit, **kwargs)
+        with _watch_loads(table, "get_all"):
+            result = await self._filter_for_update(table, *filters, order_by=order_by, limit=limit, lock_mode=_lock_mode(for_update), lock_timeout=lock_timeout)
+            await self._finish_objects(result, **kwargs)
+        return result
+
+    async def merge(self, obj: Table, cover: bool = False) -> None:
+        client = await self._get_client()
+        await client.check_lock([_row_lock_key(obj)], mode="x")
+        await super().merge(obj, cover)
+
+    async def merge_many(self, objs: List[Table], cover: bool = False) -> None:
+        client = await self._get_client()
+        await client.check_lock([_row_lock_key(obj) for obj in objs], mode="x")
+        await super().merge_many(objs, cover)
+
+    async def delete_object(self, obj: Table) -> None:
+        client = await self._get_client()
+        await client.check_lock([_row_lock_key(obj)], mode="x")
+        await super().delete_object(obj)
+
+    async def update(self, table, *filters, **set):
+        async with self._table_lock(table):
+            await super().update(table, *filters, **set)
+
+    async def delete(self, table, *filters):
+        async with self._table_lock(table):
+            await super().delete(table, *filters)
+
+    async def _filter_for_update(self, table: Type[Table], *filters, order_by=None, limit=None, lock_mode="x", lock_timeout=None) -> List[Table]:
+        """
+        `_filter` and lock every returned row with one `acquire_many` per round. The rows are read again
+        after locking until the result only holds locked rows, so the returned data is never stale.
+        """
+        client = await self._get_client()
+        taken = set()
+        while True:
+            result = await self._filter(table, *filters, order_by=order_by, limit=limit)
+            keys = [_row_lock_key(obj) for obj in result]
+            missing = [key for key in keys if not await client.check_lock([key], raise_error=False, mode=lock_mode)]
+            if not missing:
+                break
+            taken.update(key for key in missing if key not in client._own_locks)
+            await client.acquire_many(missing, mode=lock_mode, wait_timeout=lock_timeout)
+
+        # rows that stopped matching while we were waiting for them
+        for key in taken.difference(keys):
+            client.release(key)
+        return result
+
+    async def _finish_objects(self, result: List[Table], **kwargs):
+        for obj in result:
+            if kwargs.get("load_relationships", True):
+                await self._load_relationship(obj)
+            obj._initialized = True
+        logger.debug(f"get data for update: {[r._get_pks() for r in result]}")
+
+    @asynccontextmanager
+    async def _table_lock(self, table: Type[Table]):
+        """ Hold the table key exclusively during a bulk statement, then go back to the mode held before. """
+        client = await self._get_client()
+        key = generateLockKey(table)
+        lock = client._own_locks.get(key)
+        before = lock.get_mode(client.user) if lock is not None else None
+        await client.acquire(key, mode="x")
+        try:
+            yield
+        finally:
+            if before is None:
+                client.release(key)
+            elif before != "x":
+                client.downgrade(key, before)
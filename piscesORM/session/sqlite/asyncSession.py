@@ -1,19 +1,27 @@
 import aiosqlite
 import sqlite3
-from typing import Type, List
-import functools
+import time
+from typing import Type, List, Callable
 from ..basic import AsyncBaseSession
 from ...generator import SQLiteGenerator
-from ...operator import Equal, Operator
+from ...operator import Equal, Operator, AND
+from ...operator.normalize import normalize
 from ...table import Table
 from ...column import FieldRef, Column
 from ...base import TABLE_REGISTRY
 from ... import errors
+from ..._setting import setting
+from ..toolbox import _fix_columns, _fix_group_by, _fix_aggregates, _convert_aggregate_rows, _convert_value_rows, _check_version, _changed_tables, _options_changed, _watch_loads, _count_load
 from logging import getLogger
 
 logger = getLogger("piscesORM")
 
+_REPLAY_ROUNDS = 16
+""" most catch-up rounds of an online rebuild before the final swap copies whatever is left """
+
 class AsyncSQLiteSession(AsyncBaseSession):
+    _profiler = None # a debug_tool.QueryProfiler, set by the engine (engine.set_profiler)
+
     def __init__(self, connection: aiosqlite.Connection, mode="r", auto_commit: bool = True):
         self._conn = connection
         self._conn.row_factory = sqlite3.Row
@@ -36,12 +44,6 @@ class AsyncSQLiteSession(AsyncBaseSession):
     async def rollback(self):
         await self._conn.rollback()
 
-    async def initialize(self, structure_update=False, rebuild=False):
-        for table in TABLE_REGISTRY.values():
-            await self.create_table(table, True)
-            if structure_update:
-                await self.update_table_structure(table, rebuild)
-
     async def create_table(self, table: Type[Table], exist_ok: bool = False):
         sql = self._generator.generate_create_table(table, exist_ok)
         await self._run_sql(sql)
@@ -80,9 +82,19 @@ class AsyncSQLiteSession(AsyncBaseSession):
         new_order_by = self._fix_order(order_by)
         
         sql, values = self._generator.generate_select(table, None, condition, new_order_by, limit, ref_obj)
-        cursor = await self._run_sql(sql, values)
+        profiler = self._profiler
+        if profiler is None:
+            cursor = await self._run_sql(sql, values)
+            rows = await cursor.fetchall()
+            return [table.from_row(dict(row)) for row in rows]
+
+        start = time.perf_counter()
+        cursor = await self._run_sql(sql, values, profile=False)
         rows = await cursor.fetchall()
-        return [table.from_row(dict(row)) for row in rows]
+        fetched = time.perf_counter()
+        result = [table.from_row(dict(row)) for row in rows]
+        profiler.record(sql, values, fetched - start, rows=len(rows), hydration=time.perf_counter() - fetched)
+        return result
 
     async def _get_first(self, table, *filters, order_by=None, limit=None, ref_obj=None, **kwargs):
         if result := await self._filter(table, *filters, order_by=order_by, limit=limit, ref_obj=ref_obj):
@@ -94,7 +106,8 @@ class AsyncSQLiteSession(AsyncBaseSession):
         return result if result else None
     
     async def get_first(self, table, *filters, order_by = None, limit= None, **kwargs) -> Table:
-        return await self._get_first(table, *filters, order_by=order_by, limit=limit, **kwargs)
+        with _watch_loads(table, "get_first"):
+            return await self._get_first(table, *filters, order_by=order_by, limit=limit, **kwargs)
 
     async def _get_all(self, table: Type[Table] | Table, *filters, order_by: str | list[str] = None, limit: int = None, ref_obj: Table = None, **kwargs):
         result:list[Table] = await self._filter(table, *filters, order_by=order_by, limit=limit, ref_obj=ref_obj)
@@ -106,7 +119,8 @@ class AsyncSQLiteSession(AsyncBaseSession):
         return result
 
     async def get_all(self, table: Type[Table], *filters: Operator, order_by: str | list[str] = None, limit: int = None, **kwargs) -> List[Table]:
-        return await self._get_all(table, *filters, order_by, limit, **kwargs)
+        with _watch_loads(table, "get_all"):
+            return await self._get_all(table, *filters, order_by=order_by, limit=limit, **kwargs)
        
     async def update(self, table, *filters, **set):
         condition = self._combine_filters(*filters)
@@ -117,10 +131,27 @@ class AsyncSQLiteSession(AsyncBaseSession):
 
     async def merge(self, obj: Table, cover: bool = False) -> None:
         await self._update_relationship(obj)
-        sql, values = self._generator.generate_update_object(obj, cover)
-        await self._run_sql(sql, values)
+        await self._merge_object(obj, cover)
         await self._maybe_commit()
 
+    async def merge_many(self, objs: List[Table], cover: bool = False) -> None:
+        try:
+            for obj in objs:
+                await self._update_relationship(obj)
+                await self._merge_object(obj, cover)
+        except errors.StaleObjectError:
+            if self._auto_commit:
+                await self._conn.rollback() # all or nothing
+            raise
+        await self._maybe_commit()
+
+    async def _merge_object(self, obj: Table, cover: bool) -> None:
+        sql, values = self._generator.generate_update_object(obj, cover)
+        if sql is None:
+            return
+        cursor = await self._run_sql(sql, values)
+        _check_version(obj, cursor.rowcount)
+
     async def _update_relationship(self, obj: Table, traces: set[Table] = None) -> None:
         if traces is None:
             traces = {obj}
@@ -157,19 +188,77 @@ class AsyncSQLiteSession(AsyncBaseSession):
         await self._run_sql(sql, values)
         await self._maybe_commit()
 
-    async def count(self, table: Table, filters=None) -> int:
-        sql, values = self._generator.generate_count(table, filters)
+    async def count(self, table: Table, *conditions: Operator, filters: Operator = None) -> int:
+        sql, values = self._generator.generate_count(table, self._combine_filters(filters, *conditions))
         cursor = await self._run_sql(sql, values)
         row = await cursor.fetchone()
         return row[0] if row else 0
         
+    async def exists(self, table: Type[Table], *filters:Operator) -> bool:
+        condition = self._combine_filters(*filters)
+        sql, values = self._generator.generate_exists(table, condition)
+        cursor = await self._run_sql(sql, values)
+        row = await cursor.fetchone()
+        return row is not None
+
+    async def scalar(self, table: Type[Table], column:str|Column, *filters:Operator, order_by:str|list[str]=None):
+        columns = _fix_columns(table, column)
+        condition = self._combine_filters(*filters)
+        new_order_by = self._fix_order(order_by)
+
+        sql, values = self._generator.generate_select(table, [c._name for c in columns], condition, new_order_by, 1)
+        cursor = await self._run_sql(sql, values)
+        row = await cursor.fetchone()
+        return columns[0].from_db(row[0]) if row is not None else None
+
+    async def values(self, table: Type[Table], columns:str|Column|list[str]|list[Column], *filters:Operator, order_by:str|list[str]=None, limit:int=None) -> list[tuple]:
+        columns = _fix_columns(table, columns)
+        condition = self._combine_filters(*filters)
+        new_order_by = self._fix_order(order_by)
+
+        sql, values = self._generator.generate_select(table, [c._name for c in columns], condition, new_order_by, limit)
+        cursor = await self._run_sql(sql, values)
+        rows = await cursor.fetchall()
+        return _convert_value_rows(columns, rows)
+
+    async def aggregate(self, table: Type[Table], *filters:Operator, group_by=None, sum=None, avg=None, min=None, max=None, count=None,
+                  having:Operator=None, order_by=None, limit:int=None, as_dict:bool=False) -> list[tuple]|list[dict]:
+        group_names = _fix_group_by(table, group_by)
+        aggregates = _fix_aggregates(table, sum=sum, avg=avg, min=min, max=max, count=count)
+        condition = self._combine_filters(*filters)
+        new_order_by = self._fix_order(order_by)
+
+        sql, values = self._generator.generate_aggregate(table, aggregates, group_names, condition, normalize(having), new_order_by, limit)
+        cursor = await self._run_sql(sql, values)
+        rows = await cursor.fetchall()
+        return _convert_aggregate_rows(table, group_names, aggregates, rows, as_dict)
+
     async def get_table_structure(self, table: Table) -> list[dict]:
         table_name = table.__table_name__ or table.__name__
         cursor = await self._run_sql(f"PRAGMA table_info({table_name})")
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
         
-    async def update_table_structure(self, table: Type[Table], rebuild=False):
+    async def _matches_definition(self, table: Type[Table]) -> bool:
+        """ The existing table has the columns, indexes and options of its definition (its fingerprint can be saved). """
+        db_columns = {col["name"] for col in await self.get_table_structure(table)}
+        if db_columns != set(table._columns):
+            return False
+        org_indexes = await (await self._run_sql(self._generator.generate_index_list(table))).fetchall()
+        if self._generator.generate_update_index(table, org_indexes):
+            return False
+        options = await (await self._run_sql(self._generator.generate_table_options(table))).fetchone()
+        return not _options_changed(table, options)
+
+    async def update_table_structure(self, table: Type[Table], rebuild=False, online=False, batch_size: int = None, progress: Callable[[int, int], None] = None):
+        """
+        Add the columns missing in the database, drop the stale indexes and create the missing ones.
+        - rebuild: recreate the table from its definition and copy the data back instead.
+        - online: with rebuild, copy in short batches while the table stays writable (see `_online_rebuild`).
+        - batch_size: rows per batch of the online rebuild (default setting.rebuild_batch_size).
+        - progress: called as progress(copied, total) after every batch of the online rebuild.
+        Returns False when the table options changed, they need a rebuild to apply.
+        """
         table_name = table.__table_name__ or table.__name__
 
         # 1. Get actual DB columns
@@ -178,23 +267,33 @@ class AsyncSQLiteSession(AsyncBaseSession):
         defined_columns_set:set[str] = set(table._columns.keys())
 
         update_sqls = self._generator.generate_insert_column(table, db_columns_list)
-        if update_sqls is None:
-            return
+        org_indexes = await (await self._run_sql(self._generator.generate_index_list(table))).fetchall()
+        index_sqls = self._generator.generate_update_index(table, org_indexes)
+        options = await (await self._run_sql(self._generator.generate_table_options(table))).fetchone()
+        options_changed = _options_changed(table, options)
+        if options_changed and not rebuild:
+            logger.warning(f"The table options (WITHOUT ROWID / STRICT) of {table_name} changed, they only apply after a rebuild.")
+
+        if update_sqls is None and not (rebuild and options_changed):
+            if index_sqls:
+                await self._run_script(index_sqls)
+            return not options_changed
         
         if not rebuild:
-            # Try only to add missing columns
-            for s in update_sqls:
-                await self._conn.execute(s)
-
-            await self._maybe_commit()
-            return
+            # Try only to add missing columns, then reconcile the indexes
+            await self._run_script(update_sqls + index_sqls)
+            return not options_changed
+
+        if online and (table.__without_rowid__ or (options is not None and options["wr"])):
+            logger.warning(f"{table_name}: the online rebuild tracks rows by rowid, WITHOUT ROWID tables are rebuilt in one transaction.")
+            online = False
+        if online:
+            await self._online_rebuild(table, list(set(db_columns_list) & defined_columns_set), batch_size, progress)
+            return True
         
-        # 2. create new table / copy data
-        await self._conn.execute("PRAGMA foreign_keys = OFF;")  # Temporarily disable FK
-
+        # 2. create new table / copy data / drop old table and rename new one, as one transaction
         tmp_table_name =f"{table_name}_tmp_fix"
-        create_sql = self._generator.generate_create_table(table, exist_ok=True).replace(table_name, tmp_table_name)
-        await self._conn.execute(create_sql)
+        create_sql = self._generator.generate_create_table(table, exist_ok=True).replace(f"{table_name} (", f"{tmp_table_name} (", 1)
 
         shared_keys = set(db_columns_list) & defined_columns_set
         shared_keys_sql = ", ".join(shared_keys)
@@ -202,24 +301,147 @@ class AsyncSQLiteSession(AsyncBaseSession):
             f"INSERT INTO {tmp_table_name} ({shared_keys_sql}) "
             f"SELECT {shared_keys_sql} FROM {table_name};"
         )
-        await self._conn.execute(copy_sql)
-
-        # Drop old table and rename new one
-        await self._conn.execute(f"DROP TABLE {table_name};")
-        await self._conn.execute(f"ALTER TABLE {tmp_table_name} RENAME TO {table_name};")
 
-        for sql in self._generator.generate_index(table):
-            await self._conn.execute(sql)
-
-        await self._conn.execute("PRAGMA foreign_keys = ON;")
+        await self._run_sql("PRAGMA foreign_keys = OFF;")  # Temporarily disable FK (no effect inside a transaction)
+        try:
+            await self._run_script([
+                create_sql,
+                copy_sql,
+                f"DROP TABLE {table_name};",
+                f"ALTER TABLE {tmp_table_name} RENAME TO {table_name};",
+                *self._generator.generate_index(table),
+            ])
+        finally:
+            await self._run_sql("PRAGMA foreign_keys = ON;")
+        return True
+
+    async def _online_rebuild(self, table: Type[Table], columns: list[str], batch_size: int = None, progress: Callable[[int, int], None] = None):
+        """
+        Rebuild `table` without blocking its writers for the whole copy:
+        1. triggers record the rowid of every row changed from now on;
+        2. the rows are copied into the new table in rowid ranges, one short transaction per batch;
+        3. the recorded rows are copied again, batch by batch, until less than a batch is left;
+        4. one IMMEDIATE transaction copies the rest, drops the old table, renames the new one and creates the indexes.
+        Every step commits on its own, whatever `auto_commit` is.
+        """
+        table_name = table.__table_name__ or table.__name__
+        tmp_table_name = f"{table_name}_tmp_fix"
+        log_table = f"{table_name}_rebuild_log"
+        batch_size = batch_size or setting.rebuild_batch_size
+        cols = ", ".join(columns)
+        copy_sql = (
+            f"INSERT OR REPLACE INTO {tmp_table_name} (rowid, {cols}) "
+            f"SELECT rowid, {cols} FROM {table_name} WHERE rowid > ? AND rowid <= ?"
+        )
+        replay_sqls = [
+            f"DELETE FROM {tmp_table_name} WHERE rowid IN (SELECT rid FROM {log_table} WHERE rid <= ?)",
+            f"INSERT OR REPLACE INTO {tmp_table_name} (rowid, {cols}) "
+            f"SELECT rowid, {cols} FROM {table_name} WHERE rowid IN (SELECT rid FROM {log_table} WHERE rid <= ?)",
+            f"DELETE FROM {log_table} WHERE rid <= ?",
+        ]
 
-        await self._maybe_commit()
+        await self._conn.commit()
+        await self._run_sql("PRAGMA foreign_keys = OFF;")
+        try:
+            # 1. new table and change capture (leftovers of an interrupted rebuild are dropped first)
+            for sql in self._generator.generate_drop_change_capture(table, log_table):
+                await self._run_sql(sql)
+            await self._run_sql(f"DROP TABLE IF EXISTS {tmp_table_name}")
+            await self._run_sql(self._generator.generate_create_table(table).replace(f"{table_name} (", f"{tmp_table_name} (", 1))
+            for sql in self._generator.generate_change_capture(table, log_table):
+                await self._run_sql(sql)
+            await self._conn.commit()
+
+            # 2. copy
+            total = (await (await self._run_sql(f"SELECT COUNT(*) FROM {table_name}")).fetchone())[0]
+            copied = 0
+            # rows past `end` were inserted after the capture started, step 3 copies them
+            low, end = await (await self._run_sql(f"SELECT MIN(rowid) - 1, MAX(rowid) FROM {table_name}")).fetchone()
+            while low is not None and low < end:
+                high, count = await (await self._run_sql(
+                    f"SELECT MAX(rowid), COUNT(*) FROM (SELECT rowid FROM {table_name} WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?)",
+                    [low, end, batch_size])).fetchone()
+                if high is None:
+                    break
+                await self._run_sql(copy_sql, [low, high])
+                await self._conn.commit()
+                copied += count
+                low = high
+                if progress:
+                    progress(copied, total)
+
+            # 3. catch up with the writes done meanwhile, a bounded number of rounds under constant writes
+            for _ in range(_REPLAY_ROUNDS):
+                high, count = await (await self._run_sql(
+                    f"SELECT MAX(rid), COUNT(*) FROM (SELECT rid FROM {log_table} ORDER BY rid LIMIT ?)", [batch_size])).fetchone()
+                if count < batch_size:
+                    break
+                for sql in replay_sqls:
+                    await self._run_sql(sql, [high])
+                await self._conn.commit()
+
+            # 4. swap
+            await self._run_sql("BEGIN IMMEDIATE")
+            high = (await (await self._run_sql(f"SELECT MAX(rid) FROM {log_table}")).fetchone())[0]
+            if high is not None:
+                for sql in replay_sqls:
+                    await self._run_sql(sql, [high])
+            await self._run_sql(f"DROP TABLE {table_name};")
+            await self._run_sql(f"ALTER TABLE {tmp_table_name} RENAME TO {table_name};")
+            await self._run_sql(f"DROP TABLE {log_table}")
+            for sql in self._generator.generate_index(table):
+                await self._run_sql(sql)
+            await self._conn.commit()
+        except Exception:
+            await self._conn.rollback()
+            for sql in self._generator.generate_drop_change_capture(table, log_table):
+                await self._run_sql(sql)
+            await self._run_sql(f"DROP TABLE IF EXISTS {tmp_table_name}")
+            await self._conn.commit()
+            raise
+        finally:
+            await self._run_sql("PRAGMA foreign_keys = ON;")
 
     async def initialize(self, structure_update=False, rebuild=False):
-        for table in TABLE_REGISTRY.values():
-            await self.create_table(table, True)
-            if structure_update:
-                await self.update_table_structure(table, rebuild)
+        """
+        Create the registered tables. The fingerprint of every table definition is kept in a metadata table,
+        so only new or changed tables get DDL, all inside one transaction.
+        - structure_update: add the missing columns of the changed tables.
+        - rebuild: rebuild the changed tables instead (with structure_update).
+        """
+        await self._run_sql(self._generator.generate_create_schema_table())
+        stored = {row[0]: row[1] for row in await (await self._run_sql(self._generator.generate_select_schema())).fetchall()}
+        changed = _changed_tables(self._generator, stored)
+        if not changed:
+            return
+
+        rebuild = structure_update and rebuild
+        if rebuild:
+            await self._run_sql("PRAGMA foreign_keys = OFF") # no effect once the transaction has begun
+        auto_commit, self._auto_commit = self._auto_commit, False
+        try:
+            if not self._conn.in_transaction:
+                await self._run_sql("BEGIN")
+            saved = []
+            for table, fingerprint, exists in changed:
+                await self.create_table(table, True)
+                if exists:
+                    if structure_update:
+                        if not await self.update_table_structure(table, rebuild):
+                            continue
+                    elif not await self._matches_definition(table):
+                        continue # the table differs from its definition, check it again next time
+                saved.append((table.__table_name__ or table.__name__, fingerprint))
+            if saved:
+                await self._run_sql(self._generator.generate_save_schema(), saved, many=True)
+            await self._conn.commit()
+        except Exception:
+            await self._conn.rollback()
+            raise
+        finally:
+            self._auto_commit = auto_commit
+            if rebuild:
+                await self._run_sql("PRAGMA foreign_keys = ON")
 
 
     async def _load_relationship(self, obj:Table, _traces=None):
@@ -228,6 +450,7 @@ class AsyncSQLiteSession(AsyncBaseSession):
 
         for name, relation in obj._relationship.items():
             table_data = None
+            _count_load(obj, name, relation)
             if relation.plural_data:
                 table_data = await self._get_all(
                     relation.get_table(),
@@ -256,11 +479,18 @@ class AsyncSQLiteSession(AsyncBaseSession):
 
     @staticmethod
     def _combine_filters(*filters:Operator) -> Operator:
-        return functools.reduce(lambda x, y: x & y if x else y, filters or [], None)
+        filters = [f for f in filters if f is not None]
+        if not filters:
+            return None
+        if len(filters) == 1:
+            return normalize(filters[0]) # returned as it is when already normal, keeping its cached shape
+        return normalize(AND(*filters))
     
     @staticmethod
     def _fix_order(orders) -> list[str]:
         combine_order = []
+        if not orders:
+            return []
         if not isinstance(orders, list):
             orders = [orders] 
 
@@ -274,7 +504,12 @@ class AsyncSQLiteSession(AsyncBaseSession):
 
         return combine_order
 
-    async def _run_sql(self, sql:str, values=None, many=False):
+    async def _run_sql(self, sql:str, values=None, many=False, profile=True):
+        if profile and self._profiler is not None:
+            start = time.perf_counter()
+            cursor = await self._run_sql(sql, values, many, profile=False)
+            self._profiler.record(sql, values, time.perf_counter() - start, many=many)
+            return cursor
         try:
             if many:
                 cursor = await self._conn.executemany(sql, values)
@@ -287,6 +522,27 @@ class AsyncSQLiteSession(AsyncBaseSession):
             logger.error(f"Database error during SQL execution: {sql}, values: {values}")
             raise
 
+    async def _run_script(self, sqls: list[str]):
+        """
+        Run DDL statements as one transaction. With auto_commit and no open transaction they are sent
+        as a single `executescript`, otherwise they join the current (or a new) transaction left to the caller.
+        """
+        if self._auto_commit and not self._conn.in_transaction:
+            script = "".join(f"{sql.rstrip().rstrip(';')};\n" for sql in sqls)
+            try:
+                await self._conn.executescript(f"BEGIN;\n{script}COMMIT;")
+            except sqlite3.DatabaseError:
+                logger.error(f"Database error during SQL script execution: {script}")
+                if self._conn.in_transaction:
+                    await self._conn.rollback()
+                raise
+            return
+
+        if not self._conn.in_transaction:
+            await self._run_sql("BEGIN")
+        for sql in sqls:
+            await self._run_sql(sql)
+
     async def _maybe_commit(self):
         if self._auto_commit:
             await self._conn.commit()
\ No newline at end of file
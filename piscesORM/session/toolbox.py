@@ -0,0 +1,166 @@
+from __future__ import annotations
+import re
+from contextlib import nullcontext
+from typing import Type, Any
+from ..table import Table
+from ..operator import Operator, AggregateOperator, Sum, Avg, Min, Max, Count
+from ..column import Column
+from .. import errors
+from ..lock import generateLockKey
+from ..base import TABLE_REGISTRY
+
+_AGGREGATE_MAP: dict[str, Type[AggregateOperator]] = {
+    "sum": Sum,
+    "avg": Avg,
+    "min": Min,
+    "max": Max,
+    "count": Count,
+}
+
+_load_monitor = None
+""" the debug_tool.NPlusOneDetector counting the relationship loads (see `debug_tool.detect_n_plus_one`) """
+_NO_WATCH = nullcontext()
+
+def _watch_loads(table, call: str):
+    """ scope of one top-level session call for the N+1 detector """
+    return _NO_WATCH if _load_monitor is None else _load_monitor.watch(table, call)
+
+def _count_load(owner: Table, name: str, relation):
+    if _load_monitor is not None:
+        _load_monitor.load(owner, name, relation)
+
+def _fix_column(table: Type[Table], col: str|Column) -> Column:
+    """ resolve a column name or Column into the Column defined on `table` """
+    name = col._name if isinstance(col, Column) else col
+    if not isinstance(name, str) or name not in table._columns:
+        raise errors.NoSuchColumn(str(name))
+    return table._columns[name]
+
+def _fix_columns(table: Type[Table], columns) -> list[Column]:
+    if not isinstance(columns, (list, tuple)):
+        columns = [columns]
+    return [_fix_column(table, col) for col in columns]
+
+def _fix_group_by(table: Type[Table], group_by) -> list[str]:
+    if group_by is None:
+        return []
+    if not isinstance(group_by, (list, tuple)):
+        group_by = [group_by]
+    return [_fix_column(table, col)._name for col in group_by]
+
+def _fix_aggregates(table: Type[Table], **funcs) -> list[tuple[str, AggregateOperator]]:
+    """
+    Turn the `sum=`, `avg=`, ... arguments of `aggregate()` into `(alias, operator)` pairs.
+
+    Each argument accepts a column (Column or name), an `Operator` expression,
+    a list of them, or a dict `{alias: target}`. `count=True` means `COUNT(*)`.
+    Default aliases are `<func>_<column>` (e.g. `sum_price`), or `<func>_<index>`
+    for expressions.
+    """
+    aggregates = []
+    for func, targets in funcs.items():
+        if targets is None or targets is False:
+            continue
+        op_type = _AGGREGATE_MAP[func]
+        if targets is True:
+            if op_type is not Count:
+                raise ValueError(f"{func}=True is not supported, give a column instead")
+            aggregates.append((func, Count()))
+            continue
+
+        if isinstance(targets, dict):
+            items = list(targets.items())
+        else:
+            if not isinstance(targets, (list, tuple)):
+                targets = [targets]
+            items = []
+            for i, target in enumerate(targets):
+                if isinstance(target, Operator):
+                    items.append((f"{func}_{i}", target))
+                else:
+                    items.append((f"{func}_{_fix_column(table, target)._name}", target))
+
+        for alias, target in items:
+            if not isinstance(target, Operator):
+                target = _fix_column(table, target)
+            aggregates.append((alias, op_type(target)))
+    return aggregates
+
+def _convert_aggregate_rows(table: Type[Table], group_by: list[str], aggregates: list[tuple[str, AggregateOperator]], rows, as_dict=False) -> list[tuple]|list[dict]:
+    """
+    Convert raw aggregate rows. Group columns and MIN/MAX of a plain column go through
+    `Column.from_db`, other aggregate values are returned as-is.
+    """
+    converters: list[Column|None] = [table._columns[name] for name in group_by]
+    for _, op in aggregates:
+        target = op.parts[0]
+        converters.append(target if isinstance(op, (Min, Max)) and isinstance(target, Column) else None)
+    names = list(group_by) + [alias for alias, _ in aggregates]
+
+    result = []
+    for row in rows:
+        values = tuple(
+            conv.from_db(v) if conv is not None and v is not None else v
+            for conv, v in zip(converters, row)
+        )
+        result.append(dict(zip(names, values)) if as_dict else values)
+    return result
+
+def _convert_value_rows(columns: list[Column], rows) -> list[tuple]:
+    """ Convert raw rows with `Column.from_db`, the same way `Table.from_row` does, without building objects. """
+    return [tuple(col.from_db(v) for col, v in zip(columns, row)) for row in rows]
+
+def _row_lock_key(obj: Table) -> str:
+    """ The lock key of a row, built from its primary keys (the table key is `generateLockKey(table)`). """
+    table = type(obj)
+    pks = table.get_primary_keys()
+    if not pks:
+        raise errors.NoPrimaryKeyError()
+    return generateLockKey(table, **{name: getattr(obj, name) for name in pks})
+
+def _lock_mode(for_update: bool|str) -> str:
+    """ `for_update=True` locks rows exclusively, `for_update="s"` takes shared locks. """
+    return "x" if for_update is True else for_update
+
+def _check_version(obj: Table, rowcount: int):
+    """
+    After merging an object with a version column: no updated row means the row was changed (or deleted)
+    by someone else since the object was loaded. Otherwise follow the version bump done in the database.
+    """
+    version = obj._version_column
+    if version is None:
+        return
+    if rowcount == 0:
+        table = type(obj)
+        raise errors.StaleObjectError(table.__table_name__ or table.__name__, obj._get_pks()[1])
+    object.__setattr__(obj, version, getattr(obj, version) + 1)
+
+def _changed_tables(generator, stored: dict[str, str|None]) -> list[tuple[Type[Table], str, bool]]:
+    """
+    Compare the registered tables with `stored` (existing table -> saved fingerprint, see `generate_select_schema`).
+    Returns `(table, fingerprint, exists)` for every table that is missing or whose definition changed.
+    """
+    changed = []
+    for table in TABLE_REGISTRY.values():
+        name = table.__table_name__ or table.__name__
+        fingerprint = generator.generate_schema_fingerprint(table)
+        if name not in stored:
+            changed.append((table, fingerprint, False))
+        elif stored[name] != fingerprint:
+            changed.append((table, fingerprint, True))
+    return changed
+
+def _options_changed(table: Type[Table], row) -> bool:
+    """ `row`: the table's row of `generate_table_options` (None when the table doesn't exist) """
+    if row is None:
+        return False
+    if "sql" in row.keys():
+        without_rowid, strict = _parse_table_options(row["sql"])
+    else:
+        without_rowid, strict = row["wr"], row["strict"]
+    return bool(without_rowid) != bool(table.__without_rowid__) or bool(strict) != bool(table.__strict__)
+
+def _parse_table_options(create_sql: str) -> tuple[bool, bool]:
+    """ (WITHOUT ROWID, STRICT) from the options after the column list of a CREATE TABLE statement """
+    words = re.findall(r"[a-z]+", create_sql[create_sql.rindex(")") + 1:].lower())
+    return "rowid" in words, "strict" in words
@@ -4,7 +4,7 @@ import json
 import logging
 from enum import Enum
 from . import errors
-from .column import Column, Relationship, FieldRef
+from .column import Column, Relationship, FieldRef, Version, Index
 from .base import TABLE_REGISTRY
 from ._setting import setting
 logger = logger = logging.getLogger("piscesORM")
@@ -22,19 +22,38 @@ class TableMeta(type):
                     raise errors.ProtectedColumnName(key)
                 columns[key] = value
                 if value.index:
-                    indexes.append(key)
+                    indexes.append(Index(key, unique=value.unique))
             elif isinstance(value, Relationship):
                 if key in errors.PROTECT_NAME:
                     raise errors.ProtectedColumnName(key)
                 relationship[key] = value
 
 
+        version_column = attrs.get("__version_column__") or next((k for k, v in columns.items() if isinstance(v, Version)), None)
+        if version_column is not None and version_column not in columns:
+            raise errors.NoSuchColumn(version_column)
+
+        if attrs.get("__without_rowid__", False):
+            if not any(col.primary_key for col in columns.values()):
+                raise errors.IllegalTableOption(f"{name}: a WITHOUT ROWID table needs a primary key")
+            if any(col.primary_key and col.auto_increment for col in columns.values()):
+                raise errors.IllegalTableOption(f"{name}: AUTOINCREMENT is not allowed on a WITHOUT ROWID table")
+
         attrs["_columns"] = columns
+        attrs["_version_column"] = version_column
         attrs["_indexes"] = indexes
         attrs["_relationship"] = relationship
         attrs["_initialized"] = False
 
         new_cls = super().__new__(cls, name, bases, attrs)
+        # after type.__new__: the columns used in __indexes__ got their names from __set_name__
+        for index in attrs.get("__indexes__", []):
+            if not isinstance(index, Index):
+                raise TypeError(f"__indexes__ of {name} must only hold Index objects")
+            for col_name in index.column_names():
+                if col_name not in columns:
+                    raise errors.NoSuchColumn(col_name)
+            indexes.append(index)
         if not attrs.get("__abstract__", False):
             TABLE_REGISTRY[name]=new_cls
         return new_cls
@@ -44,10 +63,19 @@ class Table(metaclass=TableMeta):
     __table_name__ = None
     __no_primary_key__ = False
     __read_only__ = False
+    __version_column__ = None
+    """ name of an integer column used as optimistic lock version, a `Version()` column is picked automatically """
+    __without_rowid__ = False
+    """ store the rows in the primary key b-tree only (no hidden rowid), for tables looked up by a natural / composite key """
+    __strict__ = False
+    """ STRICT table: SQLite checks the value types, NUMERIC columns become ANY and DATETIME columns TEXT """
+    __indexes__ = []
+    """ composite, partial and expression indexes, `[Index(...), ...]` (`index=True` on a column adds a single column one) """
 
     _columns:dict[str, Column]     # var_name: column
     _relationship:dict[str, Relationship]
-    _indexes:list[str]             # var_name
+    _indexes:list[Index]
+    _version_column:str|None       # var_name
     _edited:set[str]
     _initialized:bool              # init mark
 
@@ -0,0 +1,264 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import pytest
+from piscesORM._setting import setting
+from piscesORM import errors
+from piscesORM.lock import SyncRowLock, SyncLockManager, AsyncLockManager, AsyncSQLiteLockManager
+from piscesORM.lock.toolbox import _find_cycle, _parent_key, _lock_plan, generateLockKey
+
+
+def test_granted_waiter_waits_on_nobody():
+    """ a waiter granted by a release, whose owner has not woken up yet, must not look blocked """
+    lock = SyncRowLock()
+    assert lock._request("a", "x", 60) is None
+    b = lock._request("b", "x", 60)
+    c = lock._request("c", "x", 60)
+    lock._release_hold("a") # grants b, c stays queued behind it
+
+    assert b.granted and not c.granted
+    assert lock._waiting_for(b) == []
+    assert lock._waiting_for(c) == ["b"]
+    # b has not cleared its wait-for entry yet: c waiting on b is not a cycle
+    waits = {"b": {b: lock}, "c": {c: lock}}
+    assert _find_cycle("c", waits) is None
+
+
+def test_waits_of_one_owner_are_kept_apart():
+    """ two threads of one client waiting at once: clearing one wait must keep the other in the graph """
+    manager = SyncLockManager()
+    held_by_b, held_by_a, held_by_z = SyncRowLock(), SyncRowLock(), SyncRowLock()
+    held_by_b._request("b", "x", 0)
+    held_by_a._request("a", "x", 0)
+    held_by_z._request("z", "x", 0)
+
+    first = held_by_b._request("a", "x", 0)
+    second = held_by_z._request("a", "x", 0)
+    manager._check_deadlock(held_by_b, first)
+    manager._check_deadlock(held_by_z, second)
+    manager._clear_wait("a", second) # the second thread gave up, the first still waits on b
+
+    closing = held_by_a._request("b", "x", 0)
+    with pytest.raises(errors.DeadlockDetected):
+        manager._check_deadlock(held_by_a, closing)
+    assert manager._waits == {"a": {first: held_by_b}}
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_multi_key_acquire_keeps_later_keys_from_reclaim(monkeypatch):
+    """ a key released while the client still waits on an earlier key must not be reclaimed and handed out twice """
+    monkeypatch.setattr(setting, "garbage_clean_cycle", 0)
+    manager = SyncLockManager()
+    a, b, c = manager.login("a"), manager.login("b"), manager.login("c")
+    a.acquire_many(["A:id=1", "B:id=1"])
+
+    worker = threading.Thread(target=b.acquire_many, args=(["A:id=1", "B:id=1"],), kwargs={"wait_timeout": 5})
+    worker.start()
+    _wait_until(lambda: manager.getLock("A:id=1")._waiting)
+
+    a.release("B:id=1")
+    time.sleep(0.01)
+    manager._reclaim_idle()
+    c.acquire("B:id=1")
+    a.release("A:id=1")
+
+    worker.join(0.2)
+    assert worker.is_alive() # b is now waiting on c's B:id=1
+    c.release("B:id=1")
+    worker.join(5)
+    assert b._own_locks["B:id=1"] is manager.getLock("B:id=1")
+
+
+def test_async_multi_key_acquire_keeps_later_keys_from_reclaim(monkeypatch):
+    monkeypatch.setattr(setting, "garbage_clean_cycle", 0)
+
+    async def main():
+        manager = AsyncLockManager()
+        a, b, c = await manager.login("a"), await manager.login("b"), await manager.login("c")
+        await a.acquire_many(["A:id=1", "B:id=1"])
+
+        task = asyncio.create_task(b.acquire_many(["A:id=1", "B:id=1"], wait_timeout=5))
+        while not (await manager.getLock("A:id=1"))._waiting:
+            await asyncio.sleep(0.005)
+
+        a.release("B:id=1")
+        await asyncio.sleep(0.01)
+        await manager._reclaim_idle()
+        await c.acquire("B:id=1")
+        a.release("A:id=1")
+
+        await asyncio.sleep(0.2)
+        assert not task.done() # b is now waiting on c's B:id=1
+        c.release("B:id=1")
+        await asyncio.wait_for(task, 5)
+        assert b._own_locks["B:id=1"] is await manager.getLock("B:id=1")
+
+    asyncio.run(main())
+
+
+def test_table_key_keeps_trailing_colon():
+    """ the table key is still "Model:", as before the intent locks """
+    class Model:
+        pass
+    assert generateLockKey(Model) == "Model:"
+    assert generateLockKey(Model, id=1, b=2) == "Model:b=2,id=1"
+    assert _parent_key("Model:b=2,id=1") == "Model:"
+    assert _parent_key("Model:") is None
+    assert _parent_key("free-form") is None
+    assert _lock_plan({"Model:id=1": "x"}) == [("Model:", "ix"), ("Model:id=1", "x")]
+
+
+def test_async_sqlite_acquire_does_not_block_the_loop(tmp_path):
+    """ a busy lock file makes the acquire wait in a worker thread, the event loop keeps running """
+    path = str(tmp_path / "locks.db")
+
+    async def main():
+        manager = AsyncSQLiteLockManager(path)
+        client = await manager.login("a")
+        busy = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        busy.execute("BEGIN IMMEDIATE") # another process writing the lock file
+        threading.Timer(0.3, busy.commit).start()
+
+        ticks = 0
+        acquire = asyncio.create_task(client.acquire("A:id=1"))
+        while not acquire.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        await acquire
+        busy.close()
+        assert ticks >= 10
+        assert (await manager.getLock("A:id=1")).get_mode("a") == "x"
+
+    asyncio.run(main())
+
+
+def test_async_sqlite_cancelled_acquire_gives_the_lease_back(tmp_path):
+    path = str(tmp_path / "locks.db")
+
+    async def main():
+        manager = AsyncSQLiteLockManager(path)
+        client = await manager.login("a")
+        busy = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        busy.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.2, busy.commit).start()
+
+        lock = await manager.getLock("A:id=1")
+        acquire = asyncio.create_task(lock.acquire("a", 0))
+        await asyncio.sleep(0.05) # try_acquire is waiting on the busy file
+        acquire.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await acquire
+        await asyncio.sleep(0.5) # the worker grants it, then the lease is given back
+        busy.close()
+        assert lock.get_mode("a") is None
+
+    asyncio.run(main())
+
+
+def test_async_auto_unlock_counts_as_forced_release():
+    async def main():
+        manager = AsyncLockManager()
+        manager.enable_stats()
+        client = await manager.login("a")
+        await client.acquire("k", timeout=0.01)
+        await asyncio.sleep(0.03)
+        manager._expire_due()
+        stats = manager.stats()
+        assert stats["forced_releases"] == 1
+        assert stats["keys"]["k"]["hold"]["count"] == 1
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("table_mode, row_mode", [("ix", "x"), ("is", "s"), ("six", "x"), ("s", "x"), ("is", "x")])
+def test_table_lock_asked_for_outlives_its_rows(table_mode, row_mode):
+    """ releasing the last row drops only the intent taken for the rows, not the table lock asked for """
+    manager = SyncLockManager()
+    client = manager.login("a")
+    client.acquire("Model:", mode=table_mode)
+    client.acquire("Model:id=1", mode=row_mode)
+    client.release("Model:id=1")
+    assert client._own_locks["Model:"].get_mode("a") == table_mode
+
+    client.acquire("Model:id=2", mode=row_mode)
+    client.release("Model:")
+    client.release("Model:id=2")
+    assert "Model:" not in client._own_locks
+
+
+def test_intent_only_table_lock_goes_with_the_rows():
+    manager = SyncLockManager()
+    client = manager.login("a")
+    client.acquire_many(["Model:id=1", "Model:id=2"])
+    client.release("Model:id=1")
+    assert client._own_locks["Model:"].get_mode("a") == "ix"
+    client.release("Model:id=2")
+    assert "Model:" not in client._own_locks
+    assert not manager.getLock("Model:").is_locked()
+
+
+def test_async_table_lock_asked_for_outlives_its_rows():
+    async def main():
+        manager = AsyncLockManager()
+        client = await manager.login("a")
+        await client.acquire("Model:", mode="six")
+        await client.acquire("Model:id=1")
+        client.release("Model:id=1")
+        assert client._own_locks["Model:"].get_mode("a") == "six"
+
+    asyncio.run(main())
+
+
+def test_rows_skip_an_intent_already_held(monkeypatch):
+    """ more rows under a held intent don't touch the table key's lock, a stronger intent or a later deadline does """
+    taken = []
+    acquire = SyncRowLock.acquire
+    def record(lock, owner, timeout, mode="x", wait_timeout=0, on_wait=None, key=""):
+        taken.append((key, mode))
+        return acquire(lock, owner, timeout, mode, wait_timeout, on_wait, key)
+    monkeypatch.setattr(SyncRowLock, "acquire", record)
+
+    client = SyncLockManager().login("a")
+    client.acquire("Model:id=1", mode="s")
+    client.acquire("Model:id=2", mode="s")
+    assert taken == [("Model:", "is"), ("Model:id=1", "s"), ("Model:id=2", "s")]
+
+    taken.clear()
+    client.acquire("Model:id=3")
+    client.acquire("Model:id=4", timeout=60) # the intent never expires, it still covers this row
+    client.acquire("Model:id=5")
+    assert taken == [("Model:", "ix"), ("Model:id=3", "x"), ("Model:id=4", "x"), ("Model:id=5", "x")]
+    assert client._own_locks["Model:"].get_mode("a") == "ix"
+
+    other = SyncLockManager().login("b")
+    other.acquire("Model:id=1", timeout=60)
+    taken.clear()
+    other.acquire("Model:id=2", timeout=60) # a later deadline renews the intent
+    assert taken == [("Model:", "ix"), ("Model:id=2", "x")]
+
+
+def test_stats_leave_out_the_intents_of_rows():
+    manager = SyncLockManager()
+    manager.enable_stats()
+    client = manager.login("a")
+    client.acquire("Model:id=1")
+    client.acquire("Model:id=2")
+    client.release("Model:id=1")
+    client.release("Model:id=2")
+    stats = manager.stats()
+    assert set(stats["keys"]) == {"Model:id=1", "Model:id=2"}
+    assert stats["acquired"] == 2
+
+    client.acquire("Model:id=3")
+    client.acquire("Model:", mode="s") # an intent becoming a table lock asked for
+    client.release("Model:")
+    stats = manager.stats()
+    assert stats["keys"]["Model:"]["acquired"] == 1
+    assert stats["keys"]["Model:"]["hold"]["count"] == 1
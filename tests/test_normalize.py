@@ -0,0 +1,36 @@
+from piscesORM.table import Table
+from piscesORM.column import Integer, Text
+from piscesORM.operator import AND, OR, IsIn, Plus
+from piscesORM.operator.normalize import normalize, operator_key
+
+
+class NormalItem(Table):
+    id = Integer(primary_key=True)
+    name = Text()
+    value = Integer()
+
+
+def test_normal_trees_are_returned_as_they_are():
+    """ nothing to flatten, dedupe, fold or merge: the same object, with its cached shape """
+    trees = [
+        NormalItem.value > 1,
+        (NormalItem.value > 1) & (NormalItem.name == "a"),
+        (NormalItem.value == 1) | (NormalItem.name == "a"),
+        NormalItem.id.in_([1, 2, 3]),
+        NormalItem.value > NormalItem.id + 1,
+    ]
+    for op in trees:
+        op.shape()
+        assert normalize(op) is op
+        assert op._shape is not None
+
+
+def test_rewrites_still_apply():
+    a, b, c = NormalItem.value > 1, NormalItem.name == "a", NormalItem.id < 5
+    flat = normalize((a & b) & c)
+    assert type(flat) is AND and len(flat.parts) == 3
+    assert flat.parts[0] is a # the untouched parts are shared
+    assert operator_key(normalize(a & b & a)) == operator_key(a & b)
+    assert operator_key(normalize(NormalItem.value > Plus(1, 2))) == operator_key(NormalItem.value > 3)
+    merged = normalize((NormalItem.id == 1) | (NormalItem.id == 2) | b)
+    assert type(merged) is OR and isinstance(merged.parts[0], IsIn) and merged.parts[1] is b
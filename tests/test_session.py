@@ -0,0 +1,75 @@
+import asyncio
+import sqlite3
+from piscesORM.table import Table
+from piscesORM.column import Integer, Text
+from piscesORM.engine.sqlite import SyncSQLiteEngine, AsyncSQLiteEngine
+from piscesORM.generator import SQLiteGenerator
+from piscesORM.generator.sqlite import SCHEMA_TABLE
+
+
+class CountItem(Table):
+    id = Integer(primary_key=True)
+    name = Text()
+    value = Integer()
+
+
+class LegacyItem(Table):
+    id = Integer(primary_key=True)
+    name = Text(index=True)
+
+
+class DriftedItem(Table):
+    id = Integer(primary_key=True)
+    name = Text()
+
+
+def _legacy_database(path):
+    """ tables created before the schema fingerprints, DriftedItem lacks a column of its definition """
+    conn = sqlite3.connect(path)
+    conn.execute(SQLiteGenerator.generate_create_table(LegacyItem))
+    for sql in SQLiteGenerator.generate_index(LegacyItem):
+        conn.execute(sql)
+    conn.execute("CREATE TABLE DriftedItem (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    return conn
+
+
+def test_initialize_saves_fingerprints_of_matching_existing_tables(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = _legacy_database(path)
+    SyncSQLiteEngine(path).initialize()
+    saved = dict(conn.execute(f"SELECT table_name, fingerprint FROM {SCHEMA_TABLE}"))
+    assert saved["LegacyItem"] == SQLiteGenerator.generate_schema_fingerprint(LegacyItem)
+    assert "DriftedItem" not in saved # really differs, checked again next time
+
+
+def test_async_initialize_saves_fingerprints_of_matching_existing_tables(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = _legacy_database(path)
+    asyncio.run(AsyncSQLiteEngine(path).initialize())
+    saved = dict(conn.execute(f"SELECT table_name, fingerprint FROM {SCHEMA_TABLE}"))
+    assert saved["LegacyItem"] == SQLiteGenerator.generate_schema_fingerprint(LegacyItem)
+    assert "DriftedItem" not in saved
+
+
+def test_count_accepts_filters_keyword(tmp_path):
+    engine = SyncSQLiteEngine(str(tmp_path / "count.db"))
+    engine.initialize()
+    with engine.session() as session:
+        session.insert_many([CountItem(id=i, name=f"n{i}", value=i % 3) for i in range(9)])
+        assert session.count(CountItem) == 9
+        assert session.count(CountItem, filters=CountItem.value == 1) == 3
+        assert session.count(CountItem, CountItem.value == 1, CountItem.id > 3) == 2
+        assert session.count(CountItem, CountItem.id > 3, filters=CountItem.value == 1) == 2
+
+
+def test_async_count_accepts_filters_keyword(tmp_path):
+    async def main():
+        engine = AsyncSQLiteEngine(str(tmp_path / "count.db"))
+        await engine.initialize()
+        async with engine.session() as session:
+            await session.insert_many([CountItem(id=i, name=f"n{i}", value=i % 3) for i in range(9)])
+            assert await session.count(CountItem, filters=CountItem.value == 1) == 3
+            assert await session.count(CountItem, CountItem.value == 1, CountItem.id > 3) == 2
+
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+import sqlite3
+import pytest
+from piscesORM.table import Table
+from piscesORM.column import Integer, Text
+from piscesORM.generator import SQLiteGenerator
+from piscesORM.generator import sqlite as sqlite_generator
+from piscesORM.session.toolbox import _options_changed, _parse_table_options
+
+
+class OptionItem(Table):
+    __table_name__ = "option_item"
+    id = Integer(primary_key=True)
+    name = Text()
+
+
+@pytest.mark.parametrize("table_list", [True, False], ids=["table_list", "sqlite_master"])
+def test_option_drift_is_reported(monkeypatch, table_list):
+    """ SQLite before 3.37 has no PRAGMA table_list, the options come from the CREATE TABLE text """
+    if table_list and not sqlite_generator._HAS_TABLE_LIST:
+        pytest.skip("PRAGMA table_list needs SQLite 3.37+")
+    monkeypatch.setattr(sqlite_generator, "_HAS_TABLE_LIST", table_list)
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute(SQLiteGenerator.generate_create_table(OptionItem))
+
+    def changed():
+        return _options_changed(OptionItem, conn.execute(SQLiteGenerator.generate_table_options(OptionItem)).fetchone())
+
+    assert not changed()
+    monkeypatch.setattr(OptionItem, "__without_rowid__", True)
+    assert changed()
+
+
+def test_parse_table_options():
+    assert _parse_table_options('CREATE TABLE "a" (id INTEGER, "b(c)" TEXT, PRIMARY KEY (id)) WITHOUT ROWID, STRICT') == (True, True)
+    assert _parse_table_options("CREATE TABLE a (id INTEGER PRIMARY KEY) strict") == (False, True)
+    assert _parse_table_options("CREATE TABLE a (id INTEGER PRIMARY KEY)") == (False, False)
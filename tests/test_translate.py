@@ -0,0 +1,83 @@
+import sys
+import threading
+from piscesORM.table import Table
+from piscesORM.column import Integer, Text, FieldRef
+from piscesORM.operator import AND, Between, Count
+from piscesORM.operator.translate import sqlite as translate
+from piscesORM._setting import setting
+
+
+class TranslateItem(Table):
+    id = Integer(primary_key=True)
+    name = Text()
+    value = Integer()
+
+
+def _filters(i):
+    return [
+        (TranslateItem.value > i) & (TranslateItem.name == f"item {i}"),
+        TranslateItem.id.in_(list(range(i % 5 + 1))) | Between(TranslateItem.value, i, i + 10),
+        TranslateItem.id.in_(list(range(setting.in_list_inline_limit + 1 + i))),
+        TranslateItem.value == FieldRef("value"),
+        Count(),
+        Count(TranslateItem.id),
+    ]
+
+
+def test_cached_translation_matches_uncached():
+    translate._TRANSLATE_CACHE.clear()
+    ref = TranslateItem(id=1, name="x", value=7)
+    for i in range(20):
+        for op in _filters(i):
+            assert translate.translate_sqlite_security(op, ref) == translate._translate_sqlite_security(op, ref)
+
+
+def test_cache_evicts_one_entry_at_a_time():
+    translate._TRANSLATE_CACHE.clear()
+    size = setting.translate_cache_size
+    setting.translate_cache_size = 3
+    try:
+        ops = [TranslateItem.value > 1, TranslateItem.name == "a", TranslateItem.id < 2, TranslateItem.value != 3]
+        for op in ops:
+            translate.translate_sqlite_security(op)
+        assert len(translate._TRANSLATE_CACHE) == 3
+        assert ops[0].shape() not in translate._TRANSLATE_CACHE # the oldest entry only
+        assert all(op.shape() in translate._TRANSLATE_CACHE for op in ops[1:])
+    finally:
+        setting.translate_cache_size = size
+        translate._TRANSLATE_CACHE.clear()
+
+
+def test_cache_key_is_operator_shape():
+    for op, fresh in zip(_filters(3), _filters(3)):
+        params, layouts = [], []
+        assert translate._gather_params(op, TranslateItem(value=1), params, layouts) == fresh.shape()
+
+
+def test_cache_eviction_is_thread_safe(monkeypatch):
+    """ sessions on several threads insert and evict at once """
+    monkeypatch.setattr(setting, "translate_cache_size", 4)
+    ops = [AND(*(TranslateItem.value > j for j in range(n))) for n in range(2, 40)]
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                for op in ops:
+                    translate.translate_sqlite_security(op)
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6) # switch threads as often as possible
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(translate._TRANSLATE_CACHE) <= 4
+    finally:
+        sys.setswitchinterval(interval)
+        translate._TRANSLATE_CACHE.clear()